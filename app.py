@@ -1,6 +1,6 @@
 import os
 import shutil
-import zipfile
+import stat
 import subprocess
 import tempfile
 import uuid
@@ -8,936 +8,3936 @@ import sys
 import threading
 import time
 import json
-from flask import Flask, request, render_template_string, send_file, redirect, url_for, flash, session, jsonify
-from werkzeug.utils import secure_filename
+import hashlib
+import struct
+import gzip
+import mimetypes
+import shlex
+import re
+import http.client
+import socket
+import ssl
+import math
+import importlib.util
+from collections import OrderedDict, deque
+import signal
+import atexit
+import queue
+import random
+import heapq
+from flask import Flask, Response, request, render_template, send_file, redirect, url_for, flash, session, jsonify
+from flask.sessions import SessionInterface, SecureCookieSession
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.utils import secure_filename, safe_join
 import logging
+import logging.handlers
+from contextlib import contextmanager
 from datetime import datetime
-import redis
-from flask_session import Session
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are served
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows: every process runs the background tasks
+    fcntl = None
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Records are handed to a queue and written by a listener thread, so request
+# and build threads never block on log I/O. LOG_FORMAT=json emits one JSON
+# object per line with the session id and build stage.
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+TEXT_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+def parse_sample_rates(value):
+    """Parse LOG_SAMPLE_RATES ("status_poll=0.05,build_log=1") into {event: rate}"""
+    rates = {'status_poll': 0.05}
+    for item in value.split(','):
+        if '=' in item:
+            event, rate = item.split('=', 1)
+            try:
+                rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+            except ValueError:
+                pass
+    return rates
+
+# Fraction of records kept for high-frequency events (logged with extra={'sample': event})
+LOG_SAMPLE_RATES = parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES', ''))
+
+# Session id and build stage of the work the current thread is doing
+log_context = threading.local()
+
+class LogContextFilter(logging.Filter):
+    """Attach session_id and stage to records (explicit extra= values win)"""
+
+    def filter(self, record):
+        if getattr(record, 'session_id', None) is None:
+            record.session_id = getattr(log_context, 'session_id', None)
+        if getattr(record, 'stage', None) is None:
+            record.stage = getattr(log_context, 'stage', None)
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep only a configured fraction of records of each sampled event"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        event = getattr(record, 'sample', None)
+        if event is None:
+            return True
+        record.sample_rate = self.rates.get(event, 1.0)
+        return record.sample_rate >= 1.0 or random.random() < record.sample_rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'session_id': getattr(record, 'session_id', None),
+            'stage': getattr(record, 'stage', None),
+        }
+        if getattr(record, 'sample', None) is not None:
+            entry['sample'] = record.sample
+            entry['sample_rate'] = record.sample_rate
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+def configure_logging():
+    """Route all records through a queue to a background listener thread"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Filters run in the thread that logs, before the record is queued
+    queue_handler.addFilter(LogContextFilter())
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+    
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued on shutdown
+    atexit.register(listener.stop)
+
 logger = logging.getLogger(__name__)
 
+# Metrics (Prometheus text exposition format, no external dependency)
+class Metric:
+    """Base class for a labelled metric family"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        METRICS.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self._format_labels(key), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for name, labels, value in self.samples():
+            lines.append(f'{name}{labels} {value:.6g}' if isinstance(value, float) else f'{name}{labels} {value}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        # Optional callable returning a value (or a {label_tuple: value} dict)
+        # that is evaluated at scrape time
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception as e:
+                logger.error(f"Error collecting metric {self.name}: {str(e)}")
+                return []
+            values = value if isinstance(value, dict) else {(): value}
+            return [(self.name, self._format_labels(key), v) for key, v in values.items()]
+        return super().samples()
+
+class Histogram(Metric):
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, state in self._values.items():
+                for bound, count in zip(self.buckets, state['counts']):
+                    samples.append((f'{self.name}_bucket', self._format_labels(key, [('le', f'{bound:g}')]), count))
+                samples.append((f'{self.name}_bucket', self._format_labels(key, [('le', '+Inf')]), state['count']))
+                samples.append((f'{self.name}_sum', self._format_labels(key), state['sum']))
+                samples.append((f'{self.name}_count', self._format_labels(key), state['count']))
+        return samples
+
+METRICS = []
+
+BUILD_STAGE_SECONDS = Histogram(
+    'converter_build_stage_seconds',
+    'Duration of each conversion pipeline stage',
+    ['stage']
+)
+BUILDS_TOTAL = Counter('converter_builds_total', 'Finished conversions by outcome', ['outcome'])
+CACHE_REQUESTS = Counter('converter_cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result'])
+STATUS_REQUESTS = Counter('converter_status_requests_total', 'Requests to the /status endpoint')
+STATUS_REQUEST_SECONDS = Histogram('converter_status_request_seconds', 'Latency of the /status endpoint')
+EXE_STARTUP_SECONDS = Histogram(
+    'converter_executable_startup_seconds',
+    'Run time of produced executables in the post-build benchmark',
+    ['kind', 'engine']
+)
+EXE_PEAK_RSS_BYTES = Histogram(
+    'converter_executable_peak_rss_bytes',
+    'Peak resident memory of produced executables in the post-build benchmark',
+    ['engine'],
+    buckets=tuple(2 ** n * 1024 * 1024 for n in range(2, 13))
+)
+EXE_EXTRACTION_SECONDS = Histogram(
+    'converter_executable_extraction_seconds',
+    'Time a onefile bootloader spends unpacking before starting the application',
+    ['engine']
+)
+DELTA_DOWNLOADS = Counter('converter_delta_downloads_total', 'Downloads served as a delta', ['kind'])
+RATE_LIMITED_REQUESTS = Counter('converter_rate_limited_requests_total', 'Requests rejected by the rate limiter', ['group'])
+REDIS_ROUNDTRIP_SECONDS = Histogram(
+    'converter_redis_roundtrip_seconds',
+    'Round-trip latency of Redis commands',
+    ['command'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+STATUS_EVICTIONS = Counter('converter_status_evictions_total', 'In-memory status records dropped by reason', ['reason'])
+PREWARM_RUNS = Counter('converter_prewarm_runs_total', 'Dependency set pre-warming runs by outcome', ['outcome'])
+BUILD_PREDICTION_RATIO = Histogram(
+    'converter_build_prediction_ratio',
+    'Actual over predicted duration of the build stage',
+    ['engine'],
+    buckets=(0.25, 0.5, 0.8, 0.9, 1.1, 1.25, 1.5, 2, 3, 5)
+)
+ITERATE_BUILDS = Counter('converter_iterate_builds_total', 'Iterative rebuilds by workspace state', ['workspace'])
+ITERATE_SECONDS_SAVED = Histogram(
+    'converter_iterate_seconds_saved',
+    'Predicted cold pip and build time minus the actual time of iterative rebuilds',
+    buckets=(0, 5, 10, 20, 30, 60, 120, 300, 600)
+)
+WEBHOOK_DELIVERIES = Counter('converter_webhook_deliveries_total', 'Completion webhook attempts by outcome', ['outcome'])
+WEBHOOK_SECONDS = Histogram('converter_webhook_seconds', 'Duration of completion webhook requests')
+JOB_TOKEN_REJECTIONS = Counter('converter_job_token_rejections_total', 'Requests for a job refused over its job token', ['reason'])
+UPLOAD_BYTES = Counter('converter_chunked_upload_bytes_total', 'Bytes of chunked uploads by whether they were sent or already stored', ['source'])
+SCRATCH_WORKSPACES = Counter('converter_scratch_workspaces_total', 'Build scratch workspaces by location', ['location'])
+SCRATCH_SPILLS = Counter('converter_scratch_spills_total', 'Builds whose scratch space went to disk instead of RAM', ['reason'])
+SCRATCH_USAGE_BYTES = Histogram(
+    'converter_scratch_bytes',
+    'Size of build intermediates and output in the scratch workspace',
+    ['location'],
+    buckets=tuple(2 ** n * 1024 * 1024 for n in range(3, 13))
+)
+
 # Initialize Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24))
+# Static files are served by static_asset() below, with compression and caching
+app = Flask(__name__, static_folder=None)
+# Required (create_app() refuses to start without it): it signs the job
+# tokens, which every worker process and restart must accept
+app.secret_key = os.environ.get('SECRET_KEY')
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload
-app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
+app.config['UPLOAD_FOLDER'] = None  # Set by create_app(), see private_temp_dir()
 app.config['ALLOWED_EXTENSIONS'] = {'py'}
+app.config['BUILD_CACHE_FOLDER'] = None  # Set by create_app(), see private_temp_dir()
 app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # Session lasts 1 hour
 app.config['SESSION_COOKIE_SECURE'] = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
 
-# Set up Redis for session and conversion status storage
+# Redis for session and conversion status storage; the client is created by create_app()
 redis_url = os.environ.get('REDIS_URL')
-if redis_url:
-    logger.info(f"Using Redis for session storage: {redis_url}")
-    app.config['SESSION_TYPE'] = 'redis'
-    app.config['SESSION_REDIS'] = redis.from_url(redis_url)
-else:
-    logger.info("Redis URL not found, using filesystem for session storage")
-    app.config['SESSION_TYPE'] = 'filesystem'
-    app.config['SESSION_FILE_DIR'] = tempfile.mkdtemp()
-
-# Initialize the session interface
-Session(app)
+redis_client = None
 
 # Detect if running on Render
 ON_RENDER = 'RENDER' in os.environ
 
+# Conversion status records. Without Redis they live in status_store: compact
+# slotted records whose log is a ring buffer capped in lines and bytes, kept
+# within STATUS_MEMORY_BUDGET_MB by evicting the least recently used
+# completed records. Like the Redis keys, records expire STATUS_TTL after
+# their last update; those of unfinished jobs get STATUS_STALE_TTL (a queued
+# job may wait long without updates), so abandoned builds do not linger
+# either. The same log caps bound the JSON documents stored in Redis.
+STATUS_TTL = 3600
+STATUS_STALE_TTL = 24 * 3600
+STATUS_LOG_LINES = int(os.environ.get('STATUS_LOG_LINES', 200))
+STATUS_LOG_BYTES = int(os.environ.get('STATUS_LOG_BYTES', 64 * 1024))
+STATUS_LOG_LINE_BYTES = 4096
+STATUS_MEMORY_BUDGET = int(float(os.environ.get('STATUS_MEMORY_BUDGET_MB', 64)) * 1024 * 1024)
+# Rough fixed cost of a record (object, slots, deque, small fields)
+STATUS_RECORD_OVERHEAD = 1024
+
+class StatusRecord:
+    """One job's conversion status; to_dict() gives the familiar dict form"""
+    __slots__ = ('progress', 'status', 'completed', 'success', 'message', 'log', 'log_bytes', 'log_dropped',
+                 'download_url', 'build_info', 'stage', 'stage_started', 'predicted_seconds', 'timestamp',
+                 'updated', 'extra_bytes')
+
+    FIELDS = ('progress', 'status', 'completed', 'success', 'message', 'download_url', 'build_info',
+              'stage', 'stage_started', 'predicted_seconds', 'timestamp')
+
+    def __init__(self):
+        self.progress = 0
+        self.status = ''
+        self.completed = False
+        self.success = False
+        self.message = ''
+        self.log = deque()
+        self.log_bytes = 0
+        self.log_dropped = 0
+        self.download_url = None
+        self.build_info = None
+        self.stage = None
+        self.stage_started = None
+        self.predicted_seconds = None
+        self.timestamp = time.time()
+        self.updated = time.time()
+        self.extra_bytes = 0
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls()
+        for field in cls.FIELDS:
+            if field in data:
+                setattr(record, field, data[field])
+        record.log_dropped = data.get('log_dropped', 0)
+        for line in data.get('log') or ():
+            record.append_log(line)
+        record.measure_extras()
+        return record
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+        data.update(
+            status=self.status, message=self.message, download_url=self.download_url,
+            log=list(self.log), log_dropped=self.log_dropped
+        )
+        return data
+
+    def append_log(self, line):
+        """Add a log line, dropping the oldest ones beyond the line and byte caps"""
+        size = len(line.encode('utf-8'))
+        if size > STATUS_LOG_LINE_BYTES:
+            line = line.encode('utf-8')[:STATUS_LOG_LINE_BYTES].decode('utf-8', 'ignore') + '...'
+            size = len(line.encode('utf-8'))
+        self.log.append(line)
+        self.log_bytes += size
+        while len(self.log) > STATUS_LOG_LINES or (self.log_bytes > STATUS_LOG_BYTES and len(self.log) > 1):
+            self.log_bytes -= len(self.log.popleft().encode('utf-8'))
+            self.log_dropped += 1
+
+    def measure_extras(self):
+        """Size of the nested fields, counted towards the record's size"""
+        self.extra_bytes = sum(
+            len(json.dumps(value)) for value in (self.build_info, self.predicted_seconds) if value
+        )
+
+    def apply(self, fields):
+        """Apply an update_conversion_status() change"""
+        for field in ('progress', 'status', 'completed', 'success', 'message', 'download_url'):
+            if field in fields:
+                setattr(self, field, fields[field])
+        if 'log' in fields:
+            self.append_log(fields['log'])
+        if 'build_info' in fields:
+            self.build_info = dict(self.build_info or {}, **fields['build_info'])
+        if 'predicted_seconds' in fields:
+            self.predicted_seconds = fields['predicted_seconds']
+        if 'build_info' in fields or 'predicted_seconds' in fields:
+            self.measure_extras()
+        if 'stage' in fields:
+            self.stage = fields['stage']
+            self.stage_started = time.time()
+            self.progress = stage_timing({
+                'stage': self.stage, 'stage_started': self.stage_started, 'predicted_seconds': self.predicted_seconds
+            })['progress']
+        self.updated = time.time()
+
+    def size(self):
+        return (STATUS_RECORD_OVERHEAD + self.log_bytes + self.extra_bytes
+                + len(self.status or '') + len(self.message or '') + len(self.download_url or ''))
+
+class StatusStore:
+    """Thread-safe in-memory status records, in least recently used order"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._records = OrderedDict()  # session_id -> (record, size)
+        self._bytes = 0
+        self._last_expiry = time.time()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._records.get(session_id)
+            if entry is None:
+                return None
+            self._records.move_to_end(session_id)
+            return entry[0].to_dict()
+
+    def set(self, session_id, data):
+        self._store(session_id, StatusRecord.from_dict(data))
+
+    def update(self, session_id, fields):
+        """Apply a change to an existing record; returns its new dict form or None"""
+        with self._lock:
+            entry = self._records.get(session_id)
+            if entry is None:
+                return None
+            record, size = entry
+            record.apply(fields)
+            self._records[session_id] = (record, record.size())
+            self._records.move_to_end(session_id)
+            self._bytes += record.size() - size
+            self._evict()
+            return record.to_dict()
+
+    def delete(self, session_id):
+        with self._lock:
+            entry = self._records.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+            return entry is not None
+
+    def _store(self, session_id, record):
+        with self._lock:
+            previous = self._records.pop(session_id, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._records[session_id] = (record, record.size())
+            self._bytes += record.size()
+            self._evict()
+
+    def _evict(self):
+        """Expire stale records and keep within the budget (lock held)"""
+        now = time.time()
+        if now - self._last_expiry > 60:
+            self._last_expiry = now
+            for session_id, (record, size) in list(self._records.items()):
+                if now - record.updated > (STATUS_TTL if record.completed else STATUS_STALE_TTL):
+                    del self._records[session_id]
+                    self._bytes -= size
+                    STATUS_EVICTIONS.inc(reason='expired')
+        if self._bytes <= self.budget:
+            return
+        # Only completed records are evicted: a running build still updates
+        # (and its journal finishes through) its record; its size is bounded
+        # by the log caps
+        for session_id, (record, size) in list(self._records.items()):
+            if self._bytes <= self.budget:
+                break
+            if record.completed:
+                del self._records[session_id]
+                self._bytes -= size
+                STATUS_EVICTIONS.inc(reason='memory')
+
+    def stats(self):
+        with self._lock:
+            return {'records': len(self._records), 'bytes': self._bytes}
+
 # Redis helpers for conversion status
 def get_conversion_status(session_id):
     """Get conversion status from Redis or memory"""
     if redis_url:
-        r = redis.from_url(redis_url)
-        status_data = r.get(f'conversion_status:{session_id}')
+        with REDIS_ROUNDTRIP_SECONDS.time(command='get'):
+            status_data = redis_client.get(f'conversion_status:{session_id}')
         return json.loads(status_data) if status_data else None
     else:
-        return conversion_status.get(session_id)
+        return status_store.get(session_id)
 
 def set_conversion_status(session_id, data):
     """Store conversion status in Redis or memory"""
     if redis_url:
-        r = redis.from_url(redis_url)
-        r.set(f'conversion_status:{session_id}', json.dumps(data))
-        # Set expiration to 1 hour
-        r.expire(f'conversion_status:{session_id}', 3600)
+        # Set with a 1 hour expiration in a single round trip
+        with REDIS_ROUNDTRIP_SECONDS.time(command='set'):
+            redis_client.set(f'conversion_status:{session_id}', json.dumps(data), ex=STATUS_TTL)
     else:
-        conversion_status[session_id] = data
+        status_store.set(session_id, data)
 
 def update_conversion_status(session_id, progress=None, status=None, completed=None, 
-                             success=None, message=None, log=None, download_url=None):
+                             success=None, message=None, log=None, download_url=None,
+                             build_info=None, stage=None, predicted_seconds=None):
     """Update conversion status fields"""
-    data = get_conversion_status(session_id)
-    if data:
-        if progress is not None:
-            data['progress'] = progress
-        if status is not None:
-            data['status'] = status
-        if completed is not None:
-            data['completed'] = completed
-        if success is not None:
-            data['success'] = success
-        if message is not None:
-            data['message'] = message
-        if log is not None:
-            data['log'].append(log)
-            logger.info(f"Session {session_id}: {log}")
-        if download_url is not None:
-            data['download_url'] = download_url
-        
+    fields = {
+        name: value for name, value in (
+            ('progress', progress), ('status', status), ('completed', completed), ('success', success),
+            ('message', message), ('log', log), ('download_url', download_url), ('build_info', build_info),
+            ('stage', stage), ('predicted_seconds', predicted_seconds)
+        ) if value is not None
+    }
+    if redis_url:
+        data = get_conversion_status(session_id)
+        if not data:
+            return
+        record = StatusRecord.from_dict(data)
+        record.apply(fields)
+        data = record.to_dict()
         set_conversion_status(session_id, data)
+    else:
+        data = status_store.update(session_id, fields)
+        if data is None:
+            return
+    if log is not None:
+        logger.info(f"Session {session_id}: {log}", extra={'session_id': session_id, 'sample': 'build_log'})
+    if completed:
+        finish_journal(session_id, data)
 
-# In-memory fallback for conversion status if Redis is not available
-conversion_status = {}
-
-# HTML template
-HTML_TEMPLATE = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Advanced Python to EXE Converter</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <style>
-        body {
-            background-color: #f8f9fa;
-            padding-top: 2rem;
-        }
-        .container {
-            max-width: 800px;
-            background-color: white;
-            border-radius: 10px;
-            padding: 30px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        }
-        .header {
-            text-align: center;
-            margin-bottom: 2rem;
-        }
-        .form-container {
-            margin-bottom: 2rem;
-        }
-        .options-container {
-            margin-top: 1.5rem;
-        }
-        .status-container {
-            margin-top: 2rem;
-        }
-        .footer {
-            text-align: center;
-            margin-top: 2rem;
-            font-size: 0.9rem;
-            color: #6c757d;
-        }
-        .progress {
-            margin-top: 20px;
-        }
-        .log-container {
-            margin-top: 20px;
-            max-height: 300px;
-            overflow-y: auto;
-            background-color: #f8f9fa;
-            padding: 10px;
-            border-radius: 5px;
-            font-family: monospace;
+# In-memory status records if Redis is not available
+status_store = StatusStore(STATUS_MEMORY_BUDGET)
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+
+# Build engines: how a PyInstaller invocation is executed
+class SubprocessEngine:
+    """Run every build as a fresh `pyinstaller` CLI process"""
+    name = 'subprocess'
+
+    def run(self, args, cwd, timeout, env=None):
+        return subprocess.run(
+            ['pyinstaller'] + args,
+            check=True,
+            capture_output=True,
+            cwd=cwd,
+            timeout=timeout,
+            env=dict(os.environ, **env) if env else None
+        )
+
+class ForkServerEngine:
+    """Fork builds off a warm server process that already imported PyInstaller.
+
+    The server (forkserver.py) is started on first use. If it cannot be
+    started or reached, the build transparently runs on the fallback engine.
+    """
+    name = 'forkserver'
+
+    def __init__(self, fallback, startup_timeout=60):
+        self.fallback = fallback
+        self.startup_timeout = startup_timeout
+        self._lock = threading.Lock()
+        self._process = None
+        self._authkey = os.urandom(32)
+        self._socket_path = None
+
+    def start(self):
+        """Start the fork server now instead of on the first build"""
+        self._ensure_server()
+
+    def _ensure_server(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            if self._socket_path is None:
+                self._socket_path = os.path.join(tempfile.mkdtemp(prefix='forkserver-'), 'pyinstaller.sock')
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+            logger.info("Starting PyInstaller fork server")
+            self._process = subprocess.Popen(
+                [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'forkserver.py'), self._socket_path],
+                stdin=subprocess.PIPE,
+                env=dict(os.environ, FORKSERVER_AUTHKEY=self._authkey.hex())
+            )
+            deadline = time.time() + self.startup_timeout
+            while not os.path.exists(self._socket_path):
+                if self._process.poll() is not None or time.time() > deadline:
+                    self._process.kill()
+                    raise RuntimeError('PyInstaller fork server failed to start')
+                time.sleep(0.05)
+
+    def stop(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.terminate()
+            self._process = None
+
+    def run(self, args, cwd, timeout, env=None):
+        cmd = ['pyinstaller'] + args
+        # Interpreter flags are fixed once the server has started
+        if env and 'PYTHONOPTIMIZE' in env:
+            return self.fallback.run(args, cwd, timeout, env)
+        import multiprocessing.connection  # Build-only; kept off the web tier's import path
+        try:
+            self._ensure_server()
+            conn = multiprocessing.connection.Client(self._socket_path, family='AF_UNIX', authkey=self._authkey)
+        except Exception as e:
+            logger.warning(f"Fork server unavailable, using {self.fallback.name} engine: {str(e)}")
+            return self.fallback.run(args, cwd, timeout, env)
+
+        with conn:
+            conn.send({'argv': args, 'cwd': cwd, 'env': env})
+            _, pid = conn.recv()
+            if not conn.poll(timeout):
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            _, returncode, stdout, stderr = conn.recv()
+
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+def create_build_engine(name):
+    """Build engine selected by PYINSTALLER_ENGINE ("forkserver" or "subprocess")"""
+    if name == 'forkserver' and hasattr(os, 'fork'):
+        return ForkServerEngine(fallback=SubprocessEngine())
+    return SubprocessEngine()
+
+build_engine = create_build_engine(os.environ.get('PYINSTALLER_ENGINE', 'forkserver'))
+if isinstance(build_engine, ForkServerEngine):
+    atexit.register(build_engine.stop)
+
+# Build scheduling
+BUILD_WORKERS = int(os.environ.get('BUILD_WORKERS', 2))
+# Waiting time (seconds) after which a queued job counts as one unit cheaper,
+# so large jobs are not starved by a steady stream of small ones
+SCHEDULER_AGING_SECONDS = float(os.environ.get('SCHEDULER_AGING_SECONDS', 60))
+# Queue waits of jobs started within this many seconds make up the average wait
+QUEUE_WAIT_WINDOW = 600
+# Queue positions are computed for the whole queue at once and reused until
+# the queue changes, or for at most this long (aging slowly reorders jobs)
+QUEUE_POSITION_MAX_AGE = 5
+
+def parse_client_weights(value):
+    """Parse CLIENT_WEIGHTS ("api_key:weight,api_key:weight") into a dict"""
+    weights = {}
+    for item in (value or '').split(','):
+        if ':' not in item:
+            continue
+        key, weight = item.rsplit(':', 1)
+        try:
+            weights[key.strip()] = max(float(weight), 0.1)
+        except ValueError:
+            logger.warning(f"Ignoring invalid client weight: {item}")
+    return weights
+
+CLIENT_WEIGHTS = parse_client_weights(os.environ.get('CLIENT_WEIGHTS', ''))
+
+def get_client_identity():
+    """Identify the submitting client by API key, session cookie or address.
+
+    Returns a (client_id, weight) tuple. API keys may be given a weight via
+    CLIENT_WEIGHTS; everyone else gets the default weight of 1. The session
+    id is minted when a browser loads the page; clients without it (curl,
+    scripts, CI) are one client per address, so resubmitting without a
+    cookie cannot turn one caller into many fair-share clients.
+    """
+    api_key = request.headers.get('X-API-Key') or request.form.get('api_key')
+    if api_key:
+        digest = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+        return f'key:{digest}', CLIENT_WEIGHTS.get(api_key, 1.0)
+
+    client_id = session.get('client_id')
+    if client_id:
+        return f'session:{client_id}', 1.0
+    return f"addr:{client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'))}", 1.0
+
+def estimate_job_cost(options):
+    """Rough relative cost of a build, used for shortest-job-first ordering"""
+    try:
+        script_size = os.path.getsize(options['file_path'])
+    except OSError:
+        script_size = 0
+    packages = [pkg for pkg in options['packages'].split(',') if pkg.strip()]
+    extra_size = 0
+    for extra_file in options['extra_files']:
+        try:
+            extra_size += os.path.getsize(extra_file)
+        except OSError:
+            pass
+    # A bare build is one unit; every installed package costs roughly as much
+    # again, while script and asset size only matter at larger scales
+    return 1.0 + 1.0 * len(packages) + script_size / (100 * 1024) + extra_size / (10 * 1024 * 1024)
+
+class BuildScheduler:
+    """Fair-share queue feeding a fixed pool of build worker threads.
+
+    Every client gets its own queue ordered shortest-job-first (with aging).
+    Clients are served by stride scheduling: the client with the lowest
+    "pass" goes next and its pass then advances by job cost / weight, so a
+    client with 50 queued jobs only gets its weighted share of the workers.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._queues = {}       # client_id -> [job, ...]
+        self._weights = {}      # client_id -> weight
+        self._passes = {}       # client_id -> accumulated weighted service
+        self._virtual_time = 0.0
+        self._active = {}       # session_id -> job
+        self._threads = []
+        self._seq = 0
+        self._waits = deque()   # (started, seconds waited) of recently started jobs
+        self._positions = None  # session_id -> queue position, until the queue changes
+        self._positions_at = 0.0
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._cond:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'build-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {self.workers} build workers")
+
+    def submit(self, session_id, options, client_id, weight=1.0):
+        """Queue a conversion job for the given client"""
+        with self._cond:
+            queue = self._queues.setdefault(client_id, [])
+            if not queue:
+                # A client coming back from idle must not cash in credit it
+                # banked while it had nothing queued
+                self._passes[client_id] = max(self._passes.get(client_id, 0.0), self._virtual_time)
+            self._weights[client_id] = weight
+            self._seq += 1
+            queue.append({
+                'session_id': session_id,
+                'options': options,
+                'client_id': client_id,
+                'cost': estimate_job_cost(options),
+                'seq': self._seq,
+                'enqueued_at': time.time(),
+            })
+            self._positions = None
+            self._cond.notify()
+        self.start()
+
+    def _job_key(self, job, now):
+        return (job['cost'] - (now - job['enqueued_at']) / SCHEDULER_AGING_SECONDS, job['seq'])
+
+    def _pick(self, queues, passes, now):
+        """Pick the next job from the given queues (mutates queues and passes)"""
+        client_id = min((c for c, q in queues.items() if q), key=lambda c: (passes[c], c))
+        queue = queues[client_id]
+        job = min(queue, key=lambda j: self._job_key(j, now))
+        queue.remove(job)
+        virtual_time = passes[client_id]
+        passes[client_id] += job['cost'] / self._weights.get(client_id, 1.0)
+        return job, virtual_time
+
+    def _next_job(self):
+        with self._cond:
+            while not any(self._queues.values()):
+                self._cond.wait()
+            now = time.time()
+            job, self._virtual_time = self._pick(self._queues, self._passes, now)
+            self._positions = None
+            self._active[job['session_id']] = job
+            self._waits.append((now, now - job['enqueued_at']))
+            return job
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            BUILD_STAGE_SECONDS.observe(time.time() - job['enqueued_at'], stage='queue_wait')
+            log_context.session_id = job['session_id']
+            try:
+                convert_in_background(job['session_id'], job['options'])
+            except Exception as e:
+                logger.error(f"Build worker error for session {job['session_id']}: {str(e)}")
+            finally:
+                log_context.session_id = log_context.stage = None
+                release_job_lock(job['session_id'])
+                with self._cond:
+                    self._active.pop(job['session_id'], None)
+
+    def _dispatch_order(self, now):
+        """Session ids of all queued jobs in the order _pick() would start them"""
+        # Each client's queue sorted once (last job first), then stride scheduling
+        queues = {c: sorted(q, key=lambda j: self._job_key(j, now), reverse=True)
+                  for c, q in self._queues.items() if q}
+        passes = {c: self._passes[c] for c in queues}
+        order = []
+        while queues:
+            client_id = min(queues, key=lambda c: (passes[c], c))
+            job = queues[client_id].pop()
+            if not queues[client_id]:
+                del queues[client_id]
+            passes[client_id] += job['cost'] / self._weights.get(client_id, 1.0)
+            order.append(job['session_id'])
+        return order
+
+    def queue_position(self, session_id):
+        """1-based dispatch position of a queued job, or None if not queued"""
+        with self._cond:
+            now = time.time()
+            if self._positions is None or now - self._positions_at > QUEUE_POSITION_MAX_AGE:
+                self._positions = {sid: i for i, sid in enumerate(self._dispatch_order(now), 1)}
+                self._positions_at = now
+            return self._positions.get(session_id)
+
+    def queue_depth(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def active_count(self):
+        with self._cond:
+            return len(self._active)
+
+    def free_slots(self):
+        with self._cond:
+            return max(self.workers - len(self._active), 0)
+
+    def wait_stats(self):
+        """Average queue wait of recently started jobs and the oldest queued job's wait"""
+        with self._cond:
+            now = time.time()
+            while self._waits and now - self._waits[0][0] > QUEUE_WAIT_WINDOW:
+                self._waits.popleft()
+            waits = [seconds for _, seconds in self._waits]
+            queued = [job['enqueued_at'] for q in self._queues.values() for job in q]
+            return {
+                'average_wait_seconds': round(sum(waits) / len(waits), 1) if waits else 0.0,
+                'oldest_queued_seconds': round(now - min(queued), 1) if queued else 0.0
+            }
+
+    def workers_alive(self):
+        """False if a started worker thread has died"""
+        with self._cond:
+            return all(thread.is_alive() for thread in self._threads)
+
+scheduler = BuildScheduler(BUILD_WORKERS)
+
+def build_download_url(options, session_id, filename):
+    """Build the download URL from a worker thread (no request context there)"""
+    return url_for_worker(options, 'download_file', session_id=session_id, filename=filename)
+
+def url_for_worker(options, endpoint, **values):
+    """url_for() for worker threads, under the script root the job came from"""
+    adapter = app.url_map.bind('localhost', script_name=options.get('script_root') or '/')
+    return adapter.build(endpoint, values)
+
+def parse_build_options(form):
+    """Build options shared by the upload and paste forms"""
+    try:
+        optimize = min(max(int(form.get('optimize', 0)), 0), 2)
+    except ValueError:
+        optimize = 0
+    engine = form.get('engine', 'pyinstaller')
+    if engine not in ('pyinstaller', 'nuitka'):
+        raise ValueError(f'Unknown build engine: {engine}')
+    if engine == 'nuitka' and not NUITKA_AVAILABLE:
+        raise ValueError('The Nuitka engine is not available on this server')
+    try:
+        shlex.split(form.get('benchmark_args', ''))
+    except ValueError as e:
+        raise ValueError(f'Invalid benchmark arguments: {str(e)}')
+    callback_url = form.get('callback_url', '').strip()
+    if callback_url:
+        validate_callback_url(callback_url)
+    return {
+        'one_file': 'one_file' in form,
+        'console': 'console' in form,
+        'uac': 'uac' in form,
+        'debug': 'debug' in form,
+        'packages': form.get('packages', ''),
+        'platform': form.get('platform', 'auto'),
+        'optimize': optimize,
+        'strip': 'strip' in form,
+        'upx': 'upx' in form,
+        'exclude_unused': 'exclude_unused' in form,
+        'engine': engine,
+        'benchmark': 'benchmark' in form,
+        'benchmark_args': form.get('benchmark_args', ''),
+        'profile': 'profile' in form,
+        'iterate': iteration_options(form),
+        # Completion webhook (see queue_completion_webhook)
+        'callback_url': callback_url or None,
+        'callback_secret': form.get('callback_secret', '')
+    }
+
+def enqueue_conversion(session_id, options):
+    """Register a new conversion job and hand it to the scheduler"""
+    client_id, weight = get_client_identity()
+    options['script_root'] = request.script_root
+    options['host_url'] = request.host_url
+    # The journal is a plain file in the work dir: keep the secret out of it
+    callback_secret = options.pop('callback_secret', '')
+    options['callback_signed'] = bool(callback_secret)
+    if callback_secret:
+        stash_callback_secret(session_id, callback_secret)
+    # Lock before the journal exists, so recovery never mistakes it for orphaned
+    hold_job_lock(session_id)
+    write_journal(session_id, {
+        'session_id': session_id,
+        'state': 'queued',
+        'options': options,
+        'client_id': client_id,
+        'weight': weight,
+        'attempts': 1,
+        'stages': {},
+        'created': time.time()
+    })
+    set_conversion_status(session_id, {
+        'progress': 0,
+        'status': 'Waiting in queue...',
+        'completed': False,
+        'success': False,
+        'message': '',
+        'log': [],
+        'download_url': None,
+        'timestamp': time.time()
+    })
+    scheduler.submit(session_id, options, client_id, weight)
+
+# Job journal: a JSON file per job in its work dir, atomically replaced after
+# every completed stage. Each queued or running job also holds an flock on a
+# lock file; the kernel drops it when the owning process dies, which is how
+# recover_interrupted_jobs() tells orphaned jobs from ones still in progress.
+# Dot-prefixed names cannot collide with uploads (secure_filename strips them).
+JOURNAL_FILENAME = '.journal.json'
+JOB_LOCK_FILENAME = '.job.lock'
+MAX_JOB_ATTEMPTS = int(os.environ.get('MAX_JOB_ATTEMPTS', 3))
+JOURNAL_RECOVERY_INTERVAL = int(os.environ.get('JOURNAL_RECOVERY_INTERVAL', 60))
+
+_job_locks = {}  # session_id -> open lock file
+_job_locks_lock = threading.Lock()
+
+def journal_path(session_id):
+    return os.path.join(app.config['UPLOAD_FOLDER'], session_id, JOURNAL_FILENAME)
+
+def read_journal(session_id):
+    try:
+        with open(journal_path(session_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_journal(session_id, journal):
+    """Replace the job's journal atomically (write, fsync, rename)"""
+    path = journal_path(session_id)
+    journal['updated'] = time.time()
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(journal, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def update_journal(session_id, **fields):
+    journal = read_journal(session_id)
+    if journal is not None:
+        journal.update(fields)
+        write_journal(session_id, journal)
+
+def record_stage(session_id, stage, **result):
+    """Mark a build stage as completed, with whatever a resume needs from it"""
+    journal = read_journal(session_id)
+    if journal is not None:
+        journal['stages'][stage] = dict(result, completed=time.time())
+        write_journal(session_id, journal)
+
+def completed_stage(session_id, stage):
+    """The recorded result of a completed stage, or None"""
+    return ((read_journal(session_id) or {}).get('stages') or {}).get(stage)
+
+def finish_journal(session_id, status):
+    journal = read_journal(session_id)
+    if journal is None or journal['state'] == 'done':
+        return
+    journal.update(state='done', result={
+        key: status.get(key) for key in ('status', 'success', 'message', 'download_url', 'build_info')
+    })
+    write_journal(session_id, journal)
+    if journal['options'].get('callback_url'):
+        queue_completion_webhook(session_id, journal['options'], journal['result'])
+
+def hold_job_lock(session_id):
+    """Lock the job for this process; returns False if another process holds it"""
+    if fcntl is None:
+        return True
+    with _job_locks_lock:
+        if session_id in _job_locks:
+            return False
+        try:
+            lock_file = open(os.path.join(app.config['UPLOAD_FOLDER'], session_id, JOB_LOCK_FILENAME), 'w')
+        except OSError:
+            return False
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        _job_locks[session_id] = lock_file
+        return True
+
+def release_job_lock(session_id):
+    with _job_locks_lock:
+        lock_file = _job_locks.pop(session_id, None)
+    if lock_file is not None:
+        lock_file.close()
+
+def recover_interrupted_jobs():
+    """Requeue journaled jobs whose process died before they finished"""
+    for session_id in os.listdir(app.config['UPLOAD_FOLDER']):
+        journal = read_journal(session_id)
+        if not journal or journal.get('state') == 'done':
+            continue
+        if not hold_job_lock(session_id):
+            continue  # Still queued or running in a live process
+        
+        if journal['attempts'] >= MAX_JOB_ATTEMPTS:
+            logger.warning(f"Giving up on session {session_id} after {journal['attempts']} interrupted attempts",
+                           extra={'session_id': session_id})
+            set_conversion_status(session_id, dict(
+                get_conversion_status(session_id) or {'log': [], 'download_url': None, 'timestamp': time.time()},
+                progress=100, status='Conversion failed', completed=True, success=False,
+                message='The conversion was interrupted by repeated server restarts.'
+            ))
+            finish_journal(session_id, get_conversion_status(session_id))
+            release_job_lock(session_id)
+            continue
+        
+        journal.update(state='queued', attempts=journal['attempts'] + 1)
+        write_journal(session_id, journal)
+        status = get_conversion_status(session_id) or {
+            'progress': 0, 'success': False, 'message': '', 'log': [],
+            'download_url': None, 'timestamp': journal['created']
         }
-        #statusMessage {
-            font-weight: bold;
+        status.update(status='Resuming after a server restart...', completed=False)
+        status['log'].append(f"Server restarted; resuming (attempt {journal['attempts']} of {MAX_JOB_ATTEMPTS})")
+        set_conversion_status(session_id, status)
+        logger.info(f"Requeued interrupted conversion: {session_id}", extra={'session_id': session_id})
+        scheduler.submit(session_id, journal['options'], journal['client_id'], journal['weight'])
+
+def journal_recovery_loop():
+    while True:
+        try:
+            recover_interrupted_jobs()
+        except Exception as e:
+            logger.error(f"Error during job recovery: {str(e)}")
+        time.sleep(JOURNAL_RECOVERY_INTERVAL)
+
+# Completion webhooks: a job submitted with a callback_url gets a POST when it
+# completes or fails. Deliveries are handed to a few dispatcher threads, so
+# build workers never wait on a slow receiver, and retried with exponential
+# backoff on errors and non-2xx responses. With a secret (the job's
+# callback_secret, else WEBHOOK_SECRET) the request carries
+# X-Webhook-Signature: sha256=HMAC(secret, "<X-Webhook-Timestamp>.<body>");
+# webhook_receiver.py verifies it.
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 2))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 6))
+WEBHOOK_TIMEOUT = 10
+# Delay before the first retry; doubled after every further failure
+WEBHOOK_BACKOFF_SECONDS = float(os.environ.get('WEBHOOK_BACKOFF_SECONDS', 5))
+# Receivers on loopback/private/link-local addresses (e.g. for local testing
+# with webhook_receiver.py); off by default, as anyone may submit a callback_url
+WEBHOOK_ALLOW_PRIVATE = os.environ.get('WEBHOOK_ALLOW_PRIVATE', 'false').lower() == 'true'
+# A job's callback_secret never goes into its journal: it waits in Redis when
+# configured, else in the memory of the process that accepted the job. A job
+# recovered after that process died then skips its webhook rather than
+# sending it with the wrong signature.
+CALLBACK_SECRET_TTL = 7 * 24 * 3600
+_callback_secrets = {}  # session_id -> secret
+
+def stash_callback_secret(session_id, secret):
+    if redis_url:
+        with REDIS_ROUNDTRIP_SECONDS.time(command='set'):
+            redis_client.set(f'callback_secret:{session_id}', secret, ex=CALLBACK_SECRET_TTL)
+    else:
+        _callback_secrets[session_id] = secret
+
+def take_callback_secret(session_id):
+    """The job's callback_secret, removed from where it was kept; None if lost"""
+    if redis_url:
+        key = f'callback_secret:{session_id}'
+        with REDIS_ROUNDTRIP_SECONDS.time(command='get'):
+            secret = redis_client.get(key)
+        redis_client.delete(key)
+        return secret.decode('utf-8') if secret is not None else None
+    return _callback_secrets.pop(session_id, None)
+
+def validate_callback_url(url):
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname or len(url) > 2048:
+        raise ValueError('callback_url must be an http(s) URL')
+    return url
+
+def resolve_callback_address(host, port):
+    """The address to deliver to, or None if the host resolves to a private one.
+
+    The request is then made to this very address, so a second DNS lookup
+    cannot point it somewhere else (DNS rebinding).
+    """
+    import ipaddress
+    addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    if not WEBHOOK_ALLOW_PRIVATE and not all(
+            ipaddress.ip_address(address.split('%')[0]).is_global for address in addresses):
+        return None
+    return addresses[0]
+
+class PinnedHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection to an address vetted beforehand, never a new lookup"""
+
+    def __init__(self, host, address, port, timeout):
+        super().__init__(host, port, timeout=timeout)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+class PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection to an address vetted beforehand; the certificate is
+    still verified for the host name"""
+
+    def __init__(self, host, address, port, timeout):
+        self.ssl_context = ssl.create_default_context()
+        super().__init__(host, port, timeout=timeout, context=self.ssl_context)
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self.ssl_context.wrap_socket(sock, server_hostname=self.host)
+
+def post_webhook(url, body, headers):
+    """POST to the callback once; returns None on a 2xx response, else the error.
+
+    Uses http.client, which never follows redirects: a 3xx is a failure
+    rather than a way to reach an unchecked host.
+    """
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    address = resolve_callback_address(parts.hostname, port)
+    if address is None:
+        return 'blocked'
+    
+    connection_class = PinnedHTTPSConnection if parts.scheme == 'https' else PinnedHTTPConnection
+    connection = connection_class(parts.hostname, address, port, WEBHOOK_TIMEOUT)
+    try:
+        path = parts.path or '/'
+        connection.request('POST', f'{path}?{parts.query}' if parts.query else path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read(64 * 1024)
+        return None if 200 <= response.status < 300 else f'HTTP {response.status}'
+    finally:
+        connection.close()
+
+def sign_webhook(secret, timestamp, body):
+    import hmac
+    return hmac.new(secret.encode('utf-8'), f'{timestamp}.'.encode('utf-8') + body, hashlib.sha256).hexdigest()
+
+def queue_completion_webhook(session_id, options, result):
+    """Queue the completion callback of a finished job"""
+    secret = WEBHOOK_SECRET
+    if options.get('callback_signed'):
+        secret = take_callback_secret(session_id)
+        if secret is None:
+            logger.warning("Webhook not sent: the job's callback_secret did not survive a restart",
+                           extra={'session_id': session_id})
+            return
+    download_url = result.get('download_url')
+    if download_url and options.get('host_url'):
+        download_url = options['host_url'].rstrip('/') + download_url
+    payload = {
+        'event': 'conversion.completed' if result.get('success') else 'conversion.failed',
+        'session_id': session_id,
+        'success': bool(result.get('success')),
+        'status': result.get('status'),
+        'message': result.get('message'),
+        'download_url': download_url,
+        'job_token': issue_job_token(session_id),
+        'build_info': result.get('build_info') or {},
+        'timestamp': time.time()
+    }
+    webhook_dispatcher.submit({
+        'id': str(uuid.uuid4()),
+        'session_id': session_id,
+        'url': options['callback_url'],
+        'secret': secret,
+        'event': payload['event'],
+        'body': json.dumps(payload).encode('utf-8'),
+        'attempts': 0
+    })
+
+class WebhookDispatcher:
+    """Delivers webhooks from a few background threads, retrying with backoff"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._pending = []      # heap of (due time, seq, delivery)
+        self._threads = []
+        self._seq = 0
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'webhook-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, delivery, delay=0.0):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._pending, (time.time() + delay, self._seq, delivery))
+            self._cond.notify()
+        self.start()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _next_delivery(self):
+        with self._cond:
+            while True:
+                if self._pending:
+                    wait = self._pending[0][0] - time.time()
+                    if wait <= 0:
+                        return heapq.heappop(self._pending)[2]
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _worker(self):
+        while True:
+            delivery = self._next_delivery()
+            try:
+                self._attempt(delivery)
+            except Exception as e:
+                logger.error(f"Webhook dispatcher error: {str(e)}")
+
+    def _attempt(self, delivery):
+        session_id = delivery['session_id']
+        delivery['attempts'] += 1
+        timestamp = str(int(time.time()))
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'py2exe-converter-webhook',
+            'X-Webhook-Id': delivery['id'],
+            'X-Webhook-Event': delivery['event'],
+            'X-Webhook-Timestamp': timestamp,
+            'X-Webhook-Attempt': str(delivery['attempts'])
         }
-        .nav-tabs {
-            margin-bottom: 20px;
+        if delivery['secret']:
+            headers['X-Webhook-Signature'] = f"sha256={sign_webhook(delivery['secret'], timestamp, delivery['body'])}"
+        
+        started = time.perf_counter()
+        try:
+            error = post_webhook(delivery['url'], delivery['body'], headers)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        WEBHOOK_SECONDS.observe(time.perf_counter() - started)
+        
+        if error == 'blocked':
+            WEBHOOK_DELIVERIES.inc(outcome='blocked')
+            logger.warning(f"Webhook to a private address refused: {delivery['url']}", extra={'session_id': session_id})
+        elif error is None:
+            WEBHOOK_DELIVERIES.inc(outcome='delivered')
+            logger.info(f"Webhook delivered to {delivery['url']}", extra={'session_id': session_id})
+        elif delivery['attempts'] >= WEBHOOK_MAX_ATTEMPTS:
+            WEBHOOK_DELIVERIES.inc(outcome='failed')
+            logger.warning(f"Giving up on webhook to {delivery['url']} after {delivery['attempts']} attempts: {error}",
+                           extra={'session_id': session_id})
+        else:
+            WEBHOOK_DELIVERIES.inc(outcome='retry')
+            delay = WEBHOOK_BACKOFF_SECONDS * 2 ** (delivery['attempts'] - 1) * random.uniform(0.8, 1.2)
+            logger.info(f"Webhook to {delivery['url']} failed ({error}); retrying in {delay:.0f}s",
+                        extra={'session_id': session_id})
+            self.submit(delivery, delay)
+
+webhook_dispatcher = WebhookDispatcher(WEBHOOK_WORKERS)
+
+# Rate limiting: per-IP token buckets at the API edge
+# Group -> (tokens per second, burst); a rate of 0 disables the group
+RATE_LIMITS = {
+    'build': (float(os.environ.get('RATE_LIMIT_BUILDS_PER_MINUTE', 10)) / 60,
+              int(os.environ.get('RATE_LIMIT_BUILD_BURST', 5))),
+    'status': (float(os.environ.get('RATE_LIMIT_STATUS_PER_SECOND', 2)),
+               int(os.environ.get('RATE_LIMIT_STATUS_BURST', 20))),
+    # Chunk PUTs of /uploads; a large file is hundreds of them
+    'upload': (float(os.environ.get('RATE_LIMIT_UPLOAD_CHUNKS_PER_MINUTE', 240)) / 60,
+               int(os.environ.get('RATE_LIMIT_UPLOAD_CHUNK_BURST', 32))),
+}
+RATE_LIMITED_ENDPOINTS = {
+    'upload_file': 'build', 'paste_code': 'build', 'get_status': 'status',
+    'init_upload': 'build', 'finalize_upload': 'build', 'get_upload': 'status', 'upload_chunk': 'upload'
+}
+# Number of reverse proxies in front of the app that append to X-Forwarded-For
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1 if ON_RENDER else 0))
+RATE_LIMIT_MAX_BUCKETS = 100000
+
+# Same algorithm as take_token(), atomically in Redis. TIME makes the script
+# non-deterministic, which older Redis versions only allow after
+# replicate_commands().
+RATE_LIMIT_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    tokens = math.max(tokens - 1, -burst)
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(2 * burst / rate) + 1)
+return tostring(retry_after)
+"""
+
+def take_token(bucket, rate, burst, now):
+    """Take a token from a bucket dict; returns 0 if allowed, else seconds to wait.
+
+    Rejected requests still draw from the bucket (down to -burst), so a
+    client that ignores Retry-After is told to wait longer each time.
+    """
+    tokens = min(burst, bucket.get('tokens', burst) + max(now - bucket.get('updated', now), 0) * rate)
+    retry_after = 0.0
+    if tokens >= 1:
+        tokens -= 1
+    else:
+        tokens = max(tokens - 1, -burst)
+        retry_after = (1 - tokens) / rate
+    bucket.update(tokens=tokens, updated=now)
+    return retry_after
+
+class RateLimiter:
+    """Token buckets shared through Redis when configured, else in this process"""
+
+    def __init__(self, max_buckets=RATE_LIMIT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._script = None
+
+    def acquire(self, key, rate, burst):
+        """Take a token for key; returns 0 if allowed, else seconds until retry"""
+        if redis_url:
+            try:
+                if self._script is None:
+                    self._script = redis_client.register_script(RATE_LIMIT_SCRIPT)
+                with REDIS_ROUNDTRIP_SECONDS.time(command='ratelimit'):
+                    return float(self._script(keys=[key], args=[rate, burst]))
+            except Exception as e:
+                # Fail open: a Redis hiccup must not take the API down
+                logger.warning(f"Rate limiter unavailable: {str(e)}")
+                return 0.0
+        return self.acquire_local(key, rate, burst)
+
+    def acquire_local(self, key, rate, burst):
+        with self._lock:
+            bucket = self._buckets.pop(key, None) or {}
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            return take_token(bucket, rate, burst, time.monotonic())
+
+rate_limiter = RateLimiter()
+
+def client_ip(remote_addr, forwarded_for):
+    """Client address, looking through TRUSTED_PROXY_HOPS proxies"""
+    if TRUSTED_PROXY_HOPS and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',')]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return remote_addr or 'unknown'
+
+def rate_limited_payload(group, retry_after):
+    """429 body and headers; Retry-After tells clients how long to back off"""
+    RATE_LIMITED_REQUESTS.inc(group=group)
+    seconds = math.ceil(retry_after)
+    payload = dict(success=False, message=f'Too many requests. Please retry in {seconds} seconds.',
+                   retry_after=seconds)
+    return payload, {'Retry-After': str(seconds)}
+
+@app.before_request
+def enforce_rate_limits():
+    group = RATE_LIMITED_ENDPOINTS.get(request.endpoint)
+    if group is None or RATE_LIMITS[group][0] <= 0:
+        return None
+    rate, burst = RATE_LIMITS[group]
+    ip = client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'))
+    retry_after = rate_limiter.acquire(f'ratelimit:{group}:{ip}', rate, burst)
+    if retry_after:
+        payload, headers = rate_limited_payload(group, retry_after)
+        return jsonify(payload), 429, headers
+    return None
+
+# Job tokens: /upload and /paste return a signed token naming the job, which
+# /status, /events, /download, /profile and /cleanup accept as ?token=, an
+# X-Job-Token header or "Authorization: Bearer <token>". It is checked
+# without any lookup, and requests that carry one (or an API key) never
+# touch the session store. Requests for a job without its token are refused,
+# so a leaked session id (logs, URLs) is not enough; REQUIRE_JOB_TOKEN=false
+# lets tokenless requests through, but a token that does not check out is
+# still refused. Tokens are signed with SECRET_KEY.
+JOB_TOKEN_MAX_AGE = int(os.environ.get('JOB_TOKEN_MAX_AGE', 7 * 24 * 3600))
+REQUIRE_JOB_TOKEN = os.environ.get('REQUIRE_JOB_TOKEN', 'True').lower() == 'true'
+JOB_TOKEN_ENDPOINTS = {'get_status', 'download_file', 'download_profile', 'cleanup'}
+JOB_TOKEN_ERRORS = {
+    'missing': 'A job token is required (the job_token returned when the job was submitted)',
+    'expired': 'Job token expired',
+    'invalid': 'Invalid job token',
+    'mismatch': 'Job token is for another job'
+}
+
+def job_token_serializer():
+    return URLSafeTimedSerializer(app.secret_key, salt='job-token')
+
+def issue_job_token(session_id):
+    return job_token_serializer().dumps(session_id)
+
+def request_job_token(headers, args):
+    """Job token sent with a request; header names are looked up in lower case"""
+    authorization = headers.get('authorization', '')
+    if authorization.startswith('Bearer '):
+        return authorization[len('Bearer '):].strip()
+    return headers.get('x-job-token') or args.get('token')
+
+def job_token_rejection(session_id, token):
+    """Why a request for the job must be refused (a JOB_TOKEN_ERRORS key), or None"""
+    if not token:
+        return 'missing' if REQUIRE_JOB_TOKEN else None
+    try:
+        token_session_id = job_token_serializer().loads(token, max_age=JOB_TOKEN_MAX_AGE)
+    except SignatureExpired:
+        return 'expired'
+    except BadSignature:
+        return 'invalid'
+    return None if token_session_id == session_id else 'mismatch'
+
+def job_token_denied_payload(reason):
+    JOB_TOKEN_REJECTIONS.inc(reason=reason)
+    return dict(success=False, message=JOB_TOKEN_ERRORS[reason])
+
+@app.before_request
+def enforce_job_tokens():
+    if request.endpoint not in JOB_TOKEN_ENDPOINTS:
+        return None
+    reason = job_token_rejection(request.view_args.get('session_id'), request_job_token(request.headers, request.args))
+    if reason:
+        return jsonify(job_token_denied_payload(reason)), 403
+    return None
+
+class StatelessSession(SecureCookieSession):
+    """Session of a token-authenticated request: starts empty and is never saved"""
+
+class JobTokenSessionInterface(SessionInterface):
+    """Wraps the configured session interface, skipping the store for requests
+    that identify themselves with a job token or API key"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        if request.headers.get('X-API-Key') or request_job_token(request.headers, request.args):
+            return StatelessSession()
+        return self.store.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if isinstance(session, StatelessSession):
+            return None
+        return self.store.save_session(app, session, response)
+
+# Static assets and page caching
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+# Versioned asset URLs never change content, so browsers may keep them a year
+STATIC_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_MIMETYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+def compress_variants(data, mimetype):
+    """Encoded variants of a response body, keyed by content-coding"""
+    variants = {'identity': data}
+    if len(data) > 1024 and mimetype.startswith(COMPRESSIBLE_MIMETYPES):
+        variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+    return variants
+
+def negotiated_response(variants, etag, mimetype, cache_control):
+    """Serve the best encoding the client accepts, with ETag/304 handling"""
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in variants and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    response = app.response_class(variants[encoding], mimetype=mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(f'{etag}-{encoding}')
+    return response.make_conditional(request)
+
+class StaticAssets:
+    """Files under static/, read once and compressed once per process"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        """Cached asset for a filename, or None if it does not exist"""
+        asset = self._assets.get(filename)
+        if asset is not None:
+            return asset
+        path = safe_join(self.folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        asset = {
+            'version': hashlib.sha256(data).hexdigest()[:12],
+            'mimetype': mimetype,
+            'variants': compress_variants(data, mimetype)
         }
-        #codeEditor {
-            width: 100%;
-            min-height: 200px;
-            font-family: monospace;
-            border: 1px solid #ced4da;
-            border-radius: 4px;
-            padding: 10px;
+        with self._lock:
+            self._assets[filename] = asset
+        return asset
+
+    def url(self, filename):
+        """URL of an asset with its content hash, for far-future caching"""
+        asset = self.get(filename)
+        return url_for('static', filename=filename, v=asset['version'] if asset else None)
+
+static_assets = StaticAssets(STATIC_FOLDER)
+app.jinja_env.globals['asset_url'] = static_assets.url
+
+@app.route('/static/<path:filename>', endpoint='static')
+def static_asset(filename):
+    asset = static_assets.get(filename)
+    if asset is None:
+        return 'Not found', 404
+    if request.args.get('v') == asset['version']:
+        cache_control = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    else:
+        cache_control = 'no-cache'
+    return negotiated_response(asset['variants'], asset['version'], asset['mimetype'], cache_control)
+
+# The index page only varies with the year unless flash messages are pending,
+# so the rendered and compressed page is cached per year
+index_page_cache = {}
+
+@app.route('/')
+def index():
+    # The page's own fair-share identity (see get_client_identity)
+    if not session.get('client_id'):
+        session['client_id'] = str(uuid.uuid4())
+    
+    if session.get('_flashes'):
+        return render_template('index.html', current_year=datetime.now().year, download_link=None,
+                               nuitka_available=NUITKA_AVAILABLE)
+    
+    year = datetime.now().year
+    page = index_page_cache.get(year)
+    if page is None:
+        html = render_template('index.html', current_year=year, download_link=None,
+                               nuitka_available=NUITKA_AVAILABLE).encode('utf-8')
+        page = {
+            'etag': hashlib.sha256(html).hexdigest()[:16],
+            'variants': compress_variants(html, 'text/html')
         }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>Advanced Python to EXE Converter</h1>
-            <p class="lead">Convert your Python scripts to executable files</p>
-        </div>
-        
-        {% with messages = get_flashed_messages(with_categories=true) %}
-            {% if messages %}
-                {% for category, message in messages %}
-                    <div class="alert alert-{{ category }}">{{ message }}</div>
-                {% endfor %}
-            {% endif %}
-        {% endwith %}
-
-        <div class="form-container">
-            <ul class="nav nav-tabs" id="inputTabs" role="tablist">
-                <li class="nav-item" role="presentation">
-                    <button class="nav-link active" id="upload-tab" data-bs-toggle="tab" data-bs-target="#upload-tab-pane" type="button" role="tab" aria-controls="upload-tab-pane" aria-selected="true">Upload File</button>
-                </li>
-                <li class="nav-item" role="presentation">
-                    <button class="nav-link" id="paste-tab" data-bs-toggle="tab" data-bs-target="#paste-tab-pane" type="button" role="tab" aria-controls="paste-tab-pane" aria-selected="false">Paste Code</button>
-                </li>
-            </ul>
-            
-            <div class="tab-content" id="inputTabsContent">
-                <div class="tab-pane fade show active" id="upload-tab-pane" role="tabpanel" aria-labelledby="upload-tab" tabindex="0">
-                    <form method="POST" action="{{ url_for('upload_file') }}" enctype="multipart/form-data" id="uploadForm">
-                        <input type="hidden" name="input_type" value="file">
-                        <div class="mb-3">
-                            <label for="pyfile" class="form-label">Select Python file:</label>
-                            <input type="file" class="form-control" id="pyfile" name="file" accept=".py" required>
-                        </div>
-                        
-                        <!-- Build options section -->
-                        <div class="options-container" id="fileOptions">
-                            <h5>Build Options</h5>
-                            <div class="row">
-                                <div class="col-md-6">
-                                    <div class="form-check mb-2">
-                                        <input class="form-check-input" type="checkbox" id="oneFile" name="one_file" checked>
-                                        <label class="form-check-label" for="oneFile">
-                                            One-file bundle
-                                        </label>
-                                    </div>
-                                    <div class="form-check mb-2">
-                                        <input class="form-check-input" type="checkbox" id="console" name="console" checked>
-                                        <label class="form-check-label" for="console">
-                                            Console application
-                                        </label>
-                                    </div>
-                                </div>
-                                <div class="col-md-6">
-                                    <div class="form-check mb-2">
-                                        <input class="form-check-input" type="checkbox" id="uac" name="uac">
-                                        <label class="form-check-label" for="uac">
-                                            Request admin privileges
-                                        </label>
-                                    </div>
-                                    <div class="form-check mb-2">
-                                        <input class="form-check-input" type="checkbox" id="debug" name="debug">
-                                        <label class="form-check-label" for="debug">
-                                            Debug mode
-                                        </label>
-                                    </div>
-                                </div>
-                            </div>
-                            
-                            <div class="mb-3 mt-3">
-                                <label for="extraPackages" class="form-label">Additional packages (comma separated):</label>
-                                <input type="text" class="form-control" id="extraPackages" name="packages" placeholder="numpy,pandas,matplotlib">
-                            </div>
-                            
-                            <div class="mb-3">
-                                <label for="extraFiles" class="form-label">Additional files (uploaded later):</label>
-                                <input type="file" class="form-control" id="extraFiles" name="extra_files" multiple>
-                            </div>
-                            
-                            <div class="mb-3">
-                                <label for="targetPlatform" class="form-label">Target Platform:</label>
-                                <select class="form-select" id="targetPlatform" name="platform">
-                                    <option value="auto" selected>Auto-detect</option>
-                                    <option value="windows">Windows</option>
-                                    <option value="linux">Linux</option>
-                                    <option value="macos">macOS</option>
-                                </select>
-                            </div>
-                        </div>
-                        
-                        <button type="submit" class="btn btn-primary w-100" id="uploadSubmitBtn">Convert to EXE</button>
-                    </form>
-                </div>
-                
-                <div class="tab-pane fade" id="paste-tab-pane" role="tabpanel" aria-labelledby="paste-tab" tabindex="0">
-                    <form method="POST" action="{{ url_for('paste_code') }}" id="pasteForm">
-                        <input type="hidden" name="input_type" value="paste">
-                        <div class="mb-3">
-                            <label for="codeEditor" class="form-label">Python Code:</label>
-                            <textarea class="form-control" id="codeEditor" name="code" rows="10" required placeholder="Paste your Python code here..."></textarea>
-                        </div>
-                        
-                        <div class="mb-3">
-                            <label for="filename" class="form-label">Filename (with .py extension):</label>
-                            <input type="text" class="form-control" id="filename" name="filename" placeholder="main.py" required pattern=".*\.py$">
-                            <div class="form-text">Filename must end with .py</div>
-                        </div>
-                        
-                        <!-- Build options section (duplicated for the paste form) -->
-                        <div class="options-container" id="pasteOptions">
-                            <h5>Build Options</h5>
-                            <div class="row">
-                                <div class="col-md-6">
-                                    <div class="form-check mb-2">
-                                        <input class="form-check-input" type="checkbox" id="oneFilePaste" name="one_file" checked>
-                                        <label class="form-check-label" for="oneFilePaste">
-                                            One-file bundle
-                                        </label>
-                                    </div>
-                                    <div class="form-check mb-2">
-                                        <input class="form-check-input" type="checkbox" id="consolePaste" name="console" checked>
-                                        <label class="form-check-label" for="consolePaste">
-                                            Console application
-                                        </label>
-                                    </div>
-                                </div>
-                                <div class="col-md-6">
-                                    <div class="form-check mb-2">
-                                        <input class="form-check-input" type="checkbox" id="uacPaste" name="uac">
-                                        <label class="form-check-label" for="uacPaste">
-                                            Request admin privileges
-                                        </label>
-                                    </div>
-                                    <div class="form-check mb-2">
-                                        <input class="form-check-input" type="checkbox" id="debugPaste" name="debug">
-                                        <label class="form-check-label" for="debugPaste">
-                                            Debug mode
-                                        </label>
-                                    </div>
-                                </div>
-                            </div>
-                            
-                            <div class="mb-3 mt-3">
-                                <label for="extraPackagesPaste" class="form-label">Additional packages (comma separated):</label>
-                                <input type="text" class="form-control" id="extraPackagesPaste" name="packages" placeholder="numpy,pandas,matplotlib">
-                            </div>
-                            
-                            <div class="mb-3">
-                                <label for="targetPlatformPaste" class="form-label">Target Platform:</label>
-                                <select class="form-select" id="targetPlatformPaste" name="platform">
-                                    <option value="auto" selected>Auto-detect</option>
-                                    <option value="windows">Windows</option>
-                                    <option value="linux">Linux</option>
-                                    <option value="macos">macOS</option>
-                                </select>
-                            </div>
-                        </div>
-                        
-                        <button type="submit" class="btn btn-primary w-100" id="pasteSubmitBtn">Convert to EXE</button>
-                    </form>
-                </div>
-            </div>
-            
-            <div id="conversionStatus" style="display: none;">
-                <div class="alert alert-info mt-3">
-                    <h5>Conversion in Progress</h5>
-                    <p id="statusMessage">Initializing conversion process...</p>
-                    <div class="progress">
-                        <div class="progress-bar progress-bar-striped progress-bar-animated" role="progressbar" style="width: 0%" id="progressBar"></div>
-                    </div>
-                </div>
-                
-                <div class="log-container">
-                    <h5>Build Log:</h5>
-                    <div id="logContent"></div>
-                </div>
-            </div>
-        </div>
+        index_page_cache[year] = page
+    return negotiated_response(page['variants'], page['etag'], 'text/html', 'no-cache')
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    if 'file' not in request.files:
+        return jsonify(success=False, message='No file part')
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify(success=False, message='No selected file')
+    
+    if not file or not allowed_file(file.filename):
+        return jsonify(success=False, message='Only Python (.py) files are allowed')
+    
+    reason = iterate_rejection(request.form)
+    if reason:
+        return jsonify(job_token_denied_payload(reason)), 403
+    
+    work_dir = None
+    try:
+        # Validate the options before anything is written
+        options = parse_build_options(request.form)
         
-        {% if download_link %}
-        <div class="status-container">
-            <div class="alert alert-success">
-                <h5>Conversion successful!</h5>
-                <p>Your executable has been created successfully.</p>
-                <a href="{{ download_link }}" class="btn btn-success">Download EXE</a>
-            </div>
-        </div>
-        {% endif %}
+        # Create session ID
+        session_id = str(uuid.uuid4())
         
-        <div class="footer">
-            <p>Advanced Python to EXE Converter © {{ current_year }}</p>
-            <p>Powered by PyInstaller</p>
-        </div>
-    </div>
-    
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
-    <script>
-        // Session ID storage - both in session and localStorage for resilience
-        let currentSessionId = '';
+        logger.info(f"Created new session: {session_id}", extra={'session_id': session_id})
         
-        // Handle form submission for file upload
-        document.getElementById('uploadForm').addEventListener('submit', function(e) {
-            e.preventDefault();
-            startConversion(this, 'uploadSubmitBtn');
-        });
+        # Create work directory
+        work_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
+        os.makedirs(work_dir, exist_ok=True)
         
-        // Handle form submission for code paste
-        document.getElementById('pasteForm').addEventListener('submit', function(e) {
-            e.preventDefault();
-            startConversion(this, 'pasteSubmitBtn');
-        });
+        # Save the main Python file
+        filename = secure_filename(file.filename)
+        file_path = os.path.join(work_dir, filename)
+        file.save(file_path)
         
-        function startConversion(form, buttonId) {
-            // Show progress UI
-            document.getElementById('conversionStatus').style.display = 'block';
-            document.getElementById(buttonId).disabled = true;
-            document.getElementById(buttonId).innerHTML = 'Converting... Please wait';
-            
-            // Clear previous log content
-            document.getElementById('logContent').innerHTML = '';
-            document.getElementById('progressBar').style.width = '0%';
-            document.getElementById('progressBar').classList.remove('bg-danger', 'bg-success');
-            document.getElementById('progressBar').classList.add('bg-info');
-            
-            // Submit the form data via AJAX
-            const formData = new FormData(form);
-            const action = form.getAttribute('action');
-            
-            fetch(action, {
-                method: 'POST',
-                body: formData,
-                credentials: 'same-origin'  // Important for session cookies
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    // Store session ID in both variables and localStorage for resilience
-                    currentSessionId = data.session_id;
-                    localStorage.setItem('conversionSessionId', data.session_id);
-                    
-                    // Start polling for status updates
-                    pollStatus(data.session_id);
-                    
-                    // Log initial status
-                    const logElement = document.getElementById('logContent');
-                    logElement.innerHTML += `<div>[${new Date().toLocaleTimeString()}] Conversion started with session ID: ${data.session_id}</div>`;
-                } else {
-                    // Show error
-                    document.getElementById('statusMessage').innerText = 'Error: ' + data.message;
-                    document.getElementById('progressBar').style.width = '100%';
-                    document.getElementById('progressBar').classList.remove('bg-info', 'bg-success');
-                    document.getElementById('progressBar').classList.add('bg-danger');
-                    document.getElementById(buttonId).disabled = false;
-                    document.getElementById(buttonId).innerHTML = 'Try Again';
-                    
-                    // Log error
-                    const logElement = document.getElementById('logContent');
-                    logElement.innerHTML += `<div class="text-danger">[${new Date().toLocaleTimeString()}] Error: ${data.message}</div>`;
-                }
-            })
-            .catch(error => {
-                console.error('Error:', error);
-                document.getElementById('statusMessage').innerText = 'Server error occurred. Please try again.';
-                document.getElementById('progressBar').style.width = '100%';
-                document.getElementById('progressBar').classList.remove('bg-info', 'bg-success');
-                document.getElementById('progressBar').classList.add('bg-danger');
-                document.getElementById(buttonId).disabled = false;
-                document.getElementById(buttonId).innerHTML = 'Try Again';
-                
-                // Log error
-                const logElement = document.getElementById('logContent');
-                logElement.innerHTML += `<div class="text-danger">[${new Date().toLocaleTimeString()}] Server error: ${error.message}</div>`;
-            });
-        }
+        # Save additional files if provided
+        extra_files_paths = []
+        if 'extra_files' in request.files:
+            extra_files = request.files.getlist('extra_files')
+            for extra_file in extra_files:
+                if extra_file.filename != '':
+                    extra_filename = secure_filename(extra_file.filename)
+                    extra_file_path = os.path.join(work_dir, extra_filename)
+                    extra_file.save(extra_file_path)
+                    extra_files_paths.append(extra_file_path)
         
-        function pollStatus(sessionId) {
-            // Try up to 10 times with increasing delays if there's an error
-            let retryCount = 0;
-            let maxRetries = 10;
-            let retryDelay = 1000;
-            
-            function makeStatusRequest() {
-                fetch(`/status/${sessionId}`, {
-                    credentials: 'same-origin'  // Important for session cookies
-                })
-                .then(response => response.json())
-                .then(data => {
-                    // Reset retry counter on successful response
-                    retryCount = 0;
-                    
-                    // Check if session is valid
-                    if (data.message === 'Invalid session ID') {
-                        const logElement = document.getElementById('logContent');
-                        logElement.innerHTML += `<div class="text-warning">[${new Date().toLocaleTimeString()}] Session error: Invalid session ID. Attempting recovery...</div>`;
-                        
-                        // Try to recover by using localStorage
-                        const storedSessionId = localStorage.getItem('conversionSessionId');
-                        if (storedSessionId && storedSessionId !== sessionId) {
-                            logElement.innerHTML += `<div>[${new Date().toLocaleTimeString()}] Attempting to recover with stored session ID: ${storedSessionId}</div>`;
-                            setTimeout(() => pollStatus(storedSessionId), 1000);
-                            return;
-                        }
-                        
-                        // If unable to recover, show error
-                        document.getElementById('statusMessage').innerText = 'Session error. Please try again.';
-                        document.getElementById('progressBar').style.width = '100%';
-                        document.getElementById('progressBar').classList.remove('bg-info', 'bg-success');
-                        document.getElementById('progressBar').classList.add('bg-danger');
-                        document.getElementById('uploadSubmitBtn').disabled = false;
-                        document.getElementById('uploadSubmitBtn').innerHTML = 'Try Again';
-                        document.getElementById('pasteSubmitBtn').disabled = false;
-                        document.getElementById('pasteSubmitBtn').innerHTML = 'Try Again';
-                        return;
-                    }
-                    
-                    // Update progress bar
-                    document.getElementById('progressBar').style.width = data.progress + '%';
-                    
-                    // Update status message
-                    document.getElementById('statusMessage').innerText = data.status;
-                    
-                    // Update log content
-                    if (data.log) {
-                        const logElement = document.getElementById('logContent');
-                        logElement.innerHTML += `<div>[${new Date().toLocaleTimeString()}] ${data.log}</div>`;
-                        logElement.scrollTop = logElement.scrollHeight;
-                    }
-                    
-                    if (data.completed) {
-                        if (data.success) {
-                            // Show success and download link
-                            document.getElementById('progressBar').classList.add('bg-success');
-                            document.getElementById('conversionStatus').innerHTML = `
-                                <div class="alert alert-success mt-3">
-                                    <h5>Conversion successful!</h5>
-                                    <p>Your executable has been created successfully.</p>
-                                    <a href="${data.download_url}" class="btn btn-success">Download EXE</a>
-                                </div>
-                            `;
-                        } else {
-                            // Show error
-                            document.getElementById('progressBar').style.width = '100%';
-                            document.getElementById('progressBar').classList.remove('bg-info');
-                            document.getElementById('progressBar').classList.add('bg-danger');
-                            document.getElementById('statusMessage').innerText = 'Error: ' + data.message;
-                            document.getElementById('uploadSubmitBtn').disabled = false;
-                            document.getElementById('uploadSubmitBtn').innerHTML = 'Try Again';
-                            document.getElementById('pasteSubmitBtn').disabled = false;
-                            document.getElementById('pasteSubmitBtn').innerHTML = 'Try Again';
-                        }
-                    } else {
-                        // Continue polling
-                        setTimeout(() => makeStatusRequest(), 1000);
-                    }
-                })
-                .catch(error => {
-                    console.error('Error polling status:', error);
-                    
-                    const logElement = document.getElementById('logContent');
-                    logElement.innerHTML += `<div class="text-warning">[${new Date().toLocaleTimeString()}] Network error while checking status: ${error.message}. Retrying...</div>`;
-                    
-                    // Implement exponential backoff for retries
-                    retryCount++;
-                    if (retryCount <= maxRetries) {
-                        setTimeout(() => makeStatusRequest(), retryDelay);
-                        retryDelay = Math.min(retryDelay * 1.5, 10000); // Cap at 10 seconds
-                    } else {
-                        logElement.innerHTML += `<div class="text-danger">[${new Date().toLocaleTimeString()}] Failed to connect after ${maxRetries} attempts. Please refresh and try again.</div>`;
-                        document.getElementById('statusMessage').innerText = 'Connection lost. Please refresh and try again.';
-                    }
-                });
-            }
-            
-            // Start the polling
-            makeStatusRequest();
-        }
+        # Large extra files sent through /uploads
+        extra_files_paths.extend(attach_assets(request.form, work_dir))
         
-        // Check for ongoing conversion on page load
-        document.addEventListener('DOMContentLoaded', function() {
-            const storedSessionId = localStorage.getItem('conversionSessionId');
-            if (storedSessionId) {
-                // Check if the stored session is still active
-                fetch(`/status/${storedSessionId}`, {
-                    credentials: 'same-origin'
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.message !== 'Invalid session ID' && !data.completed) {
-                        // Conversion is still in progress, restore UI
-                        document.getElementById('conversionStatus').style.display = 'block';
-                        document.getElementById('uploadSubmitBtn').disabled = true;
-                        document.getElementById('uploadSubmitBtn').innerHTML = 'Converting... Please wait';
-                        document.getElementById('pasteSubmitBtn').disabled = true;
-                        document.getElementById('pasteSubmitBtn').innerHTML = 'Converting... Please wait';
-                        
-                        const logElement = document.getElementById('logContent');
-                        logElement.innerHTML += `<div>[${new Date().toLocaleTimeString()}] Reconnected to conversion session: ${storedSessionId}</div>`;
-                        
-                        // Resume polling
-                        pollStatus(storedSessionId);
-                    } else if (data.completed && data.success) {
-                        // Conversion is complete, show download link
-                        document.getElementById('conversionStatus').style.display = 'block';
-                        document.getElementById('conversionStatus').innerHTML = `
-                            <div class="alert alert-success mt-3">
-                                <h5>Conversion successful!</h5>
-                                <p>Your executable is ready for download.</p>
-                                <a href="${data.download_url}" class="btn btn-success">Download EXE</a>
-                            </div>
-                        `;
-                    }
-                })
-                .catch(error => {
-                    console.error('Error checking stored session:', error);
-                });
-            }
-        });
+        options.update(
+            file_path=file_path,
+            work_dir=work_dir,
+            extra_files=extra_files_paths
+        )
         
-        // Add window beforeunload event to warn about leaving during conversion
-        window.addEventListener('beforeunload', function(e) {
-            if (document.getElementById('conversionStatus').style.display !== 'none' && 
-                !document.getElementById('progressBar').classList.contains('bg-success') &&
-                !document.getElementById('progressBar').classList.contains('bg-danger')) {
-                e.preventDefault();
-                e.returnValue = 'Conversion is in progress. Are you sure you want to leave?';
-                return e.returnValue;
-            }
-        });
-    </script>
-</body>
-</html>
-'''
+        # Queue the conversion for the build worker pool
+        enqueue_conversion(session_id, options)
+        work_dir = None  # The job owns it now
+        
+        return jsonify(success=True, message='Conversion started', session_id=session_id,
+                       job_token=issue_job_token(session_id))
+        
+    except Exception as e:
+        logger.error(f"Error initiating conversion: {str(e)}")
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return jsonify(success=False, message=f'Error: {str(e)}')
+
+@app.route('/paste', methods=['POST'])
+def paste_code():
+    if 'code' not in request.form or not request.form['code'].strip():
+        return jsonify(success=False, message='No code provided')
+    
+    if 'filename' not in request.form or not request.form['filename'].strip():
+        return jsonify(success=False, message='No filename provided')
+    
+    filename = request.form['filename'].strip()
+    if not filename.endswith('.py'):
+        return jsonify(success=False, message='Filename must end with .py')
+    
+    reason = iterate_rejection(request.form)
+    if reason:
+        return jsonify(job_token_denied_payload(reason)), 403
+    
+    work_dir = None
+    try:
+        # Validate the options before anything is written
+        options = parse_build_options(request.form)
+        
+        # Create session ID
+        session_id = str(uuid.uuid4())
+        
+        logger.info(f"Created new session from pasted code: {session_id}", extra={'session_id': session_id})
+        
+        # Create work directory
+        work_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
+        os.makedirs(work_dir, exist_ok=True)
+        
+        # Save the pasted code to a file
+        code = request.form['code']
+        filename = secure_filename(filename)
+        file_path = os.path.join(work_dir, filename)
+        
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        
+        options.update(
+            file_path=file_path,
+            work_dir=work_dir,
+            extra_files=attach_assets(request.form, work_dir)
+        )
+        
+        # Queue the conversion for the build worker pool
+        enqueue_conversion(session_id, options)
+        work_dir = None  # The job owns it now
+        
+        return jsonify(success=True, message='Conversion started', session_id=session_id,
+                       job_token=issue_job_token(session_id))
+        
+    except Exception as e:
+        logger.error(f"Error initiating conversion from pasted code: {str(e)}")
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return jsonify(success=False, message=f'Error: {str(e)}')
+
+# Resumable chunked uploads for large extra files. A client announces a file
+# (POST /uploads), PUTs its chunks in any order and in parallel, each with its
+# SHA-256 in X-Chunk-Sha256, and finalizes it (POST /uploads/<id>/finalize);
+# /upload and /paste then take finished upload ids in their "assets" field.
+# Chunks go to the artifact store, so chunks whose hashes the client lists
+# at init and the store already holds are never sent, and a file whose
+# whole hash is stored is finished at once. GET /uploads/<id> reports what
+# is still missing, for resuming after a dropped connection.
+# Stored data is only reused for a client (by address, as for rate limiting)
+# that has itself sent it within UPLOAD_TTL, so knowing a file's hash and
+# size is not enough to obtain someone else's file.
+UPLOADS_DIRNAME = '.uploads'
+# Per client: <digest> files marking what it has uploaded, touched on reuse
+UPLOAD_OWNERS_DIRNAME = '.owners'
+# Unfinished uploads one client may have at once
+MAX_OPEN_UPLOADS = int(os.environ.get('MAX_OPEN_UPLOADS', 16))
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Each chunk is one request, so this must stay below MAX_CONTENT_LENGTH
+MAX_UPLOAD_CHUNK_SIZE = 32 * 1024 * 1024
+MIN_UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_ASSET_SIZE = int(os.environ.get('MAX_ASSET_SIZE_MB', 2048)) * 1024 * 1024
+# Uploads (finished or not) are removed this long after they were started
+UPLOAD_TTL = int(os.environ.get('UPLOAD_TTL', 24 * 3600))
+UPLOAD_META_FILENAME = 'upload.json'
+SHA256_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+def upload_dir(upload_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+        return None
+    return os.path.join(app.config['UPLOAD_FOLDER'], UPLOADS_DIRNAME, upload_id)
+
+def read_upload(upload_id):
+    directory = upload_dir(upload_id)
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, UPLOAD_META_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_upload(upload_id, meta):
+    path = os.path.join(upload_dir(upload_id), UPLOAD_META_FILENAME)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+def chunk_span(meta, index):
+    """(offset, length) of a chunk"""
+    offset = index * meta['chunk_size']
+    return offset, min(meta['chunk_size'], meta['size'] - offset)
+
+def upload_state(upload_id, meta):
+    """Client-facing view of an upload: which chunks are still missing"""
+    if meta.get('digest'):
+        missing = []
+    else:
+        chunks_dir = os.path.join(upload_dir(upload_id), 'chunks')
+        received = set(int(name) for name in os.listdir(chunks_dir) if name.isdigit())
+        missing = [index for index in range(meta['chunk_count']) if index not in received]
+    return {
+        'upload_id': upload_id,
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'chunk_size': meta['chunk_size'],
+        'chunk_count': meta['chunk_count'],
+        'missing': [dict(zip(('index', 'offset', 'size'), (index,) + chunk_span(meta, index))) for index in missing],
+        'finalized': bool(meta.get('digest')),
+        'sha256': meta.get('digest')
+    }
+
+def upload_client():
+    """Key naming the requesting client in upload metadata and owner markers"""
+    ip = client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'))
+    return hashlib.sha256(ip.encode('utf-8')).hexdigest()[:32]
+
+def owner_marker(client, digest):
+    return os.path.join(app.config['UPLOAD_FOLDER'], UPLOADS_DIRNAME, UPLOAD_OWNERS_DIRNAME, client, digest)
+
+def record_owner(client, digest):
+    """Note that a client has sent the data with this digest"""
+    path = owner_marker(client, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a'):
+        os.utime(path)
+
+def count_open_uploads(client):
+    root = os.path.join(app.config['UPLOAD_FOLDER'], UPLOADS_DIRNAME)
+    if not os.path.isdir(root):
+        return 0
+    count = 0
+    for upload_id in os.listdir(root):
+        meta = read_upload(upload_id)
+        if meta and meta.get('client') == client and not meta.get('digest'):
+            count += 1
+    return count
+
+def link_owned_object(client, digest, size, target):
+    """Link a store object the client has uploaded before into place"""
+    if not os.path.exists(owner_marker(client, digest)) or not link_stored_object(digest, size, target):
+        return False
+    record_owner(client, digest)
+    return True
+
+def link_stored_object(digest, size, target):
+    """Link a store object into place; False if the store does not have it"""
+    object_path = os.path.join(cas_root(), digest[:2], digest)
+    try:
+        if os.path.getsize(object_path) != size:
+            return False
+        os.link(object_path, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        return False
+    return True
+
+@app.route('/uploads', methods=['POST'])
+def init_upload():
+    data = request.get_json(silent=True) or request.form
+    filename = secure_filename(data.get('filename', ''))
+    if not filename:
+        return jsonify(success=False, message='No filename provided'), 400
+    try:
+        size = int(data.get('size', -1))
+        chunk_size = int(data.get('chunk_size', UPLOAD_CHUNK_SIZE))
+    except (TypeError, ValueError):
+        return jsonify(success=False, message='size and chunk_size must be integers'), 400
+    if not 0 <= size <= MAX_ASSET_SIZE:
+        return jsonify(success=False, message=f'size must be between 0 and {MAX_ASSET_SIZE} bytes'), 400
+    chunk_size = min(max(chunk_size, MIN_UPLOAD_CHUNK_SIZE), MAX_UPLOAD_CHUNK_SIZE)
+    chunk_count = max(math.ceil(size / chunk_size), 1)
+    
+    sha256 = (data.get('sha256') or '').lower() or None
+    chunk_hashes = data.get('chunk_hashes') or []
+    if isinstance(chunk_hashes, str):
+        chunk_hashes = [h.strip() for h in chunk_hashes.split(',') if h.strip()]
+    chunk_hashes = [h.lower() for h in chunk_hashes]
+    if sha256 and not SHA256_PATTERN.fullmatch(sha256):
+        return jsonify(success=False, message='sha256 must be a hex SHA-256 digest'), 400
+    if chunk_hashes and (len(chunk_hashes) != chunk_count or not all(SHA256_PATTERN.fullmatch(h) for h in chunk_hashes)):
+        return jsonify(success=False, message=f'chunk_hashes must list {chunk_count} hex SHA-256 digests'), 400
+    client = upload_client()
+    if count_open_uploads(client) >= MAX_OPEN_UPLOADS:
+        return jsonify(success=False, message=f'At most {MAX_OPEN_UPLOADS} unfinished uploads are allowed; '
+                                              'finalize or wait for the others to expire'), 429
+    
+    upload_id = uuid.uuid4().hex
+    directory = upload_dir(upload_id)
+    os.makedirs(os.path.join(directory, 'chunks'))
+    meta = {
+        'filename': filename,
+        'size': size,
+        'chunk_size': chunk_size,
+        'chunk_count': chunk_count,
+        'sha256': sha256,
+        'chunk_hashes': chunk_hashes,
+        'client': client,
+        'created': time.time()
+    }
+    
+    # Whatever this client already stored is not uploaded again
+    if sha256 and link_owned_object(client, sha256, size, os.path.join(directory, 'asset')):
+        meta['digest'] = sha256
+        UPLOAD_BYTES.inc(size, source='deduplicated')
+    else:
+        for index, digest in enumerate(chunk_hashes):
+            length = chunk_span(meta, index)[1]
+            if link_owned_object(client, digest, length, os.path.join(directory, 'chunks', str(index))):
+                UPLOAD_BYTES.inc(length, source='deduplicated')
+    write_upload(upload_id, meta)
+    
+    logger.info(f"Started chunked upload {upload_id}: {filename} ({size} bytes)")
+    return jsonify(success=True, **upload_state(upload_id, meta))
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    meta = read_upload(upload_id)
+    if meta is None:
+        return jsonify(success=False, message='Unknown upload'), 404
+    return jsonify(success=True, **upload_state(upload_id, meta))
+
+@app.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    meta = read_upload(upload_id)
+    if meta is None:
+        return jsonify(success=False, message='Unknown upload'), 404
+    if meta.get('digest'):
+        return jsonify(success=False, message='Upload is already finalized'), 409
+    if not 0 <= index < meta['chunk_count']:
+        return jsonify(success=False, message=f'Chunk index must be below {meta["chunk_count"]}'), 400
+    offset, length = chunk_span(meta, index)
+    if request.args.get('offset') not in (None, str(offset)):
+        return jsonify(success=False, message=f'Chunk {index} starts at offset {offset}'), 400
+    expected = request.headers.get('X-Chunk-Sha256', '').lower()
+    if not SHA256_PATTERN.fullmatch(expected) or (meta['chunk_hashes'] and meta['chunk_hashes'][index] != expected):
+        return jsonify(success=False, message='X-Chunk-Sha256 must be the hex SHA-256 of the chunk'), 400
+    
+    chunk_path = os.path.join(upload_dir(upload_id), 'chunks', str(index))
+    if os.path.exists(chunk_path):
+        return jsonify(success=True, index=index, offset=offset, size=length)
+    
+    # Stream to a temporary file, hashing on the way
+    tmp_path = f'{chunk_path}.{uuid.uuid4().hex}.tmp'
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for block in iter(lambda: request.stream.read(ARTIFACT_CHUNK_SIZE), b''):
+                received += len(block)
+                if received > length:
+                    break
+                digest.update(block)
+                f.write(block)
+        if received != length:
+            return jsonify(success=False, message=f'Chunk {index} must be {length} bytes'), 400
+        if digest.hexdigest() != expected:
+            return jsonify(success=False, message=f'Checksum mismatch for chunk {index}'), 400
+        store_file(tmp_path, digest=expected)
+        os.replace(tmp_path, chunk_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    record_owner(upload_client(), expected)
+    UPLOAD_BYTES.inc(length, source='transferred')
+    return jsonify(success=True, index=index, offset=offset, size=length)
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    meta = read_upload(upload_id)
+    if meta is None:
+        return jsonify(success=False, message='Unknown upload'), 404
+    state = upload_state(upload_id, meta)
+    if state['finalized']:
+        return jsonify(success=True, **state)
+    if state['missing']:
+        return jsonify(success=False, message=f"{len(state['missing'])} chunks are missing", **state), 409
+    
+    directory = upload_dir(upload_id)
+    tmp_path = os.path.join(directory, f'asset.{uuid.uuid4().hex}.tmp')
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as out:
+            for index in range(meta['chunk_count']):
+                with open(os.path.join(directory, 'chunks', str(index)), 'rb') as f:
+                    for block in iter(lambda: f.read(ARTIFACT_CHUNK_SIZE), b''):
+                        digest.update(block)
+                        out.write(block)
+        if meta['sha256'] and digest.hexdigest() != meta['sha256']:
+            return jsonify(success=False, message='The assembled file does not match sha256'), 400
+        store_file(tmp_path, digest=digest.hexdigest())
+        os.replace(tmp_path, os.path.join(directory, 'asset'))
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    
+    # The assembled file holds the data now; the store keeps chunks other uploads share
+    shutil.rmtree(os.path.join(directory, 'chunks'), ignore_errors=True)
+    os.makedirs(os.path.join(directory, 'chunks'), exist_ok=True)
+    meta['digest'] = digest.hexdigest()
+    write_upload(upload_id, meta)
+    if meta.get('client'):
+        record_owner(meta['client'], meta['digest'])
+    logger.info(f"Finalized chunked upload {upload_id}: {meta['filename']}")
+    return jsonify(success=True, **upload_state(upload_id, meta))
+
+def attach_assets(form, work_dir):
+    """Link the finished uploads listed in the form's assets field into a work dir"""
+    paths = []
+    for upload_id in (item.strip() for item in form.get('assets', '').split(',')):
+        if not upload_id:
+            continue
+        meta = read_upload(upload_id)
+        if meta is None or not meta.get('digest'):
+            raise ValueError(f'Upload {upload_id} does not exist or is not finalized')
+        target = os.path.join(work_dir, meta['filename'])
+        if os.path.exists(target):
+            raise ValueError(f"Asset {meta['filename']} clashes with another file of the job")
+        asset_path = os.path.join(upload_dir(upload_id), 'asset')
+        try:
+            os.link(asset_path, target)
+        except OSError:
+            shutil.copyfile(asset_path, target)
+        paths.append(target)
+    return paths
+
+def expire_uploads():
+    """Remove chunked uploads older than UPLOAD_TTL; returns how many"""
+    root = os.path.join(app.config['UPLOAD_FOLDER'], UPLOADS_DIRNAME)
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    for upload_id in os.listdir(root):
+        if upload_id == UPLOAD_OWNERS_DIRNAME:
+            continue
+        meta = read_upload(upload_id)
+        path = os.path.join(root, upload_id)
+        created = meta['created'] if meta else os.path.getmtime(path)
+        if time.time() - created > UPLOAD_TTL:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    
+    owners = os.path.join(root, UPLOAD_OWNERS_DIRNAME)
+    for client in os.listdir(owners) if os.path.isdir(owners) else []:
+        client_dir = os.path.join(owners, client)
+        for digest in os.listdir(client_dir):
+            marker = os.path.join(client_dir, digest)
+            try:
+                if time.time() - os.path.getmtime(marker) > UPLOAD_TTL:
+                    os.unlink(marker)
+            except OSError:
+                pass
+        try:
+            os.rmdir(client_dir)  # Only once empty
+        except OSError:
+            pass
+    return removed
+
+@app.route('/status/<session_id>')
+def get_status(session_id):
+    """Get the current conversion status"""
+    STATUS_REQUESTS.inc()
+    with STATUS_REQUEST_SECONDS.time():
+        return _get_status(session_id)
+
+def _get_status(session_id):
+    logger.debug(f"Status requested for session: {session_id}", extra={'session_id': session_id, 'sample': 'status_poll'})
+    return jsonify(status_payload(session_id, get_conversion_status(session_id)))
+
+def status_payload(session_id, status):
+    """Client-facing view of a conversion status record (shared with asgi.py)"""
+    if not status:
+        # The job journal survives restarts (and is shared with other workers)
+        journal = read_journal(session_id)
+        if journal and journal['state'] == 'done':
+            return dict(progress=100, completed=True, log=None, **journal['result'])
+        if journal:
+            return dict(
+                progress=50 if 'build' in journal['stages'] else 25,
+                status='Resuming interrupted conversion...',
+                completed=False,
+                success=False,
+                message='',
+                log=None
+            )
+        
+        # Check if the session directory exists as fallback
+        work_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
+        if os.path.exists(work_dir):
+            logger.info(f"Session directory exists but no status found: {session_id}")
+            # Return a generic status
+            return dict(
+                progress=50,
+                status='Processing conversion...',
+                completed=False,
+                success=False,
+                message='',
+                log='Reconnected to existing conversion process'
+            )
+        
+        logger.warning(f"Session ID not found: {session_id}")
+        return dict(
+            progress=0,
+            status='Session not found',
+            completed=True,
+            success=False,
+            message='Invalid session ID',
+            log=None
+        )
+    
+    # Only return the latest log entry
+    latest_log = status['log'][-1] if status['log'] else None
+    
+    # Position in the fair-share build queue (None once the build has started)
+    queue_position = scheduler.queue_position(session_id)
+    
+    # Progress and ETA follow the job's predicted stage durations
+    timing = {'stage': None, 'stage_eta_seconds': None, 'eta_seconds': None, 'progress': status['progress']}
+    if status.get('stage') and not status['completed']:
+        timing = stage_timing(status)
+    
+    return dict(
+        progress=timing['progress'],
+        stage=timing['stage'],
+        eta_seconds=timing['eta_seconds'],
+        stage_eta_seconds=timing['stage_eta_seconds'],
+        status=f'Waiting in queue (position {queue_position})' if queue_position else status['status'],
+        completed=status['completed'],
+        success=status['success'],
+        message=status['message'],
+        log=latest_log,
+        download_url=status['download_url'],
+        queue_position=queue_position,
+        build_info=status.get('build_info', {})
+    )
+
+# Heavy modules PyInstaller tends to drag in through optional imports of
+# other packages; excluded when neither the script nor its requested
+# packages use them (module family -> modules to exclude)
+HEAVY_OPTIONAL_MODULES = {
+    'tkinter': ['tkinter', '_tkinter'],
+    'lib2to3': ['lib2to3'],
+    'pydoc_data': ['pydoc_data'],
+    'test': ['test'],
+    'IPython': ['IPython'],
+    'jedi': ['jedi'],
+    'matplotlib': ['matplotlib'],
+    'PyQt5': ['PyQt5'],
+    'PyQt6': ['PyQt6'],
+    'PySide2': ['PySide2'],
+    'PySide6': ['PySide6'],
+}
+
+# How long a produced executable may take to start before giving up
+COLD_START_TIMEOUT = 10
+# Opt-in post-build benchmark of the produced executable
+BENCHMARK_RUNS = int(os.environ.get('BENCHMARK_RUNS', 3))
+BENCHMARK_TIMEOUT = float(os.environ.get('BENCHMARK_TIMEOUT', 15))
+# Timing every build's startup runs every submitted binary on the server,
+# so like the benchmark it has to be asked for
+MEASURE_STARTUP = os.environ.get('MEASURE_STARTUP', 'False').lower() == 'true'
+
+def detect_imports(paths):
+    """Top-level module names imported by the given Python files"""
+    import ast  # Build-only; kept off the web tier's import path
+    modules = set()
+    for path in paths:
+        if not path.endswith('.py'):
+            continue
+        try:
+            with open(path, 'rb') as f:
+                tree = ast.parse(f.read(), filename=path)
+        except (OSError, SyntaxError, ValueError):
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules.update(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules.add(node.module.split('.')[0])
+            elif isinstance(node, ast.Call) and node.args and isinstance(node.args[0], ast.Constant):
+                # __import__('x') and importlib.import_module('x')
+                func = node.func
+                name = func.id if isinstance(func, ast.Name) else getattr(func, 'attr', None)
+                if name in ('__import__', 'import_module') and isinstance(node.args[0].value, str):
+                    modules.add(node.args[0].value.split('.')[0])
+    return modules
+
+def unused_heavy_modules(imports, packages):
+    """Modules from HEAVY_OPTIONAL_MODULES that are safe to exclude"""
+    wanted = {name.lower() for name in imports}
+    wanted.update(pkg.strip().split('=')[0].split('<')[0].split('>')[0].lower() for pkg in packages.split(','))
+    excluded = []
+    for family, modules in HEAVY_OPTIONAL_MODULES.items():
+        if family.lower() not in wanted and not any(m.lower() in wanted for m in modules):
+            excluded.extend(modules)
+    return excluded
+
+def is_native_executable(path):
+    """Whether an output binary can run on this host"""
+    return os.path.isfile(path) and (sys.platform == 'win32') == path.endswith('.exe')
+
+def headless_env(home):
+    """Minimal environment for running a produced executable.
+
+    Never inherits the server's environment (SECRET_KEY, REDIS_URL, cloud
+    credentials...), has no display, and gets its own throwaway home and
+    temp dir (where a onefile build also unpacks itself).
+    """
+    env = {
+        'PATH': os.defpath,
+        'HOME': home,
+        'TMPDIR': home,
+        'LANG': 'C.UTF-8',
+        # Lets scripts detect the smoke run and skip interactive work
+        'PY2EXE_SMOKE_TEST': '1'
+    }
+    if sys.platform == 'win32':
+        env.update(SYSTEMROOT=os.environ.get('SYSTEMROOT', r'C:\Windows'), TEMP=home, TMP=home, USERPROFILE=home)
+    return env
+
+def child_pids(pid):
+    """Direct children of a process (Linux /proc only)"""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return []
+
+def process_tree_peak_rss(pid):
+    """Sum of the VmHWM high-water marks of a process and its descendants"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except (OSError, ValueError):
+            continue
+        pending.extend(child_pids(current))
+    return total
+
+def run_executable(exe_path, args=(), timeout=COLD_START_TIMEOUT, track_extraction=False):
+    """Run a produced executable once, headless, and measure it.
+
+    Returns a dict with the wall-clock seconds, whether it timed out, its
+    exit code, peak RSS in bytes and, when track_extraction is set, the
+    seconds a onefile bootloader spent before starting the unpacked
+    application as its child process.
+
+    Peak RSS is sampled from /proc while the process tree runs: the
+    ru_maxrss that wait4 reports would include this server's own memory,
+    which the child inherits for the instant between fork and exec.
+    """
+    home = tempfile.mkdtemp(prefix='pyexe-run-')
+    try:
+        return _run_executable(exe_path, args, timeout, track_extraction, home)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+def _run_executable(exe_path, args, timeout, track_extraction, home):
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [exe_path] + list(args),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        cwd=os.path.dirname(exe_path),
+        env=headless_env(home),
+        start_new_session=True
+    )
+    extraction = None
+    timed_out = False
+    peak_rss = 0
+    while True:
+        peak_rss = max(peak_rss, process_tree_peak_rss(proc.pid))
+        pid, wait_status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        now = time.perf_counter()
+        if pid:
+            break
+        if track_extraction and extraction is None and child_pids(proc.pid):
+            extraction = now - started
+        if now - started > timeout:
+            timed_out = True
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            pid, wait_status, rusage = os.wait4(proc.pid, 0)
+            now = time.perf_counter()
+            break
+        time.sleep(0.002)
+    # The process was reaped with wait4, so Popen must not wait for it again
+    proc.returncode = os.waitstatus_to_exitcode(wait_status)
+
+    if not peak_rss:
+        # No /proc (macOS): fall back to wait4's figure, in bytes there
+        peak_rss = rusage.ru_maxrss
+    return {
+        'seconds': now - started,
+        'timed_out': timed_out,
+        'exit_code': None if timed_out else proc.returncode,
+        'peak_rss_bytes': peak_rss,
+        'extraction_seconds': extraction
+    }
+
+def measure_cold_start(exe_path, timeout=COLD_START_TIMEOUT):
+    """Run a freshly built executable once, headless, and time it.
+
+    Returns the wall-clock seconds until it exited, or None if it was still
+    running at the timeout (e.g. a GUI or server application).
+    """
+    result = run_executable(exe_path, timeout=timeout)
+    return None if result['timed_out'] else result['seconds']
+
+def benchmark_executable(exe_path, args, one_file, runs=BENCHMARK_RUNS, timeout=BENCHMARK_TIMEOUT):
+    """Run an executable several times and summarize startup behaviour.
+
+    The first run is the cold start; the median of the remaining runs is
+    the warm start (OS caches populated, onefile still re-extracts).
+    """
+    results = [run_executable(exe_path, args, timeout, track_extraction=one_file) for _ in range(max(runs, 1))]
+    warm = sorted(r['seconds'] for r in results[1:])
+    extraction = [r['extraction_seconds'] for r in results if r['extraction_seconds'] is not None]
+    return {
+        'runs': len(results),
+        'args': list(args),
+        'cold_seconds': results[0]['seconds'],
+        'warm_seconds': warm[len(warm) // 2] if warm else None,
+        'peak_rss_bytes': max(r['peak_rss_bytes'] for r in results),
+        'extraction_seconds': sorted(extraction)[len(extraction) // 2] if extraction else None,
+        'timed_out': any(r['timed_out'] for r in results),
+        'exit_code': results[-1]['exit_code']
+    }
+
+def observe_benchmark(benchmark, engine):
+    """Feed a post-build benchmark into the metrics"""
+    EXE_STARTUP_SECONDS.observe(benchmark['cold_seconds'], kind='cold', engine=engine)
+    if benchmark['warm_seconds'] is not None:
+        EXE_STARTUP_SECONDS.observe(benchmark['warm_seconds'], kind='warm', engine=engine)
+    EXE_PEAK_RSS_BYTES.observe(benchmark['peak_rss_bytes'], engine=engine)
+    if benchmark['extraction_seconds'] is not None:
+        EXE_EXTRACTION_SECONDS.observe(benchmark['extraction_seconds'], engine=engine)
+
+def directory_size(path):
+    """Total size in bytes of a file or directory tree"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def pyinstaller_analysis_seconds(output, total_seconds):
+    """Split a PyInstaller run into analysis and assembly time.
+
+    PyInstaller prefixes its log lines with milliseconds since start; the
+    analysis phase ends when it starts building the PYZ archive.
+    """
+    for line in output.splitlines():
+        if 'Building PYZ' in line:
+            try:
+                return min(int(line.split(' ', 1)[0]) / 1000.0, total_seconds)
+            except ValueError:
+                break
+    return total_seconds
+
+# Ahead-of-time compilation with Nuitka (Linux only)
+NUITKA_TIMEOUT = int(os.environ.get('NUITKA_TIMEOUT', 900))
+
+def nuitka_available():
+    """Whether the Nuitka engine can be offered on this host"""
+    return sys.platform.startswith('linux') and importlib.util.find_spec('nuitka') is not None
+
+NUITKA_AVAILABLE = nuitka_available()
+
+def build_nuitka_command(session_id, options, scratch_dir):
+    """Build the Nuitka command line and environment for a job"""
+    script_name = os.path.splitext(os.path.basename(options['file_path']))[0]
+    nuitka_cmd = [
+        sys.executable, '-m', 'nuitka',
+        '--onefile' if options['one_file'] else '--standalone',
+        f"--output-dir={os.path.join(scratch_dir, 'dist')}",
+        f'--output-filename={script_name}',
+        '--remove-output',
+        '--assume-yes-for-downloads'
+    ]
+    
+    if options['optimize'] >= 1:
+        nuitka_cmd.append('--python-flag=no_asserts')
+    if options['optimize'] >= 2:
+        nuitka_cmd.append('--python-flag=no_docstrings')
+    
+    imports = detect_imports([options['file_path']] + options['extra_files'])
+    if 'tkinter' in imports:
+        nuitka_cmd.append('--enable-plugin=tk-inter')
+    if options['exclude_unused']:
+        excluded = unused_heavy_modules(imports, options['packages'])
+        nuitka_cmd.extend(f'--nofollow-import-to={module}' for module in excluded)
+        if excluded:
+            update_conversion_status(session_id, log=f"Excluding unused modules: {', '.join(excluded)}")
+    
+    for flag in ('uac', 'debug', 'strip', 'upx'):
+        if options[flag]:
+            update_conversion_status(session_id, log=f'Note: the {flag} option only applies to the PyInstaller engine')
+    
+    nuitka_cmd.append(options['file_path'])
+    
+    # Shared across builds: Nuitka's own caches and ccache's compiled C
+    # objects, so unchanged modules are not compiled again
+    cache_dir = app.config['BUILD_CACHE_FOLDER']
+    build_env = {
+        'NUITKA_CACHE_DIR': os.path.join(cache_dir, 'nuitka'),
+        'CCACHE_DIR': os.path.join(cache_dir, 'ccache')
+    }
+    if not shutil.which('ccache'):
+        update_conversion_status(session_id, log='Note: ccache is not installed, compiled C objects will not be cached')
+    
+    return nuitka_cmd, build_env
+
+def record_ccache_results(output):
+    """Count ccache hits and misses reported by Nuitka's Scons backend"""
+    for result, count in re.findall(r"Cached C files \(using ccache\) with result '([^']+)': (\d+)", output):
+        CACHE_REQUESTS.inc(int(count), cache='ccache', result='hit' if 'hit' in result else 'miss')
+
+def finish_nuitka_output(options):
+    """Move Nuitka's standalone output to where PyInstaller would put it"""
+    if options['one_file']:
+        return
+    script_name = os.path.splitext(os.path.basename(options['file_path']))[0]
+    dist_dir = os.path.join(options['work_dir'], 'dist')
+    standalone_dir = os.path.join(dist_dir, f'{script_name}.dist')
+    if os.path.isdir(standalone_dir):
+        os.rename(standalone_dir, os.path.join(dist_dir, script_name))
+
+# Build scratch space: PyInstaller's workpath and distpath (Nuitka's output
+# dir) fill up with thousands of small intermediate files per build. They go
+# to tmpfs while this process's RAM budget and the free memory allow it and
+# to disk otherwise; only the final output is moved into the job's work dir.
+SCRATCH_RAM_DIR = os.environ.get('SCRATCH_RAM_DIR', '/dev/shm')
+# RAM that builds in this process may reserve at once; 0 keeps scratch on disk
+SCRATCH_RAM_BUDGET = int(os.environ.get('SCRATCH_RAM_BUDGET_MB', 1024)) * 1024 * 1024
+# Memory left for the build processes themselves when placing scratch in RAM
+SCRATCH_MIN_FREE_MEMORY = int(os.environ.get('SCRATCH_MIN_FREE_MEMORY_MB', 512)) * 1024 * 1024
+# Where scratch spills to; by default a dot directory in the job's work dir
+SCRATCH_DISK_DIR = os.environ.get('SCRATCH_DISK_DIR')
+# Reservation per build: a bare build plus every requested package
+SCRATCH_BUILD_BYTES = 256 * 1024 * 1024
+SCRATCH_PACKAGE_BYTES = 128 * 1024 * 1024
+SCRATCH_PREFIX = 'pyexe-scratch-'
+SCRATCH_DIRNAME = '.scratch'
+
+def available_memory():
+    """MemAvailable in bytes, or None where /proc/meminfo does not exist"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def estimate_scratch_bytes(options):
+    """Scratch space to reserve for a build"""
+    packages = [pkg for pkg in options['packages'].split(',') if pkg.strip()]
+    estimate = SCRATCH_BUILD_BYTES + SCRATCH_PACKAGE_BYTES * len(packages)
+    # Nuitka keeps its generated C sources and objects next to the output
+    return estimate * 2 if options['engine'] == 'nuitka' else estimate
+
+class ScratchSpace:
+    """Hands out per-build scratch directories under a RAM budget.
+
+    A scratch is a dict with the directory ('path'), 'location' ("ram" or
+    "disk") and the bytes 'reserved' against the budget.
+    """
+
+    def __init__(self, ram_dir, budget):
+        usable = budget > 0 and os.path.isdir(ram_dir) and os.access(ram_dir, os.W_OK)
+        self.ram_dir = ram_dir if usable else None
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._reserved = 0
+
+    def acquire(self, session_id, options):
+        estimate = estimate_scratch_bytes(options)
+        with self._lock:
+            reason = self._ram_unavailable(estimate)
+            if reason is None:
+                self._reserved += estimate
+        if reason is None:
+            try:
+                return self._create(session_id, self.ram_dir, 'ram', estimate)
+            except OSError:
+                with self._lock:
+                    self._reserved -= estimate
+                reason = 'error'
+        if self.ram_dir is not None:
+            SCRATCH_SPILLS.inc(reason=reason)
+            logger.info(f"Build scratch for {session_id} spills to disk ({reason})", extra={'session_id': session_id})
+        return self.acquire_disk(session_id, options)
+
+    def acquire_disk(self, session_id, options):
+        if SCRATCH_DISK_DIR:
+            return self._create(session_id, SCRATCH_DISK_DIR, 'disk', 0)
+        return self._create(session_id, None, 'disk', 0, path=os.path.join(options['work_dir'], SCRATCH_DIRNAME))
+
+    def spill(self, session_id, scratch, options):
+        """Replace a RAM scratch that ran out of space with one on disk"""
+        self.release(scratch)
+        SCRATCH_SPILLS.inc(reason='no_space')
+        return self.acquire_disk(session_id, options)
+
+    def release(self, scratch):
+        if scratch is None:
+            return
+        shutil.rmtree(scratch['path'], ignore_errors=True)
+        with self._lock:
+            self._reserved -= scratch['reserved']
+        scratch['reserved'] = 0
+
+    def reserved_bytes(self):
+        with self._lock:
+            return self._reserved
+
+    def _ram_unavailable(self, estimate):
+        """Why a scratch of this size cannot go to RAM, or None if it can"""
+        if self.ram_dir is None:
+            return 'disabled'
+        if self._reserved + estimate > self.budget:
+            return 'budget'
+        memory = available_memory()
+        if shutil.disk_usage(self.ram_dir).free < estimate or (
+                memory is not None and memory < estimate + SCRATCH_MIN_FREE_MEMORY):
+            return 'memory'
+        return None
+
+    def _create(self, session_id, root, location, reserved, path=None):
+        path = path or os.path.join(root, SCRATCH_PREFIX + session_id)
+        # Left over from an interrupted attempt
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        SCRATCH_WORKSPACES.inc(location=location)
+        return {'path': path, 'location': location, 'reserved': reserved}
+
+    def collect_orphans(self):
+        """Remove scratch dirs left behind by builds whose process died"""
+        removed = 0
+        for root in (self.ram_dir, SCRATCH_DISK_DIR):
+            if not root or not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                if not name.startswith(SCRATCH_PREFIX):
+                    continue
+                path = os.path.join(root, name)
+                session_id = name[len(SCRATCH_PREFIX):]
+                if os.path.isdir(os.path.join(app.config['UPLOAD_FOLDER'], session_id)):
+                    # Free to lock means no process is queued or running the job
+                    if not hold_job_lock(session_id):
+                        continue
+                    try:
+                        shutil.rmtree(path, ignore_errors=True)
+                    finally:
+                        release_job_lock(session_id)
+                elif time.time() - os.path.getmtime(path) > 3600:
+                    # Not ours, or its session is gone; builds never take this long
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    continue
+                removed += 1
+        return removed
+
+scratch_space = ScratchSpace(SCRATCH_RAM_DIR, SCRATCH_RAM_BUDGET)
+
+def scratch_out_of_space(scratch, error):
+    """Whether a failed build ran out of room in its RAM scratch"""
+    output = (error.stdout or b'') + (error.stderr or b'')
+    return scratch['location'] == 'ram' and b'No space left on device' in output
+
+def move_scratch_output(scratch, options):
+    """Move the build output from scratch to the job's work dir"""
+    source = os.path.join(scratch['path'], 'dist')
+    target = os.path.join(options['work_dir'], 'dist')
+    SCRATCH_USAGE_BYTES.observe(directory_size(scratch['path']), location=scratch['location'])
+    if not os.path.exists(source):
+        return
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    # A rename within the work dir's file system, a copy from tmpfs
+    shutil.move(source, target)
+
+# Size and startup numbers per script and engine, for side-by-side reports
+ENGINE_COMPARISON_LIMIT = 1000
+ENGINE_COMPARISON_TTL = 24 * 3600
+engine_comparisons = OrderedDict()
+engine_comparisons_lock = threading.Lock()
+
+def engine_comparison_key(options):
+    """Identify a script plus the options that affect its output"""
+    digest = hashlib.sha256()
+    with open(options['file_path'], 'rb') as f:
+        digest.update(f.read())
+    relevant = {k: options[k] for k in ('one_file', 'console', 'optimize', 'strip', 'exclude_unused', 'packages')}
+    digest.update(json.dumps(relevant, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def record_engine_comparison(key, engine, stats):
+    """Store this build's numbers and return those of every engine for the key"""
+    if redis_url:
+        redis_key = f'engine_comparison:{key}'
+        with REDIS_ROUNDTRIP_SECONDS.time(command='engine_comparison'):
+            pipe = redis_client.pipeline()
+            pipe.hset(redis_key, engine, json.dumps(stats))
+            pipe.expire(redis_key, ENGINE_COMPARISON_TTL)
+            pipe.hgetall(redis_key)
+            entries = pipe.execute()[-1]
+        return {k.decode(): json.loads(v) for k, v in entries.items()}
+    with engine_comparisons_lock:
+        entry = engine_comparisons.setdefault(key, {})
+        entry[engine] = stats
+        engine_comparisons.move_to_end(key)
+        while len(engine_comparisons) > ENGINE_COMPARISON_LIMIT:
+            engine_comparisons.popitem(last=False)
+        return dict(entry)
+
+# Build duration prediction: every successful build records its features
+# and how long each stage took. A ridge least-squares fit per engine and stage
+# over the recent history predicts a new job's stage durations, which give
+# /status its ETA and progress and the build tool its timeout. pip timeouts
+# come from a moving average of each package's install time. Until there is
+# enough history the previous fixed timeouts apply, and they stay the floor:
+# history can only lengthen a timeout, never cut a slow build short.
+PREDICTED_STAGES = ('pip_install', 'build', 'packaging', 'post_build')
+# Seconds assumed per stage without history (pip: per package)
+DEFAULT_STAGE_SECONDS = {'pip_install': 30, 'build': 60, 'packaging': 2, 'post_build': 5}
+DEFAULT_BUILD_TIMEOUT = 240
+DEFAULT_PIP_TIMEOUT = 120
+DURATION_HISTORY_LIMIT = 2000
+DURATION_MIN_SAMPLES = int(os.environ.get('DURATION_MIN_SAMPLES', 10))
+DURATION_REFIT_INTERVAL = 60
+# Timeout = prediction * TIMEOUT_MARGIN + TIMEOUT_SLACK, within the limits
+TIMEOUT_MARGIN = float(os.environ.get('TIMEOUT_MARGIN', 3))
+TIMEOUT_SLACK = float(os.environ.get('TIMEOUT_SLACK', 30))
+MAX_BUILD_TIMEOUT = int(os.environ.get('MAX_BUILD_TIMEOUT', 1800))
+PIP_TIMEOUT_LIMITS = (DEFAULT_PIP_TIMEOUT, max(int(os.environ.get('MAX_PIP_TIMEOUT', 600)), DEFAULT_PIP_TIMEOUT))
+# Weight of the newest install in a package's moving average
+PIP_SECONDS_ALPHA = 0.3
+duration_history = deque(maxlen=DURATION_HISTORY_LIMIT)
+pip_install_seconds = {}
+_duration_models = {'fitted_at': 0.0, 'models': {}}
+_duration_models_lock = threading.Lock()
+
+def duration_features(options):
+    """Feature vector of a job (the first entry is the intercept)"""
+    try:
+        script_kb = os.path.getsize(options['file_path']) / 1024
+    except OSError:
+        script_kb = 0.0
+    extra_mb = 0.0
+    for extra_file in options['extra_files']:
+        try:
+            extra_mb += os.path.getsize(extra_file) / (1024 * 1024)
+        except OSError:
+            pass
+    packages = [pkg for pkg in options['packages'].split(',') if pkg.strip()]
+    return [
+        1.0,
+        script_kb,
+        float(len(third_party_imports(options))),
+        float(len(packages)),
+        float(options['one_file']),
+        float(options['optimize']),
+        float(options['exclude_unused']),
+        float(options['strip']),
+        float(options['benchmark']),
+        extra_mb
+    ]
+
+def fit_linear_model(rows, targets, ridge=1.0):
+    """Ridge least squares (the intercept is not penalized); returns coefficients"""
+    n = len(rows[0])
+    a = [[sum(row[i] * row[j] for row in rows) + (ridge if i == j and i else 0.0) for j in range(n)] for i in range(n)]
+    b = [sum(row[i] * target for row, target in zip(rows, targets)) for i in range(n)]
+    # Gaussian elimination with partial pivoting
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+        b[col], b[pivot] = b[pivot], b[col]
+        if abs(a[col][col]) < 1e-12:
+            continue
+        for r in range(col + 1, n):
+            factor = a[r][col] / a[col][col]
+            for c in range(col, n):
+                a[r][c] -= factor * a[col][c]
+            b[r] -= factor * b[col]
+    coefficients = [0.0] * n
+    for i in reversed(range(n)):
+        if abs(a[i][i]) >= 1e-12:
+            coefficients[i] = (b[i] - sum(a[i][j] * coefficients[j] for j in range(i + 1, n))) / a[i][i]
+    return coefficients
+
+def load_duration_history():
+    if redis_url:
+        with REDIS_ROUNDTRIP_SECONDS.time(command='duration_history'):
+            return [json.loads(entry) for entry in redis_client.lrange('build_durations', 0, -1)]
+    return list(duration_history)
+
+def duration_models():
+    """(engine, stage) -> coefficients, refitted from the history now and then"""
+    with _duration_models_lock:
+        if time.time() - _duration_models['fitted_at'] < DURATION_REFIT_INTERVAL:
+            return _duration_models['models']
+        _duration_models['fitted_at'] = time.time()
+    
+    samples = {}
+    for entry in load_duration_history():
+        for stage, seconds in entry['stages'].items():
+            if stage == 'pip_install':
+                continue
+            samples.setdefault((entry['engine'], stage), []).append((entry['features'], seconds))
+    models = {
+        key: (fit_linear_model([f for f, _ in rows], [s for _, s in rows]), max(s for _, s in rows))
+        for key, rows in samples.items() if len(rows) >= DURATION_MIN_SAMPLES
+    }
+    with _duration_models_lock:
+        _duration_models['models'] = models
+    return models
+
+def predict_stage_seconds(options, features):
+    """Predicted seconds per stage, and whether the build stage is from a model"""
+    models = duration_models()
+    packages = [pkg.strip() for pkg in options['packages'].split(',') if pkg.strip()]
+    # pip time is the sum of the packages' own averages
+    predicted = {'pip_install': sum(
+        pip_install_seconds_for(pkg) or DEFAULT_STAGE_SECONDS['pip_install'] for pkg in packages
+    )}
+    for stage in PREDICTED_STAGES[1:]:
+        model = models.get((options['engine'], stage))
+        if model is not None:
+            coefficients, longest = model
+            seconds = sum(c * x for c, x in zip(coefficients, features))
+            # A linear fit extrapolates badly; keep within what has been seen
+            predicted[stage] = min(max(seconds, 0.1), 2 * longest)
+        else:
+            predicted[stage] = DEFAULT_STAGE_SECONDS[stage]
+    return predicted, (options['engine'], 'build') in models
+
+def adaptive_timeout(predicted, limits):
+    low, high = limits
+    return int(min(max(predicted * TIMEOUT_MARGIN + TIMEOUT_SLACK, low), high))
+
+def build_timeout(options, predicted, trained):
+    fixed = NUITKA_TIMEOUT if options['engine'] == 'nuitka' else DEFAULT_BUILD_TIMEOUT
+    if not trained:
+        return fixed
+    return adaptive_timeout(predicted['build'], (fixed, max(MAX_BUILD_TIMEOUT, fixed)))
+
+def pip_install_seconds_for(pkg):
+    if redis_url:
+        with REDIS_ROUNDTRIP_SECONDS.time(command='duration_history'):
+            seconds = redis_client.hget('pip_install_seconds', pkg)
+        return float(seconds) if seconds is not None else None
+    return pip_install_seconds.get(pkg)
+
+def pip_timeout(pkg):
+    seconds = pip_install_seconds_for(pkg)
+    if seconds is None:
+        return DEFAULT_PIP_TIMEOUT
+    return adaptive_timeout(seconds, PIP_TIMEOUT_LIMITS)
+
+def record_pip_seconds(pkg, seconds):
+    previous = pip_install_seconds_for(pkg)
+    average = seconds if previous is None else PIP_SECONDS_ALPHA * seconds + (1 - PIP_SECONDS_ALPHA) * previous
+    if redis_url:
+        with REDIS_ROUNDTRIP_SECONDS.time(command='duration_history'):
+            redis_client.hset('pip_install_seconds', pkg, average)
+    else:
+        pip_install_seconds[pkg] = average
+
+def record_build_durations(options, features, stage_seconds, predicted):
+    """Add a successful build to the training history"""
+    entry = {'engine': options['engine'], 'features': features, 'stages': stage_seconds}
+    if redis_url:
+        with REDIS_ROUNDTRIP_SECONDS.time(command='duration_history'):
+            pipe = redis_client.pipeline()
+            pipe.lpush('build_durations', json.dumps(entry))
+            pipe.ltrim('build_durations', 0, DURATION_HISTORY_LIMIT - 1)
+            pipe.execute()
+    else:
+        duration_history.append(entry)
+    if 'build' in stage_seconds and predicted['build'] > 0:
+        BUILD_PREDICTION_RATIO.observe(stage_seconds['build'] / predicted['build'], engine=options['engine'])
+
+def stage_timing(status):
+    """ETA and progress of a running job from its predicted stage durations"""
+    predicted = status['predicted_seconds']
+    stage = status['stage']
+    total = sum(predicted.values()) or 1.0
+    index = PREDICTED_STAGES.index(stage)
+    done = sum(predicted[s] for s in PREDICTED_STAGES[:index])
+    elapsed = time.time() - status['stage_started']
+    # An overrunning stage holds at 95% of its share rather than running ahead
+    current = min(elapsed, 0.95 * predicted[stage])
+    stage_remaining = max(predicted[stage] - elapsed, 0.0)
+    return {
+        'stage': stage,
+        'stage_eta_seconds': round(stage_remaining, 1),
+        'eta_seconds': round(stage_remaining + sum(predicted[s] for s in PREDICTED_STAGES[index + 1:]), 1),
+        'progress': min(int(100 * (done + current) / total), 99)
+    }
+
+# Dependency pre-warming: every build records its requested packages and the
+# third-party modules its scripts import. While the build workers are idle,
+# the PREWARM_TOP_N most used package sets are installed and run through a
+# throwaway PyInstaller build of a script importing those modules, so the
+# first real build of the day finds pip, PyInstaller's binary cache and the
+# OS page cache warm instead of paying for them.
+PREWARM_TOP_N = int(os.environ.get('PREWARM_TOP_N', 5))  # 0 disables the pre-warmer
+PREWARM_INTERVAL = int(os.environ.get('PREWARM_INTERVAL', 300))
+# Sets are warmed again after this long (packages may have new releases)
+PREWARM_MAX_AGE = int(os.environ.get('PREWARM_MAX_AGE', 24 * 3600))
+PREWARM_TIMEOUT = 600
+PREWARM_MAX_MODULES = 50
+DEPENDENCY_USAGE_LIMIT = 1000
+DEPENDENCY_USAGE_TTL = 30 * 24 * 3600
+dependency_usage = OrderedDict()
+dependency_usage_lock = threading.Lock()
+
+def install_package(pkg, timeout=120, env=None):
+    """pip install into the server's environment; returns True if it already was"""
+    pip_result = subprocess.run(
+        [sys.executable, '-m', 'pip', 'install', pkg],
+        check=True,
+        capture_output=True,
+        timeout=timeout,
+        env=dict(os.environ, **env) if env else None
+    )
+    return b'Successfully installed' not in pip_result.stdout
+
+def dependency_set_key(packages):
+    """Normalized package list of a build, or None if it requests none"""
+    specs = sorted({pkg.strip().lower() for pkg in packages.split(',') if pkg.strip()})
+    return ','.join(specs) or None
+
+def third_party_imports(options):
+    """Modules a job's scripts import that are neither stdlib nor its own files"""
+    paths = [options['file_path']] + options['extra_files']
+    own_modules = {os.path.splitext(os.path.basename(path))[0] for path in paths}
+    stdlib = getattr(sys, 'stdlib_module_names', ())
+    return sorted(m for m in detect_imports(paths) if m not in stdlib and m not in own_modules)
+
+def record_dependency_usage(options):
+    """Count a build against its package set; returns the set's key"""
+    key = dependency_set_key(options['packages'])
+    if key is None:
+        return None
+    imports = third_party_imports(options)
+    if redis_url:
+        with REDIS_ROUNDTRIP_SECONDS.time(command='dependency_usage'):
+            pipe = redis_client.pipeline()
+            pipe.zincrby('dependency_sets', 1, key)
+            # Keep the most used sets only
+            pipe.zremrangebyrank('dependency_sets', 0, -DEPENDENCY_USAGE_LIMIT - 1)
+            if imports:
+                pipe.sadd(f'dependency_set_imports:{key}', *imports)
+            pipe.expire(f'dependency_set_imports:{key}', DEPENDENCY_USAGE_TTL)
+            pipe.execute()
+        return key
+    with dependency_usage_lock:
+        entry = dependency_usage.setdefault(key, {'builds': 0, 'imports': set()})
+        entry['builds'] += 1
+        entry['imports'].update(imports)
+        dependency_usage.move_to_end(key)
+        while len(dependency_usage) > DEPENDENCY_USAGE_LIMIT:
+            dependency_usage.popitem(last=False)
+    return key
+
+def popular_dependency_sets(limit=PREWARM_TOP_N):
+    """[(key, builds, imports), ...] of the most used package sets"""
+    if limit <= 0:
+        return []
+    if redis_url:
+        with REDIS_ROUNDTRIP_SECONDS.time(command='dependency_usage'):
+            top = redis_client.zrevrange('dependency_sets', 0, limit - 1, withscores=True)
+            pipe = redis_client.pipeline()
+            for key, _ in top:
+                pipe.smembers(f'dependency_set_imports:{key.decode()}')
+            members = pipe.execute()
+        return [
+            (key.decode(), int(builds), sorted(m.decode() for m in imports))
+            for (key, builds), imports in zip(top, members)
+        ]
+    with dependency_usage_lock:
+        entries = [(key, entry['builds'], sorted(entry['imports'])) for key, entry in dependency_usage.items()]
+    return sorted(entries, key=lambda entry: -entry[1])[:limit]
+
+def prewarm_state_path():
+    return os.path.join(app.config['BUILD_CACHE_FOLDER'], 'prewarm.json')
+
+def read_prewarm_state():
+    """Set key -> {'state': 'warm' or 'failed', 'warmed_at', 'seconds'} on this host"""
+    try:
+        with open(prewarm_state_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def dependency_set_state(key, prewarm_state):
+    entry = prewarm_state.get(key)
+    if entry is None or time.time() - entry['warmed_at'] > PREWARM_MAX_AGE:
+        return 'cold'
+    return entry['state']
+
+def prewarm_modules(key, imports):
+    """Modules for the warm-up script: recorded imports plus the packages' own"""
+    from importlib.metadata import packages_distributions
+    # Distribution names without extras, version specifiers or markers
+    names = {re.split(r'[\[<>=!~;@ ]', spec, 1)[0].replace('_', '-') for spec in key.split(',')}
+    modules = set(imports)
+    for module, distributions in packages_distributions().items():
+        if any(dist.lower().replace('_', '-') in names for dist in distributions) and not module.startswith('_'):
+            modules.add(module)
+    return sorted(m for m in modules if m.isidentifier() and importlib.util.find_spec(m) is not None)[:PREWARM_MAX_MODULES]
+
+def prewarm_dependency_set(key, imports):
+    """Install a package set and analyze it with a throwaway build"""
+    for pkg in key.split(','):
+        install_package(pkg)
+    
+    work_dir = tempfile.mkdtemp(prefix='prewarm-')
+    scratch = None
+    try:
+        script_path = os.path.join(work_dir, 'prewarm.py')
+        with open(script_path, 'w') as f:
+            f.writelines(f'import {module}\n' for module in prewarm_modules(key, imports))
+        options = {'packages': key, 'engine': 'pyinstaller', 'work_dir': work_dir}
+        scratch = scratch_space.acquire(f"prewarm-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}", options)
+        build_engine.run(
+            ['--onedir', '--noupx',
+             '--workpath', os.path.join(scratch['path'], 'build'),
+             '--distpath', os.path.join(scratch['path'], 'dist'),
+             '--specpath', work_dir, script_path],
+            cwd=work_dir,
+            timeout=PREWARM_TIMEOUT
+        )
+    finally:
+        scratch_space.release(scratch)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def builds_idle():
+    return scheduler.queue_depth() == 0 and scheduler.active_count() == 0
+
+def prewarm_popular_sets():
+    """Warm the most used package sets that are cold, while no builds run"""
+    prewarm_state = read_prewarm_state()
+    for key, builds, imports in popular_dependency_sets():
+        if dependency_set_state(key, prewarm_state) != 'cold':
+            continue
+        if not builds_idle():
+            return
+        logger.info(f"Pre-warming dependency set: {key}")
+        started = time.perf_counter()
+        try:
+            prewarm_dependency_set(key, imports)
+            state = 'warm'
+        except Exception as e:
+            logger.warning(f"Pre-warming {key} failed: {str(e)}")
+            state = 'failed'
+        PREWARM_RUNS.inc(outcome=state)
+        prewarm_state = read_prewarm_state()
+        prewarm_state[key] = {'state': state, 'warmed_at': time.time(), 'seconds': time.perf_counter() - started}
+        os.makedirs(app.config['BUILD_CACHE_FOLDER'], exist_ok=True)
+        tmp_path = f'{prewarm_state_path()}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(prewarm_state, f)
+        os.replace(tmp_path, prewarm_state_path())
+
+def prewarm_loop():
+    while True:
+        time.sleep(PREWARM_INTERVAL)
+        try:
+            prewarm_popular_sets()
+        except Exception as e:
+            logger.error(f"Error during dependency pre-warming: {str(e)}")
+
+def dependency_set_metrics():
+    """Builds per popular package set, labelled with its warm/cold state"""
+    prewarm_state = read_prewarm_state()
+    return {
+        (key, dependency_set_state(key, prewarm_state)): builds
+        for key, builds, _ in popular_dependency_sets()
+    }
+
+# Content-addressed artifact store: build outputs are hardlinked to
+# UPLOAD_FOLDER/.cas/<sha256[:2]>/<sha256>, so files that many bundles share
+# (interpreter, shared libraries) take disk space once. An object's link
+# count minus one is the number of session files using it; objects with no
+# users left are garbage-collected. Zip downloads are never written to disk:
+# they are streamed from the (deduplicated) files listed in the manifest.
+CAS_DIRNAME = '.cas'
+MANIFEST_FILENAME = '.manifest.json'
+ARTIFACT_CHUNK_SIZE = 1024 * 1024
+
+def cas_root():
+    return os.path.join(app.config['UPLOAD_FOLDER'], CAS_DIRNAME)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(ARTIFACT_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def store_file(path, digest=None):
+    """Deduplicate a file against the store; returns (digest, was_already_stored)"""
+    digest = digest or file_sha256(path)
+    object_path = os.path.join(cas_root(), digest[:2], digest)
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    try:
+        # Already a link to the object (renaming over it would be a no-op)
+        if os.path.samefile(path, object_path):
+            return digest, True
+    except FileNotFoundError:
+        pass
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        # Swap our copy for a link to the stored object
+        os.link(object_path, tmp_path)
+        os.replace(tmp_path, path)
+        return digest, True
+    except FileNotFoundError:
+        pass  # Not stored yet (or just garbage-collected): our copy becomes the object
+    try:
+        os.link(path, object_path)
+    except FileExistsError:
+        return store_file(path, digest)  # Stored concurrently; link to that copy instead
+    return digest, False
+
+def store_artifacts(work_dir, files, zip_name=None):
+    """Deduplicate a build's output files and write its manifest.
+
+    files is a list of (path, arcname). With zip_name the download is a zip
+    of the files under that name, assembled on request by stream_zip().
+    Returns (manifest, bytes that were already in the store).
+    """
+    entries = []
+    saved = 0
+    for path, arcname in files:
+        size = os.path.getsize(path)
+        try:
+            digest, already_stored = store_file(path)
+        except OSError as e:
+            # e.g. a filesystem without hardlinks: keep the plain copy
+            logger.warning(f"Could not deduplicate {path}: {str(e)}")
+            digest, already_stored = None, False
+        if already_stored:
+            saved += size
+        # The session's own link keeps the data alive even if the object is collected
+        entries.append({'path': path, 'arcname': arcname, 'digest': digest, 'size': size})
+    manifest = {'zip_name': zip_name, 'files': entries, 'version': register_version(zip_name, entries)}
+    with open(os.path.join(work_dir, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f)
+    return manifest, saved
+
+def read_manifest(work_dir):
+    if work_dir is None:
+        return None
+    try:
+        with open(os.path.join(work_dir, MANIFEST_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class _ZipSink:
+    """Write-only stream for ZipFile that hands out what was written so far"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_zip(entries, extra_members=()):
+    """Yield a zip of the (path, arcname) entries without writing it to disk.
+
+    extra_members are (arcname, bytes) written after the files.
+    """
+    import zipfile  # Build-only; kept off the web tier's import path
+    sink = _ZipSink()
+    # The sink cannot seek, so ZipFile writes sizes in data descriptors
+    with zipfile.ZipFile(sink, 'w') as zipf:
+        for path, arcname in entries:
+            with open(path, 'rb') as src, zipf.open(zipfile.ZipInfo.from_file(path, arcname), 'w') as dst:
+                for chunk in iter(lambda: src.read(ARTIFACT_CHUNK_SIZE), b''):
+                    dst.write(chunk)
+                    yield sink.take()
+        for arcname, data in extra_members:
+            zipf.writestr(arcname, data)
+    yield sink.take()
+
+def collect_artifact_garbage():
+    """Delete store objects no session or retained version uses; returns bytes freed"""
+    keep = retained_version_digests()
+    freed = 0
+    for root, dirs, files in os.walk(cas_root()):
+        if root == versions_root():
+            continue
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.lstat(path)
+                if st.st_nlink == 1 and name not in keep:
+                    os.unlink(path)
+                    freed += st.st_size
+            except OSError:
+                pass
+    return freed
+
+# Delta downloads: every download is registered as a version (by hash) that
+# lists its files' store digests. A client that presents the hash of its
+# previous download (?base=<hash>) gets only what changed: for a zip, a zip
+# of the changed files plus a .delta.json listing removed ones; for a single
+# executable, a binary delta. apply_delta.py applies either locally.
+# Versions (and so the objects they reference) are kept for
+# ARTIFACT_VERSION_TTL seconds after their last build.
+ARTIFACT_VERSION_TTL = int(os.environ.get('ARTIFACT_VERSION_TTL', 7 * 24 * 3600))
+DELTA_MAGIC = b'PYXDELTA1\n'
+DELTA_BLOCK_SIZE = 64 * 1024
+# PyInstaller's CArchive (PKG) layout, see PyInstaller/archive/readers.py
+PKG_COOKIE_MAGIC = b'MEI\014\013\012\013\016'
+PKG_COOKIE = struct.Struct('!8sIIii64s')
+PKG_TOC_ENTRY = struct.Struct('!iIIIBB')
+
+def versions_root():
+    return os.path.join(cas_root(), 'versions')
+
+def version_hash(entries):
+    """Hash identifying a zip download by its files; must match tree_hash() in apply_delta.py"""
+    lines = ''.join(f"{entry['arcname']}\0{entry['digest']}\n" for entry in sorted(entries, key=lambda e: e['arcname']))
+    return hashlib.sha256(lines.encode('utf-8')).hexdigest()
+
+def register_version(zip_name, entries):
+    """Record a download under its version hash; returns the hash (None if not stored)"""
+    if not entries or any(entry['digest'] is None for entry in entries):
+        return None
+    kind = 'zip' if zip_name else 'file'
+    version = entries[0]['digest'] if kind == 'file' else version_hash(entries)
+    os.makedirs(versions_root(), exist_ok=True)
+    path = os.path.join(versions_root(), f'{version}.json')
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'kind': kind, 'files': [{k: entry[k] for k in ('arcname', 'digest', 'size')} for entry in entries]}, f)
+    # Rewriting also renews the version's retention time
+    os.replace(tmp_path, path)
+    return version
+
+def read_version(version):
+    if not re.fullmatch(r'[0-9a-f]{64}', version or ''):
+        return None
+    try:
+        with open(os.path.join(versions_root(), f'{version}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def retained_version_digests():
+    """Object digests referenced by unexpired versions (expired ones are deleted)"""
+    digests = set()
+    try:
+        names = os.listdir(versions_root())
+    except OSError:
+        return digests
+    now = time.time()
+    for name in names:
+        path = os.path.join(versions_root(), name)
+        try:
+            if now - os.path.getmtime(path) > ARTIFACT_VERSION_TTL:
+                os.unlink(path)
+                continue
+            with open(path) as f:
+                digests.update(entry['digest'] for entry in json.load(f)['files'])
+        except (OSError, ValueError, KeyError):
+            pass
+    return digests
+
+def executable_segments(data):
+    """Split an executable into segments that survive rebuilds unchanged.
+
+    PyInstaller executables are cut along their CArchive table of contents,
+    so each bundled file is one segment; anything else is cut into blocks.
+    Returns sorted (offset, length) pairs covering the whole file.
+    """
+    bounds = {0, len(data)}
+    cookie = data.rfind(PKG_COOKIE_MAGIC)
+    if cookie != -1 and cookie + PKG_COOKIE.size <= len(data):
+        _, pkg_length, toc_offset, toc_length, _, _ = PKG_COOKIE.unpack_from(data, cookie)
+        start = cookie + PKG_COOKIE.size - pkg_length
+        if start >= 0 and toc_offset + toc_length <= pkg_length:
+            bounds.update((start, start + toc_offset, cookie, cookie + PKG_COOKIE.size))
+            offset = start + toc_offset
+            while offset + PKG_TOC_ENTRY.size <= start + toc_offset + toc_length:
+                entry_length, data_offset, data_length = PKG_TOC_ENTRY.unpack_from(data, offset)[:3]
+                if entry_length <= 0 or start + data_offset + data_length > len(data):
+                    break
+                bounds.update((start + data_offset, start + data_offset + data_length))
+                offset += entry_length
+    if len(bounds) == 2:
+        bounds.update(range(0, len(data), DELTA_BLOCK_SIZE))
+    edges = sorted(bounds)
+    return [(a, b - a) for a, b in zip(edges, edges[1:])]
+
+def binary_delta(base_path, target_path):
+    """Delta that turns the base executable into the target (see apply_delta.py)"""
+    with open(base_path, 'rb') as f:
+        base = f.read()
+    with open(target_path, 'rb') as f:
+        target = f.read()
+    base_segments = {}
+    for offset, length in executable_segments(base):
+        base_segments.setdefault(hashlib.sha256(base[offset:offset + length]).digest(), offset)
+    
+    # ops: [base_offset, length] copies from the base, [-1, length] takes literal bytes
+    ops = []
+    literals = []
+    for offset, length in executable_segments(target):
+        segment = target[offset:offset + length]
+        base_offset = base_segments.get(hashlib.sha256(segment).digest(), -1)
+        if base_offset == -1:
+            literals.append(segment)
+        previous = ops[-1] if ops else None
+        if previous and previous[0] == -1 and base_offset == -1:
+            previous[1] += length
+        elif previous and previous[0] != -1 and base_offset == previous[0] + previous[1]:
+            previous[1] += length
+        else:
+            ops.append([base_offset, length])
+    header = json.dumps({
+        'base': hashlib.sha256(base).hexdigest(),
+        'target': hashlib.sha256(target).hexdigest(),
+        'ops': ops
+    }).encode('utf-8')
+    return DELTA_MAGIC + struct.pack('!I', len(header)) + header + b''.join(literals)
+
+def delta_download(session_id, filename, base_version):
+    """Delta response from base_version to this download, or None if not possible"""
+    work_dir = safe_join(app.config['UPLOAD_FOLDER'], session_id)
+    manifest = read_manifest(work_dir) if work_dir else None
+    base = read_version(base_version)
+    if not manifest or not base or not manifest.get('version'):
+        return None
+    is_zip = manifest.get('zip_name') is not None
+    if (filename != manifest['zip_name'] if is_zip else filename != manifest['files'][0]['arcname']):
+        return None
+    if (base['kind'] == 'zip') != is_zip:
+        return None
+    
+    if not is_zip:
+        base_path = os.path.join(cas_root(), base['files'][0]['digest'][:2], base['files'][0]['digest'])
+        if not os.path.exists(base_path):
+            return None
+        delta = binary_delta(base_path, manifest['files'][0]['path'])
+        response = Response(delta, mimetype='application/octet-stream')
+        response.headers.set('Content-Disposition', 'attachment', filename=f'{filename}.delta')
+    else:
+        base_files = {entry['arcname']: entry['digest'] for entry in base['files']}
+        changed = [(entry['path'], entry['arcname']) for entry in manifest['files']
+                   if base_files.get(entry['arcname']) != entry['digest']]
+        target_names = {entry['arcname'] for entry in manifest['files']}
+        info = json.dumps({
+            'base': base_version,
+            'target': manifest['version'],
+            'removed': sorted(name for name in base_files if name not in target_names)
+        })
+        response = Response(stream_zip(changed, extra_members=[('.delta.json', info)]), mimetype='application/zip')
+        response.headers.set('Content-Disposition', 'attachment', filename=f'{os.path.splitext(filename)[0]}.delta.zip')
+    response.headers['X-Delta-Base'] = base_version
+    response.headers['X-Artifact-Hash'] = manifest['version']
+    DELTA_DOWNLOADS.inc(kind=base['kind'])
+    return response
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+_artifact_store_stats = {'physical': 0, 'logical': 0, 'checked': 0.0}
 
-@app.route('/')
-def index():
-    return render_template_string(HTML_TEMPLATE, current_year=datetime.now().year, download_link=None)
+def artifact_store_stats():
+    """Bytes stored once in the store vs. bytes referenced by sessions (cached)"""
+    now = time.time()
+    if now - _artifact_store_stats['checked'] > UPLOAD_FOLDER_USAGE_TTL:
+        physical = logical = 0
+        for root, dirs, files in os.walk(cas_root()):
+            if root == versions_root():
+                continue
+            for name in files:
+                try:
+                    st = os.lstat(os.path.join(root, name))
+                except OSError:
+                    continue
+                physical += st.st_size
+                logical += st.st_size * max(st.st_nlink - 1, 0)
+        _artifact_store_stats.update(physical=physical, logical=logical, checked=now)
+    return _artifact_store_stats
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
-    if 'file' not in request.files:
-        return jsonify(success=False, message='No file part')
+def artifact_dedup_ratio():
+    stats = artifact_store_stats()
+    return stats['logical'] / stats['physical'] if stats['physical'] else 1.0
+
+# Iterative rebuilds. A job submitted with iterate_from=<earlier session id>
+# (and that job's token as iterate_token, or in a job token header) continues
+# the earlier job's lineage; iterate=on starts a new one. Every lineage has a
+# build workspace under .iterate in UPLOAD_FOLDER holding the sources at
+# stable paths, the spec file and PyInstaller's work dir, so PyInstaller's
+# up-to-date checks skip the analysis, PYZ and PKG steps whose inputs did not
+# change. Those checks compare modification times, so a source is only
+# rewritten when its content changed. pip is skipped when the package list is
+# the same as last time. (Nuitka reuses compiled modules across all builds
+# already, through ccache and its own cache.)
+ITERATE_DIRNAME = '.iterate'
+ITERATE_STATE_FILENAME = 'iterate.json'
+ITERATE_TTL = int(os.environ.get('ITERATE_TTL', 3600))
+
+def iteration_options(form):
+    """The job's place in a lineage of iterative builds, or None"""
+    previous = form.get('iterate_from', '').strip()
+    if not previous:
+        return {'from': None, 'lineage': None, 'packages': None} if 'iterate' in form else None
+    journal = read_journal(previous) if safe_join(app.config['UPLOAD_FOLDER'], previous) else None
+    if journal is None:
+        return {'from': previous, 'lineage': None, 'packages': None}
+    earlier = journal['options']
+    return {
+        'from': previous,
+        'lineage': (earlier.get('iterate') or {}).get('lineage') or previous,
+        'packages': earlier['packages']
+    }
+
+def iterate_rejection(form):
+    """A JOB_TOKEN_ERRORS key if the job to iterate on may not be used, else None"""
+    previous = form.get('iterate_from', '').strip()
+    if not previous:
+        return None
+    token = form.get('iterate_token') or request_job_token(request.headers, request.args)
+    return job_token_rejection(previous, token)
+
+def read_iterate_state(path):
+    try:
+        with open(os.path.join(path, ITERATE_STATE_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def acquire_iterate_workspace(session_id, options):
+    """Lock the lineage's workspace and bring its sources up to date.
+
+    Returns None when the lineage is busy with another build, which then
+    builds from scratch instead.
+    """
+    lineage = options['iterate']['lineage'] or session_id
+    path = os.path.join(app.config['UPLOAD_FOLDER'], ITERATE_DIRNAME, lineage)
+    src_dir = os.path.join(path, 'src')
+    os.makedirs(src_dir, exist_ok=True)
+    lock_file = open(os.path.join(path, '.lock'), 'w')
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
     
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify(success=False, message='No selected file')
+    state = read_iterate_state(path) or {}
+    known = state.get('files') or {}
+    files = {}
+    changed = []
+    for source in [options['file_path']] + options['extra_files']:
+        name = os.path.basename(source)
+        files[name] = file_sha256(source)
+        target = os.path.join(src_dir, name)
+        if known.get(name) != files[name] or not os.path.exists(target):
+            shutil.copyfile(source, target)
+            changed.append(name)
+    for name in set(known) - set(files):
+        try:
+            os.remove(os.path.join(src_dir, name))
+        except OSError:
+            pass
+        changed.append(name)
+    return {
+        'lineage': lineage,
+        'path': path,
+        'lock': lock_file,
+        # A workspace a build has completed in before
+        'warm': 'build_seconds' in state,
+        'state': state,
+        'files': files,
+        'changed': sorted(changed),
+        'file_path': os.path.join(src_dir, os.path.basename(options['file_path'])),
+        'extra_files': [os.path.join(src_dir, os.path.basename(extra)) for extra in options['extra_files']]
+    }
+
+def release_iterate_workspace(workspace, options, build_seconds=None):
+    """Record a finished build in the workspace and unlock it"""
+    if build_seconds is not None:
+        state = {
+            'files': workspace['files'],
+            'packages': options['packages'],
+            'build_seconds': build_seconds,
+            'updated': time.time()
+        }
+        tmp_path = os.path.join(workspace['path'], f'{ITERATE_STATE_FILENAME}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, os.path.join(workspace['path'], ITERATE_STATE_FILENAME))
+    workspace['lock'].close()
+
+def start_iterate_build(session_id, options, predicted):
+    """Set up an iterative rebuild, if the job asked for one.
+
+    Returns (workspace or None, the options to build with, the expected
+    stage durations, whether pip can be skipped).
+    """
+    if not options.get('iterate'):
+        return None, options, predicted, False
+    if options['iterate']['from'] and not options['iterate']['lineage']:
+        update_conversion_status(
+            session_id, log=f"Session {options['iterate']['from']} not found (expired?); starting a new lineage"
+        )
     
-    if not file or not allowed_file(file.filename):
-        return jsonify(success=False, message='Only Python (.py) files are allowed')
+    build_options = options
+    expected = predicted
+    workspace = acquire_iterate_workspace(session_id, options)
+    if workspace is None:
+        ITERATE_BUILDS.inc(workspace='busy')
+        update_conversion_status(session_id, log='The workspace is busy with another build; building from scratch')
+    else:
+        ITERATE_BUILDS.inc(workspace='warm' if workspace['warm'] else 'new')
+        update_conversion_status(
+            session_id,
+            log=f"Incremental rebuild in workspace {workspace['lineage']}: changed {', '.join(workspace['changed']) or 'nothing'}"
+            if workspace['warm'] else f"New incremental build workspace {workspace['lineage']}"
+        )
+        if options['engine'] == 'pyinstaller':
+            build_options = dict(
+                options,
+                file_path=workspace['file_path'],
+                extra_files=workspace['extra_files'],
+                iterate_dir=workspace['path']
+            )
+        if workspace['warm']:
+            expected = dict(predicted, build=min(workspace['state']['build_seconds'], predicted['build']))
     
-    try:
-        # Create session ID
-        session_id = str(uuid.uuid4())
-        session['session_id'] = session_id
-        session.modified = True  # Explicitly mark the session as modified
-        
-        logger.info(f"Created new session: {session_id}")
-        
-        # Initialize status
-        initial_status = {
-            'progress': 0,
-            'status': 'Initializing...',
-            'completed': False,
-            'success': False,
-            'message': '',
-            'log': [],
-            'download_url': None,
-            'timestamp': time.time()
-        }
-        set_conversion_status(session_id, initial_status)
-        
-        # Create work directory
-        work_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-        os.makedirs(work_dir, exist_ok=True)
-        
-        # Save the main Python file
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(work_dir, filename)
-        file.save(file_path)
-        
-        # Save additional files if provided
-        extra_files_paths = []
-        if 'extra_files' in request.files:
-            extra_files = request.files.getlist('extra_files')
-            for extra_file in extra_files:
-                if extra_file.filename != '':
-                    extra_filename = secure_filename(extra_file.filename)
-                    extra_file_path = os.path.join(work_dir, extra_filename)
-                    extra_file.save(extra_file_path)
-                    extra_files_paths.append(extra_file_path)
-        
-        # Get options
-        options = {
-            'one_file': 'one_file' in request.form,
-            'console': 'console' in request.form,
-            'uac': 'uac' in request.form,
-            'debug': 'debug' in request.form,
-            'packages': request.form.get('packages', ''),
-            'platform': request.form.get('platform', 'auto'),
-            'file_path': file_path,
-            'work_dir': work_dir,
-            'extra_files': extra_files_paths
-        }
-        
-        # Start conversion in background thread
-        thread = threading.Thread(
-            target=convert_in_background,
-            args=(session_id, options),
-            daemon=True
+    # Same packages as the previous build of the lineage (by the earlier
+    # job's options, or the workspace's record if that job has expired)
+    previous_packages = (options['iterate']['packages'], workspace and workspace['state'].get('packages'))
+    packages_unchanged = bool(options['packages']) and options['packages'] in previous_packages
+    return workspace, build_options, expected, packages_unchanged
+
+def finish_iterate_build(session_id, options, workspace, seconds, build_seconds, predicted, trained, incremental):
+    """Record a successful iterative build in its workspace and release it.
+
+    Returns the build_info['iterate'] summary, with the time saved against
+    the predicted duration of a cold build.
+    """
+    cold_seconds = (predicted['pip_install'] if options['packages'] else 0.0) + predicted['build']
+    # The first build in a workspace is a cold build itself
+    saved_seconds = max(cold_seconds - seconds, 0.0) if incremental else None
+    if saved_seconds is not None:
+        ITERATE_SECONDS_SAVED.observe(saved_seconds)
+        update_conversion_status(
+            session_id,
+            log=f"Incremental rebuild took {seconds:.0f}s, about {saved_seconds:.0f}s less than a cold build"
         )
-        thread.start()
+    release_iterate_workspace(workspace, options, build_seconds)
+    return {
+        'from': options['iterate']['from'],
+        'lineage': workspace['lineage'],
+        'changed_files': workspace['changed'],
+        'seconds': round(seconds, 1),
+        'cold_seconds': round(cold_seconds, 1),
+        'saved_seconds': None if saved_seconds is None else round(saved_seconds, 1),
+        # Whether the cold estimate comes from build history or defaults
+        'predicted': trained
+    }
+
+def expire_iterate_workspaces():
+    """Remove lineage workspaces unused for ITERATE_TTL; returns how many"""
+    root = os.path.join(app.config['UPLOAD_FOLDER'], ITERATE_DIRNAME)
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    for lineage in os.listdir(root):
+        path = os.path.join(root, lineage)
+        state = read_iterate_state(path)
+        last_used = state['updated'] if state else os.path.getmtime(path)
+        if time.time() - last_used <= ITERATE_TTL:
+            continue
+        with open(os.path.join(path, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # A build is using it right now
+            shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+# Build profiling (opt-in per job with the "profile" field): the build
+# worker thread and every Python child process (pip, PyInstaller and its
+# hook subprocesses, Nuitka's front-end) are sampled by sampling_profiler;
+# children load it through profile_hook/sitecustomize.py on PYTHONPATH. The
+# merged folded stacks (flamegraph.pl/speedscope input) and a Chrome trace
+# of the stages and child processes are kept in the job's .profile dir and
+# served by /profile/<session_id>.
+PROFILE_DIRNAME = '.profile'
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.01))
+PROFILE_HOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profile_hook')
+PROFILER_MODULE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sampling_profiler.py')
+
+class BuildProfile:
+    """Sampled stacks and a stage trace of one build"""
+
+    def __init__(self, work_dir):
+        import sampling_profiler  # Only loaded for profiled builds
+        self.dir = os.path.join(work_dir, PROFILE_DIRNAME)
+        self.children_dir = os.path.join(self.dir, 'processes')
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.children_dir)
+        self.stage = 'setup'
+        self.spans = [{'name': 'setup', 'start': time.time()}]
+        self.thread_id = threading.get_ident()
+        self.sampler = sampling_profiler.StackSampler(
+            PROFILE_SAMPLE_INTERVAL, thread_ids={self.thread_id}, label=lambda: f'converter;{self.stage}'
+        ).start()
+
+    def enter_stage(self, stage):
+        now = time.time()
+        self.spans[-1]['end'] = now
+        self.spans.append({'name': stage, 'start': now})
+        self.stage = stage
+
+    def child_env(self, label):
+        """Environment that makes a Python child process profile itself"""
+        python_path = os.environ.get('PYTHONPATH')
+        return {
+            'PYTHONPATH': PROFILE_HOOK_DIR + (os.pathsep + python_path if python_path else ''),
+            'PYEXE_PROFILER_MODULE': PROFILER_MODULE,
+            'PYEXE_PROFILE_DIR': self.children_dir,
+            'PYEXE_PROFILE_LABEL': label,
+            'PYEXE_PROFILE_INTERVAL': str(PROFILE_SAMPLE_INTERVAL)
+        }
+
+    def finish(self):
+        """Stop sampling and write profile.folded and trace.json"""
+        self.sampler.stop()
+        self.spans[-1]['end'] = time.time()
         
-        return jsonify(success=True, message='Conversion started', session_id=session_id)
+        counts = dict(self.sampler.counts)
+        children = []
+        for name in os.listdir(self.children_dir):
+            path = os.path.join(self.children_dir, name)
+            try:
+                if name.endswith('.folded'):
+                    with open(path, encoding='utf-8') as f:
+                        for line in f:
+                            stack, _, count = line.rstrip('\n').rpartition(' ')
+                            counts[stack] = counts.get(stack, 0) + int(count)
+                elif name.endswith('.json'):
+                    with open(path) as f:
+                        children.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        with open(os.path.join(self.dir, 'profile.folded'), 'w', encoding='utf-8') as f:
+            for stack, count in sorted(counts.items(), key=lambda item: -item[1]):
+                f.write(f'{stack} {count}\n')
         
-    except Exception as e:
-        logger.error(f"Error initiating conversion: {str(e)}")
-        return jsonify(success=False, message=f'Error: {str(e)}')
+        # Chrome trace (chrome://tracing, Perfetto): stages on the worker
+        # thread, then one track per profiled child process
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'converter'}}]
+        events.extend({
+            'name': span['name'], 'cat': 'stage', 'ph': 'X', 'pid': pid, 'tid': self.thread_id,
+            'ts': span['start'] * 1e6, 'dur': (span['end'] - span['start']) * 1e6
+        } for span in self.spans)
+        for child in children:
+            if not child.get('start') or not child.get('end'):
+                continue
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': child['pid'], 'args': {'name': child['label']}})
+            events.append({
+                'name': child['label'].split(';')[0], 'cat': 'process', 'ph': 'X', 'pid': child['pid'], 'tid': child['pid'],
+                'ts': child['start'] * 1e6, 'dur': (child['end'] - child['start']) * 1e6,
+                'args': {'argv': ' '.join(child['argv'])}
+            })
+        with open(os.path.join(self.dir, 'trace.json'), 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        shutil.rmtree(self.children_dir, ignore_errors=True)
 
-@app.route('/paste', methods=['POST'])
-def paste_code():
-    if 'code' not in request.form or not request.form['code'].strip():
-        return jsonify(success=False, message='No code provided')
-    
-    if 'filename' not in request.form or not request.form['filename'].strip():
-        return jsonify(success=False, message='No filename provided')
-    
-    filename = request.form['filename'].strip()
-    if not filename.endswith('.py'):
-        return jsonify(success=False, message='Filename must end with .py')
+def enter_stage(profile, stage):
+    """Mark the start of a pipeline stage for the logs and, if on, the profile"""
+    log_context.stage = stage
+    if profile is not None:
+        profile.enter_stage(stage)
+
+def build_pyinstaller_command(session_id, options, scratch_dir):
+    """Build the PyInstaller command line and environment for a job"""
+    # Build PyInstaller command
+    pyinstaller_cmd = ['pyinstaller']
     
-    try:
-        # Create session ID
-        session_id = str(uuid.uuid4())
-        session['session_id'] = session_id
-        session.modified = True  # Explicitly mark the session as modified
+    if options['one_file']:
+        pyinstaller_cmd.append('--onefile')
+    else:
+        pyinstaller_cmd.append('--onedir')
         
-        logger.info(f"Created new session from pasted code: {session_id}")
+    if not options['console']:
+        pyinstaller_cmd.append('--windowed')
         
-        # Initialize status
-        initial_status = {
-            'progress': 0,
-            'status': 'Initializing...',
-            'completed': False,
-            'success': False,
-            'message': '',
-            'log': [],
-            'download_url': None,
-            'timestamp': time.time()
-        }
-        set_conversion_status(session_id, initial_status)
+    # Only use UAC for Windows and not on Render
+    if options['uac'] and options['platform'] == 'windows' and not ON_RENDER:
+        pyinstaller_cmd.append('--uac-admin')
         
-        # Create work directory
-        work_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-        os.makedirs(work_dir, exist_ok=True)
+    if options['debug']:
+        pyinstaller_cmd.append('--debug')
         
-        # Save the pasted code to a file
-        code = request.form['code']
-        filename = secure_filename(filename)
-        file_path = os.path.join(work_dir, filename)
+    # Output optimization options
+    if options['strip']:
+        pyinstaller_cmd.append('--strip')
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(code)
+    upx_path = shutil.which('upx')
+    if options['upx'] and upx_path:
+        pyinstaller_cmd.extend(['--upx-dir', os.path.dirname(upx_path)])
+        if sys.platform != 'win32':
+            update_conversion_status(session_id, log='Note: PyInstaller only applies UPX on Windows hosts')
+    else:
+        if options['upx']:
+            update_conversion_status(session_id, log='Warning: UPX requested but not installed on the server')
+        pyinstaller_cmd.append('--noupx')
         
-        # Get options
-        options = {
-            'one_file': 'one_file' in request.form,
-            'console': 'console' in request.form,
-            'uac': 'uac' in request.form,
-            'debug': 'debug' in request.form,
-            'packages': request.form.get('packages', ''),
-            'platform': request.form.get('platform', 'auto'),
-            'file_path': file_path,
-            'work_dir': work_dir,
-            'extra_files': []
-        }
+    if options['exclude_unused']:
+        imports = detect_imports([options['file_path']] + options['extra_files'])
+        excluded = unused_heavy_modules(imports, options['packages'])
+        for module in excluded:
+            pyinstaller_cmd.extend(['--exclude-module', module])
+        if excluded:
+            update_conversion_status(session_id, log=f"Excluding unused modules: {', '.join(excluded)}")
         
-        # Start conversion in background thread
-        thread = threading.Thread(
-            target=convert_in_background,
-            args=(session_id, options),
-            daemon=True
-        )
-        thread.start()
+    # Bytecode is compiled at the optimization level of the interpreter
+    # running PyInstaller
+    build_env = {'PYTHONOPTIMIZE': str(options['optimize'])} if options['optimize'] else None
         
-        return jsonify(success=True, message='Conversion started', session_id=session_id)
+    # Intermediates and output go to scratch space; the spec file stays with
+    # the job. Iterative rebuilds keep both in their lineage's workspace.
+    if options.get('iterate_dir'):
+        pyinstaller_cmd.extend(['--workpath', os.path.join(options['iterate_dir'], 'build')])
+        pyinstaller_cmd.extend(['--specpath', options['iterate_dir']])
+    else:
+        pyinstaller_cmd.extend(['--workpath', os.path.join(scratch_dir, 'build')])
+        pyinstaller_cmd.extend(['--specpath', options['work_dir']])
+    pyinstaller_cmd.extend(['--distpath', os.path.join(scratch_dir, 'dist')])
+    
+    # Add target architecture only if not on Render
+    if not ON_RENDER:
+        if options['platform'] == 'windows':
+            pyinstaller_cmd.extend(['--target-architecture', 'x86_64-windows'])
+        elif options['platform'] == 'linux':
+            pyinstaller_cmd.extend(['--target-architecture', 'x86_64-linux'])
+        elif options['platform'] == 'macos':
+            pyinstaller_cmd.extend(['--target-architecture', 'x86_64-darwin'])
         
-    except Exception as e:
-        logger.error(f"Error initiating conversion from pasted code: {str(e)}")
-        return jsonify(success=False, message=f'Error: {str(e)}')
+    # Finally, add the script path
+    pyinstaller_cmd.append(options['file_path'])
+    
+    return pyinstaller_cmd, build_env
 
-@app.route('/status/<session_id>')
-def get_status(session_id):
-    """Get the current conversion status"""
-    logger.info(f"Status requested for session: {session_id}")
+def run_build_tool(session_id, options, scratch, timeout, profile=None):
+    """Run the job's build tool with its intermediates in the given scratch space"""
+    if options['engine'] == 'nuitka':
+        build_cmd, build_env = build_nuitka_command(session_id, options, scratch['path'])
+    else:
+        build_cmd, build_env = build_pyinstaller_command(session_id, options, scratch['path'])
+    if profile is not None:
+        build_env = dict(build_env or {}, **profile.child_env(options['engine']))
     
-    # Try to get status from Redis/memory
-    status = get_conversion_status(session_id)
+    update_conversion_status(
+        session_id, 
+        status=f"Running {'Nuitka' if options['engine'] == 'nuitka' else 'PyInstaller'}...",
+        log=f"Command: {' '.join(build_cmd)}"
+    )
     
-    if not status:
-        # Check if the session directory exists as fallback
-        work_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-        if os.path.exists(work_dir):
-            logger.info(f"Session directory exists but no status found: {session_id}")
-            # Return a generic status
-            return jsonify(
-                progress=50,
-                status='Processing conversion...',
-                completed=False,
-                success=False,
-                message='',
-                log='Reconnected to existing conversion process'
-            )
-        
-        logger.warning(f"Session ID not found: {session_id}")
-        return jsonify(
-            progress=0,
-            status='Session not found',
-            completed=True,
-            success=False,
-            message='Invalid session ID',
-            log=None
+    # Run with a timeout to prevent hanging
+    if options['engine'] == 'nuitka':
+        return subprocess.run(
+            build_cmd,
+            check=True,
+            capture_output=True,
+            cwd=options['work_dir'],
+            timeout=timeout,
+            env=dict(os.environ, **build_env)
         )
-    
-    # Only return the latest log entry
-    latest_log = status['log'][-1] if status['log'] else None
-    
-    return jsonify(
-        progress=status['progress'],
-        status=status['status'],
-        completed=status['completed'],
-        success=status['success'],
-        message=status['message'],
-        log=latest_log,
-        download_url=status['download_url']
+    return build_engine.run(
+        build_cmd[1:],
+        cwd=options['work_dir'],
+        timeout=timeout,
+        env=build_env
     )
 
 def convert_in_background(session_id, options):
     """Run the conversion process in a background thread"""
+    scratch = None
+    workspace = None
+    profile = BuildProfile(options['work_dir']) if options.get('profile') else None
     try:
-        update_conversion_status(session_id, progress=5, status='Installing dependencies...')
+        update_journal(session_id, state='running')
         
-        # Install required packages
-        if options['packages']:
-            pkg_list = [pkg.strip() for pkg in options['packages'].split(',')]
-            for pkg in pkg_list:
-                if pkg:
-                    update_conversion_status(session_id, status=f'Installing package: {pkg}')
-                    try:
-                        subprocess.run(
-                            [sys.executable, '-m', 'pip', 'install', pkg],
-                            check=True,
-                            capture_output=True,
-                            timeout=120
-                        )
-                        update_conversion_status(session_id, log=f'Successfully installed {pkg}')
-                    except Exception as e:
-                        update_conversion_status(session_id, log=f'Warning: Failed to install {pkg}: {str(e)}')
+        # Count the build towards its package set and note whether it was pre-warmed
+        try:
+            dependency_set = record_dependency_usage(options)
+        except Exception as e:
+            logger.warning(f"Could not record dependency usage: {str(e)}")
+            dependency_set = None
+        if dependency_set:
+            warm = dependency_set_state(dependency_set, read_prewarm_state()) == 'warm'
+            CACHE_REQUESTS.inc(cache='prewarm', result='hit' if warm else 'miss')
         
-        update_conversion_status(session_id, progress=15, status='Building PyInstaller command...')
+        # Predicted stage durations give /status its ETA and the build its timeout
+        features = duration_features(options)
+        predicted, trained = predict_stage_seconds(options, features)
+        stage_seconds = {}
         
-        # Build PyInstaller command
-        pyinstaller_cmd = ['pyinstaller']
+        # An iterative rebuild works in its lineage's workspace
+        workspace, build_options, expected, packages_unchanged = start_iterate_build(session_id, options, predicted)
+        # Not representative of a cold build's stage durations
+        incremental = packages_unchanged or bool(workspace and workspace['warm'])
         
-        if options['one_file']:
-            pyinstaller_cmd.append('--onefile')
-        else:
-            pyinstaller_cmd.append('--onedir')
-            
-        if not options['console']:
-            pyinstaller_cmd.append('--windowed')
-            
-        # Only use UAC for Windows and not on Render
-        if options['uac'] and options['platform'] == 'windows' and not ON_RENDER:
-            pyinstaller_cmd.append('--uac-admin')
-            
-        if options['debug']:
-            pyinstaller_cmd.append('--debug')
-            
-        # Set workdir and distpath
-        pyinstaller_cmd.extend(['--workpath', os.path.join(options['work_dir'], 'build')])
-        pyinstaller_cmd.extend(['--distpath', os.path.join(options['work_dir'], 'dist')])
-        pyinstaller_cmd.extend(['--specpath', options['work_dir']])
+        enter_stage(profile, 'pip_install')
+        update_conversion_status(session_id, status='Installing dependencies...', stage='pip_install',
+                                 predicted_seconds=dict(expected, pip_install=0.0) if packages_unchanged else expected)
         
-        # Add target architecture only if not on Render
-        if not ON_RENDER:
-            if options['platform'] == 'windows':
-                pyinstaller_cmd.extend(['--target-architecture', 'x86_64-windows'])
-            elif options['platform'] == 'linux':
-                pyinstaller_cmd.extend(['--target-architecture', 'x86_64-linux'])
-            elif options['platform'] == 'macos':
-                pyinstaller_cmd.extend(['--target-architecture', 'x86_64-darwin'])
-            
-        # Finally, add the script path
-        pyinstaller_cmd.append(options['file_path'])
+        # Install required packages (unless done before an interrupted attempt)
+        if options['packages'] and completed_stage(session_id, 'pip_install'):
+            update_conversion_status(session_id, log='Packages were installed before the restart; skipping pip')
+        elif packages_unchanged:
+            update_conversion_status(session_id, log='Packages unchanged since the previous build; skipping pip')
+            stage_seconds['pip_install'] = 0.0
+        elif options['packages']:
+            pkg_list = [pkg.strip() for pkg in options['packages'].split(',')]
+            pip_started = time.perf_counter()
+            with BUILD_STAGE_SECONDS.time(stage='pip_install'):
+                for pkg in pkg_list:
+                    if pkg:
+                        update_conversion_status(session_id, status=f'Installing package: {pkg}')
+                        try:
+                            install_started = time.perf_counter()
+                            already_installed = install_package(
+                                pkg, timeout=pip_timeout(pkg),
+                                env=profile.child_env(f'pip install {pkg}') if profile else None
+                            )
+                            record_pip_seconds(pkg, time.perf_counter() - install_started)
+                            CACHE_REQUESTS.inc(cache='pip', result='hit' if already_installed else 'miss')
+                            update_conversion_status(session_id, log=f'Successfully installed {pkg}')
+                        except Exception as e:
+                            update_conversion_status(session_id, log=f'Warning: Failed to install {pkg}: {str(e)}')
+            stage_seconds['pip_install'] = time.perf_counter() - pip_started
+            record_stage(session_id, 'pip_install')
         
-        # Run PyInstaller
-        update_conversion_status(
-            session_id, 
-            progress=25, 
-            status='Running PyInstaller...',
-            log=f"Command: {' '.join(pyinstaller_cmd)}"
-        )
+        tool = 'Nuitka' if options['engine'] == 'nuitka' else 'PyInstaller'
         
         try:
-            # Run with a timeout to prevent hanging
-            result = subprocess.run(
-                pyinstaller_cmd,
-                check=True,
-                capture_output=True,
-                cwd=options['work_dir'],
-                timeout=240  # 4 minutes timeout
-            )
-            
-            stdout = result.stdout.decode()
-            stderr = result.stderr.decode()
-            
-            # Log important output
-            for line in stdout.split('\n'):
-                if line.strip() and ('error' in line.lower() or 'warning' in line.lower() or 'info:' in line.lower()):
-                    update_conversion_status(session_id, log=line.strip())
-                    
-            for line in stderr.split('\n'):
-                if line.strip():
-                    update_conversion_status(session_id, log=line.strip())
-                    
-            update_conversion_status(session_id, progress=75, status='Processing output...')
-            
             # Determine output path
             script_name = os.path.splitext(os.path.basename(options['file_path']))[0]
             
-            if options['platform'] == 'windows' or (options['platform'] == 'auto' and not ON_RENDER):
-                exe_extension = '.exe'
-            else:
-                exe_extension = ''
+            # Neither tool can cross-compile, so the host decides the extension
+            exe_extension = '.exe' if sys.platform == 'win32' else ''
                 
             if options['one_file']:
                 exe_path = os.path.join(options['work_dir'], 'dist', script_name + exe_extension)
             else:
                 exe_path = os.path.join(options['work_dir'], 'dist', script_name, script_name + exe_extension)
             
-            update_conversion_status(session_id, progress=85, status='Packaging results...')
+            # A build that finished before an interrupted attempt is reused
+            previous_build = completed_stage(session_id, 'build')
+            if previous_build and os.path.exists(exe_path):
+                build_elapsed = previous_build['seconds']
+                update_conversion_status(session_id, log=f'Reusing the {tool} build from before the restart')
+            else:
+                update_conversion_status(session_id, status=f'Building {tool} command...', stage='build')
+                scratch = scratch_space.acquire(session_id, options)
+                update_conversion_status(session_id, log=f"Build scratch space: {scratch['location']}")
+                timeout = build_timeout(options, predicted, trained)
+                update_conversion_status(
+                    session_id,
+                    log=f"Predicted build time {predicted['build']:.0f}s, timeout {timeout}s" if trained
+                    else f'Build timeout {timeout}s (not enough build history to predict)'
+                )
+                enter_stage(profile, f"{options['engine']}_build")
+                
+                build_started = time.perf_counter()
+                try:
+                    result = run_build_tool(session_id, build_options, scratch, timeout, profile)
+                except subprocess.CalledProcessError as e:
+                    if not scratch_out_of_space(scratch, e):
+                        raise
+                    update_conversion_status(session_id, log='Build scratch space in RAM ran out; retrying on disk')
+                    scratch = scratch_space.spill(session_id, scratch, options)
+                    result = run_build_tool(session_id, build_options, scratch, timeout, profile)
+                build_elapsed = time.perf_counter() - build_started
+                stage_seconds['build'] = build_elapsed
+                move_scratch_output(scratch, options)
+            
+                stdout = result.stdout.decode()
+                stderr = result.stderr.decode()
+            
+                if options['engine'] == 'nuitka':
+                    BUILD_STAGE_SECONDS.observe(build_elapsed, stage='nuitka_compile')
+                    record_ccache_results(stdout + stderr)
+                    finish_nuitka_output(options)
+                else:
+                    analysis_elapsed = pyinstaller_analysis_seconds(stderr, build_elapsed)
+                    BUILD_STAGE_SECONDS.observe(analysis_elapsed, stage='pyinstaller_analysis')
+                    BUILD_STAGE_SECONDS.observe(build_elapsed - analysis_elapsed, stage='pyinstaller_assembly')
             
-            # Create a zip if there are multiple files or extra files
-            if not options['one_file'] or options['extra_files']:
-                zip_path = os.path.join(options['work_dir'], f'{script_name}_package.zip')
-                with zipfile.ZipFile(zip_path, 'w') as zipf:
-                    if not options['one_file']:
-                        # Add all files from dist directory
-                        dist_dir = os.path.join(options['work_dir'], 'dist', script_name)
-                        for root, dirs, files in os.walk(dist_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                arcname = os.path.relpath(file_path, dist_dir)
-                                zipf.write(file_path, arcname)
-                    else:
-                        # Add the exe file
-                        zipf.write(exe_path, os.path.basename(exe_path))
+                # Log important output
+                for line in stdout.split('\n'):
+                    if line.strip() and ('error' in line.lower() or 'warning' in line.lower() or 'info:' in line.lower()):
+                        update_conversion_status(session_id, log=line.strip())
                     
-                    # Add extra files
-                    for extra_file in options['extra_files']:
-                        zipf.write(extra_file, os.path.basename(extra_file))
-                        
-                download_path = zip_path
-                download_filename = os.path.basename(zip_path)
-            else:
-                download_path = exe_path
-                download_filename = os.path.basename(exe_path)
+                for line in stderr.split('\n'):
+                    if line.strip():
+                        update_conversion_status(session_id, log=line.strip())
+                
+                record_stage(session_id, 'build', seconds=build_elapsed)
+            
+            update_conversion_status(session_id, status='Processing output...', stage='packaging')
+            
+            enter_stage(profile, 'packaging')
+            update_conversion_status(session_id, status='Packaging results...')
+            
+            packaging_started = time.perf_counter()
+            
+            # Deduplicate the output into the artifact store. Multiple files
+            # (or extra files) are downloaded as a zip streamed from the store.
+            output_exists = os.path.exists(exe_path)
+            if output_exists:
+                if options['one_file']:
+                    files = [(exe_path, os.path.basename(exe_path))]
+                else:
+                    dist_dir = os.path.dirname(exe_path)
+                    files = []
+                    for root, dirs, names in os.walk(dist_dir):
+                        for name in names:
+                            file_path = os.path.join(root, name)
+                            files.append((file_path, os.path.relpath(file_path, dist_dir)))
+                files.extend((extra_file, os.path.basename(extra_file)) for extra_file in options['extra_files'])
+                
+                zip_name = f'{script_name}_package.zip' if not options['one_file'] or options['extra_files'] else None
+                manifest, dedup_saved = store_artifacts(options['work_dir'], files, zip_name=zip_name)
+                download_filename = zip_name or os.path.basename(exe_path)
+                artifact_size = sum(entry['size'] for entry in manifest['files'])
+            
+            stage_seconds['packaging'] = time.perf_counter() - packaging_started
+            BUILD_STAGE_SECONDS.observe(stage_seconds['packaging'], stage='packaging')
             
             # Check if the file exists
-            if os.path.exists(download_path):
+            if output_exists:
                 # Generate download URL
-                download_url = url_for(
-                    'download_file', 
-                    session_id=session_id,
-                    filename=download_filename
+                download_url = build_download_url(options, session_id, download_filename)
+                
+                # Report artifact size and, when the binary runs on this
+                # host, how long it takes to start
+                build_info = {
+                    'artifact_size': artifact_size,
+                    'bundle_size': directory_size(exe_path if options['one_file'] else os.path.dirname(exe_path)),
+                    'dedup_saved_bytes': dedup_saved,
+                    # Present as ?base= on the next download to get a delta
+                    'artifact_hash': manifest['version']
+                }
+                post_build_started = time.perf_counter()
+                if options['benchmark'] and is_native_executable(exe_path) and hasattr(os, 'wait4'):
+                    enter_stage(profile, 'benchmark')
+                    update_conversion_status(session_id, status='Benchmarking executable...', stage='post_build')
+                    benchmark_started = time.perf_counter()
+                    benchmark = benchmark_executable(exe_path, shlex.split(options['benchmark_args']), options['one_file'])
+                    BUILD_STAGE_SECONDS.observe(time.perf_counter() - benchmark_started, stage='benchmark')
+                    observe_benchmark(benchmark, options['engine'])
+                    build_info['benchmark'] = benchmark
+                    build_info['cold_start_seconds'] = None if benchmark['timed_out'] else benchmark['cold_seconds']
+                    update_conversion_status(
+                        session_id,
+                        log=f"Benchmark: cold {benchmark['cold_seconds']:.2f}s, peak RSS {benchmark['peak_rss_bytes'] // 1024} KB"
+                    )
+                elif options['benchmark']:
+                    update_conversion_status(session_id, log='Benchmark skipped: the executable cannot run on this server')
+                elif MEASURE_STARTUP and is_native_executable(exe_path):
+                    enter_stage(profile, 'cold_start')
+                    update_conversion_status(session_id, status='Measuring startup time...', stage='post_build')
+                    build_info['cold_start_seconds'] = measure_cold_start(exe_path)
+                stage_seconds['post_build'] = time.perf_counter() - post_build_started
+                
+                # Side-by-side numbers for the same script built by each engine
+                build_info['engine'] = options['engine']
+                build_info['build_seconds'] = build_elapsed
+                build_info['engine_comparison'] = record_engine_comparison(
+                    engine_comparison_key(options),
+                    options['engine'],
+                    {k: build_info.get(k) for k in ('artifact_size', 'cold_start_seconds', 'build_seconds')}
                 )
                 
+                if profile is not None:
+                    build_info['profile_url'] = url_for_worker(options, 'download_profile', session_id=session_id)
+                
+                if workspace is not None and 'build' in stage_seconds:
+                    seconds = stage_seconds.get('pip_install', 0.0) + build_elapsed
+                    build_info['iterate'] = finish_iterate_build(
+                        session_id, options, workspace, seconds, build_elapsed, predicted, trained, incremental
+                    )
+                    workspace = None
+                
+                # A build reused after a restart has no timing for the build
+                # stage; iterative rebuilds would teach the model their speed
+                if 'build' in stage_seconds and not incremental:
+                    record_build_durations(options, features, stage_seconds, predicted)
+                
                 update_conversion_status(
                     session_id,
                     progress=100,
@@ -945,8 +3945,10 @@ def convert_in_background(session_id, options):
                     completed=True,
                     success=True,
                     message='Your executable is ready for download.',
-                    download_url=download_url
+                    download_url=download_url,
+                    build_info=build_info
                 )
+                BUILDS_TOTAL.inc(outcome='success')
             else:
                 update_conversion_status(
                     session_id,
@@ -954,18 +3956,20 @@ def convert_in_background(session_id, options):
                     status='Conversion failed',
                     completed=True,
                     success=False,
-                    message=f'Output file not found at expected path: {download_path}'
+                    message=f'Output file not found at expected path: {exe_path}'
                 )
+                BUILDS_TOTAL.inc(outcome='missing_output')
                 
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as e:
             update_conversion_status(
                 session_id,
                 progress=100,
                 status='Conversion failed',
                 completed=True,
                 success=False,
-                message='PyInstaller process timed out. Your script may be too complex or there might be issues with dependencies.'
+                message=f'{tool} process timed out after {e.timeout:.0f}s. Your script may be too complex or there might be issues with dependencies.'
             )
+            BUILDS_TOTAL.inc(outcome='timeout')
         except subprocess.CalledProcessError as e:
             error_message = e.stderr.decode() if e.stderr else str(e)
             update_conversion_status(
@@ -974,8 +3978,9 @@ def convert_in_background(session_id, options):
                 status='Conversion failed',
                 completed=True,
                 success=False,
-                message=f'PyInstaller error: {error_message}'
+                message=f'{tool} error: {error_message}'
             )
+            BUILDS_TOTAL.inc(outcome='build_error')
     
     except Exception as e:
         logger.error(f"Error during conversion: {str(e)}")
@@ -987,25 +3992,88 @@ def convert_in_background(session_id, options):
             success=False,
             message=f'Unexpected error: {str(e)}'
         )
+        BUILDS_TOTAL.inc(outcome='error')
+    finally:
+        scratch_space.release(scratch)
+        if workspace is not None:
+            release_iterate_workspace(workspace, options)
+        if profile is not None:
+            try:
+                profile.finish()
+            except Exception as e:
+                logger.error(f"Error writing build profile: {str(e)}")
 
-@app.route('/download/<session_id>/<filename>')
-def download_file(session_id, filename):
-    logger.info(f"Download requested: {session_id}/{filename}")
-    
+def download_path(session_id, filename):
+    """Path of a finished build's download, or None if there is no such file"""
     # More permissive approach for downloads to prevent session issues
-    work_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
+    work_dir = safe_join(app.config['UPLOAD_FOLDER'], session_id)
+    if work_dir is None:
+        return None
     
     if filename.endswith('.zip'):
-        file_path = os.path.join(work_dir, filename)
+        file_path = safe_join(work_dir, filename)
     else:
-        file_path = os.path.join(work_dir, 'dist', filename)
+        file_path = safe_join(work_dir, 'dist', filename)
+    
+    return file_path if file_path and os.path.isfile(file_path) else None
+
+def assembled_download(session_id, filename):
+    """(path, arcname) entries of a zip download streamed from the store, or None"""
+    work_dir = safe_join(app.config['UPLOAD_FOLDER'], session_id)
+    manifest = read_manifest(work_dir) if work_dir else None
+    if not manifest or manifest.get('zip_name') != filename:
+        return None
+    return [(entry['path'], entry['arcname']) for entry in manifest['files']]
+
+@app.route('/profile/<session_id>')
+def download_profile(session_id):
+    """The build's folded stacks, or its stage trace with ?format=trace"""
+    trace = request.args.get('format') == 'trace'
+    profile_dir = safe_join(app.config['UPLOAD_FOLDER'], session_id, PROFILE_DIRNAME)
+    path = profile_dir and os.path.join(profile_dir, 'trace.json' if trace else 'profile.folded')
+    if not path or not os.path.exists(path):
+        return jsonify(success=False, message='No profile for this session (submit the build with profile=on)'), 404
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=f"{session_id}.{'trace.json' if trace else 'folded'}",
+        mimetype='application/json' if trace else 'text/plain'
+    )
+
+@app.route('/download/<session_id>/<filename>')
+def download_file(session_id, filename):
+    logger.info(f"Download requested: {session_id}/{filename}", extra={'session_id': session_id, 'stage': 'download'})
     
-    if not os.path.exists(file_path):
+    file_path = download_path(session_id, filename)
+    entries = assembled_download(session_id, filename) if file_path is None else None
+    if file_path is None and entries is None:
         flash('File not found', 'danger')
         return redirect(url_for('index'))
     
-    logger.info(f"Sending file: {file_path}")
-    return send_file(file_path, as_attachment=True)
+    # Clients that still have an earlier build of this script only need the changes
+    if request.args.get('base'):
+        response = delta_download(session_id, filename, request.args['base'])
+        if response is not None:
+            logger.info(f"Sending delta against {request.args['base'][:12]}", extra={'session_id': session_id, 'stage': 'download'})
+            return response
+    
+    download_started = time.perf_counter()
+    if entries is not None:
+        logger.info(f"Streaming zip of {len(entries)} stored files", extra={'session_id': session_id, 'stage': 'download'})
+        response = Response(stream_zip(entries), mimetype='application/zip')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    else:
+        logger.info(f"Sending file: {file_path}", extra={'session_id': session_id, 'stage': 'download'})
+        response = send_file(file_path, as_attachment=True)
+    # Hash to present as ?base= when downloading the next build
+    manifest = read_manifest(safe_join(app.config['UPLOAD_FOLDER'], session_id))
+    if manifest and manifest.get('version'):
+        response.headers['X-Artifact-Hash'] = manifest['version']
+    # Measure until the body has been fully streamed to the client
+    response.call_on_close(
+        lambda: BUILD_STAGE_SECONDS.observe(time.perf_counter() - download_started, stage='download')
+    )
+    return response
 
 @app.route('/cleanup/<session_id>')
 def cleanup(session_id):
@@ -1024,15 +4092,14 @@ def cleanup(session_id):
     # If using Redis, delete the key
     if redis_url:
         try:
-            r = redis.from_url(redis_url)
-            r.delete(f'conversion_status:{session_id}')
+            with REDIS_ROUNDTRIP_SECONDS.time(command='delete'):
+                redis_client.delete(f'conversion_status:{session_id}')
             logger.info(f"Removed session from Redis: {session_id}")
         except Exception as e:
             logger.error(f"Error removing session from Redis: {str(e)}")
     else:
-        # If using memory, remove from dict
-        if session_id in conversion_status:
-            del conversion_status[session_id]
+        # If using memory, remove the record
+        if status_store.delete(session_id):
             logger.info(f"Removed session from memory tracker: {session_id}")
     
     # Clear session cookie
@@ -1043,7 +4110,147 @@ def cleanup(session_id):
 # Add a health check endpoint
 @app.route('/health')
 def health_check():
-    return jsonify(status="healthy", uptime=time.time())
+    return jsonify(health_payload())
+
+def health_payload():
+    return dict(status="healthy", uptime=time.time())
+
+# Liveness and readiness for load balancers and autoscalers. /health/live only
+# fails when the process cannot build any more (a build worker thread died)
+# and should be restarted. /health/ready fails with 503 while the node is
+# saturated: no free build slot and READY_MAX_QUEUE jobs already waiting, or
+# the average queue wait above READY_MAX_WAIT_SECONDS. It also fails when
+# UPLOAD_FOLDER has less than READY_MIN_FREE_DISK_MB free or Redis (when
+# configured) cannot be reached. Either way the body reports the capacity
+# numbers, so an autoscaler can add build capacity before nodes go unready.
+READY_MAX_QUEUE = int(os.environ.get('READY_MAX_QUEUE', 2 * BUILD_WORKERS))
+READY_MAX_WAIT_SECONDS = float(os.environ.get('READY_MAX_WAIT_SECONDS', 600))
+READY_MIN_FREE_DISK = int(os.environ.get('READY_MIN_FREE_DISK_MB', 1024)) * 1024 * 1024
+
+def liveness_payload():
+    alive = scheduler.workers_alive()
+    return dict(status='alive' if alive else 'dead', build_workers_alive=alive), 200 if alive else 503
+
+def redis_reachable():
+    """Whether Redis answers a PING (None when Redis is not configured)"""
+    if not redis_url:
+        return None
+    try:
+        with REDIS_ROUNDTRIP_SECONDS.time(command='ping'):
+            return bool(redis_client.ping())
+    except Exception as e:
+        logger.warning(f"Redis health check failed: {str(e)}")
+        return False
+
+def readiness_payload(redis_ok):
+    """Readiness body and HTTP status; redis_ok as from redis_reachable()"""
+    free_slots = scheduler.free_slots()
+    queue_depth = scheduler.queue_depth()
+    waits = scheduler.wait_stats()
+    free_disk = shutil.disk_usage(app.config['UPLOAD_FOLDER']).free
+    checks = {
+        'build_capacity': free_slots > 0 or queue_depth < READY_MAX_QUEUE,
+        'queue_wait': waits['average_wait_seconds'] <= READY_MAX_WAIT_SECONDS,
+        'disk': free_disk >= READY_MIN_FREE_DISK,
+        'redis': redis_ok is not False
+    }
+    ready = all(checks.values())
+    payload = dict(
+        status='ready' if ready else 'not_ready',
+        checks=checks,
+        build_workers=scheduler.workers,
+        free_slots=free_slots,
+        active_builds=scheduler.active_count(),
+        queue_depth=queue_depth,
+        free_disk_bytes=free_disk,
+        redis_reachable=redis_ok,
+        **waits
+    )
+    return payload, 200 if ready else 503
+
+def retry_after_header(payload):
+    """Retry-After for an unready node: about as long as a queued job waits"""
+    return {'Retry-After': str(max(int(payload['average_wait_seconds']), 5))}
+
+@app.route('/health/live')
+def health_live():
+    payload, status = liveness_payload()
+    return jsonify(payload), status
+
+@app.route('/health/ready')
+def health_ready():
+    payload, status = readiness_payload(redis_reachable())
+    READY.set(1 if status == 200 else 0)
+    return jsonify(payload), status, retry_after_header(payload) if status != 200 else {}
+
+# Disk usage of UPLOAD_FOLDER is expensive to walk, so it is cached briefly
+UPLOAD_FOLDER_USAGE_TTL = 30
+_upload_folder_usage = {'bytes': 0, 'checked': 0.0}
+
+def upload_folder_usage():
+    """Total size in bytes of everything under UPLOAD_FOLDER (cached)"""
+    now = time.time()
+    if now - _upload_folder_usage['checked'] > UPLOAD_FOLDER_USAGE_TTL:
+        total = 0
+        seen = set()
+        for root, dirs, files in os.walk(app.config['UPLOAD_FOLDER']):
+            for name in files:
+                try:
+                    st = os.lstat(os.path.join(root, name))
+                except OSError:
+                    continue
+                # Hardlinked artifacts only take space once
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    total += st.st_size
+        _upload_folder_usage.update(bytes=total, checked=now)
+    return _upload_folder_usage['bytes']
+
+def queue_wait_metrics():
+    waits = scheduler.wait_stats()
+    return {('average',): waits['average_wait_seconds'], ('oldest',): waits['oldest_queued_seconds']}
+
+Gauge('converter_build_queue_depth', 'Jobs waiting in the build queue', callback=lambda: scheduler.queue_depth())
+Gauge('converter_active_builds', 'Builds currently running', callback=lambda: scheduler.active_count())
+Gauge('converter_build_workers', 'Size of the build worker pool', callback=lambda: scheduler.workers)
+Gauge('converter_build_slots_free', 'Build workers not running a build', callback=lambda: scheduler.free_slots())
+Gauge(
+    'converter_queue_wait_seconds',
+    'Average queue wait of jobs started in the last 10 minutes (average) and wait of the oldest queued job (oldest)',
+    ['kind'],
+    callback=queue_wait_metrics
+)
+Gauge('converter_upload_folder_free_bytes', 'Free disk space in UPLOAD_FOLDER', callback=lambda: shutil.disk_usage(app.config['UPLOAD_FOLDER']).free)
+READY = Gauge('converter_ready', 'Result of the last readiness check (1 ready, 0 not ready)')
+Gauge('converter_upload_folder_bytes', 'Disk usage of UPLOAD_FOLDER', callback=upload_folder_usage)
+Gauge('converter_artifact_store_bytes', 'Bytes stored in the artifact store', callback=lambda: artifact_store_stats()['physical'])
+Gauge(
+    'converter_dependency_set_builds',
+    'Builds per most used package set, by pre-warming state (warm, cold, failed)',
+    ['packages', 'state'],
+    callback=dependency_set_metrics
+)
+Gauge('converter_webhooks_pending', 'Completion webhooks waiting for delivery or retry', callback=lambda: webhook_dispatcher.pending_count())
+Gauge('converter_status_store_records', 'Conversion status records held in memory', callback=lambda: status_store.stats()['records'])
+Gauge('converter_status_store_bytes', 'Approximate memory used by in-memory status records', callback=lambda: status_store.stats()['bytes'])
+Gauge('converter_scratch_ram_reserved_bytes', 'RAM reserved for build scratch space', callback=lambda: scratch_space.reserved_bytes())
+Gauge('converter_artifact_dedup_ratio', 'Bytes referenced by sessions per byte stored', callback=artifact_dedup_ratio)
+
+def cache_hit_ratios():
+    """Hit ratio per cache, derived from the cache request counter"""
+    totals = {}
+    for (cache, result), count in list(CACHE_REQUESTS._values.items()):
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == 'hit' else 0), lookups + count)
+    return {(cache,): hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+Gauge('converter_cache_hit_ratio', 'Hit ratio per cache', ['cache'], callback=cache_hit_ratios)
+
+@app.route('/metrics')
+def metrics():
+    """Expose metrics in the Prometheus text format"""
+    body = '\n'.join(metric.render() for metric in METRICS) + '\n'
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 # Periodic cleanup task
 def cleanup_old_sessions():
@@ -1051,22 +4258,10 @@ def cleanup_old_sessions():
         try:
             current_time = time.time()
             
-            # Clean up old status entries in Redis
-            if redis_url:
-                r = redis.from_url(redis_url)
-                # Redis already handles expiration, nothing to do here
-            else:
-                # If using memory dict, clean up old entries
-                session_ids = list(conversion_status.keys())
-                for session_id in session_ids:
-                    if conversion_status[session_id]['completed'] and current_time - conversion_status[session_id].get('timestamp', 0) > 3600:
-                        del conversion_status[session_id]
-                        logger.info(f"Cleaned up old session from memory tracker: {session_id}")
-            
-            # Clean up old directories
+            # Clean up old directories (dot entries are the artifact store and locks)
             for item in os.listdir(app.config['UPLOAD_FOLDER']):
                 item_path = os.path.join(app.config['UPLOAD_FOLDER'], item)
-                if os.path.isdir(item_path):
+                if os.path.isdir(item_path) and not item.startswith('.'):
                     # Check if directory is older than 1 hour
                     if current_time - os.path.getmtime(item_path) > 3600:
                         try:
@@ -1074,22 +4269,156 @@ def cleanup_old_sessions():
                             shutil.rmtree(item_path)
                         except Exception as e:
                             logger.error(f"Error cleaning up directory {item}: {str(e)}")
+            
+            # Scratch space of builds that were interrupted by a crash
+            orphans = scratch_space.collect_orphans()
+            if orphans:
+                logger.info(f"Removed {orphans} orphaned build scratch directories")
+            
+            expired = expire_uploads()
+            if expired:
+                logger.info(f"Removed {expired} expired chunked uploads")
+            
+            expired = expire_iterate_workspaces()
+            if expired:
+                logger.info(f"Removed {expired} unused incremental build workspaces")
+            
+            # Drop stored artifacts no remaining session uses
+            freed = collect_artifact_garbage()
+            if freed:
+                logger.info(f"Collected {freed} bytes of unused stored artifacts")
         except Exception as e:
             logger.error(f"Error during cleanup: {str(e)}")
             
         # Sleep for 15 minutes
         time.sleep(900)
 
-# Start cleanup thread
-cleanup_thread = threading.Thread(target=cleanup_old_sessions, daemon=True)
-cleanup_thread.start()
+# Background tasks run in one designated process per UPLOAD_FOLDER: the one
+# holding its maintenance lock. That relies on all workers sharing the folder,
+# which is why it defaults to a fixed path rather than a per-process temp dir.
+# RUN_BACKGROUND_TASKS=true/false overrides this.
+RUN_BACKGROUND_TASKS = os.environ.get('RUN_BACKGROUND_TASKS', 'auto').lower()
+_maintenance_lock = None
+
+def is_designated_process():
+    """Whether this process should run the background tasks"""
+    global _maintenance_lock
+    if RUN_BACKGROUND_TASKS != 'auto':
+        return RUN_BACKGROUND_TASKS == 'true'
+    if fcntl is None:
+        return True
+    lock_file = open(os.path.join(app.config['UPLOAD_FOLDER'], '.maintenance.lock'), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    # Keep the file open: closing it would release the lock
+    _maintenance_lock = lock_file
+    return True
+
+def start_background_tasks():
+    cleanup_thread = threading.Thread(target=cleanup_old_sessions, name='session-cleanup', daemon=True)
+    cleanup_thread.start()
+    recovery_thread = threading.Thread(target=journal_recovery_loop, name='job-recovery', daemon=True)
+    recovery_thread.start()
+    if PREWARM_TOP_N > 0:
+        prewarm_thread = threading.Thread(target=prewarm_loop, name='dependency-prewarm', daemon=True)
+        prewarm_thread.start()
+    logger.info("Started background tasks in this process")
+
+def private_temp_dir(name):
+    """Default for UPLOAD_FOLDER and BUILD_CACHE_FOLDER: a fixed directory of
+    this user's in the temp dir, created with mode 0700.
+
+    The temp dir is world-writable, so an existing directory is only used
+    if it is a real directory, owned by this user and private; one that
+    another user created (or a symlink) would otherwise get our uploads.
+    """
+    uid = os.getuid() if hasattr(os, 'getuid') else None
+    path = os.path.join(tempfile.gettempdir(), name if uid is None else f'{name}-{uid}')
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if uid is not None and (not stat.S_ISDIR(info.st_mode) or info.st_uid != uid or info.st_mode & 0o077):
+        raise RuntimeError(f'{path} is not a directory private to this user; '
+                           f'remove it or configure another location')
+    return path
+
+_app_lock = threading.Lock()
+_app_created = False
+
+def create_app():
+    """Application factory: set up storage and start background tasks.
+
+    Importing this module only defines the app and its routes. Temp
+    directories, the Redis connection, the session interface and the cleanup
+    thread are set up here, once per process: serve with
+    `gunicorn 'app:create_app()'` (or `uvicorn asgi:application`). A server
+    given the bare `app:app` gets the same setup on its first request.
+    """
+    global redis_client, _app_created
+    with _app_lock:
+        if _app_created:
+            return app
+        
+        configure_logging()
+        if not app.secret_key:
+            raise RuntimeError('SECRET_KEY is not set. It signs the job tokens that guard each build '
+                               'and must be the same for every worker process and across restarts.')
+        
+        # A fixed folder, shared by all worker processes, lets any of them
+        # serve a job's status and files, elects one to run the background
+        # tasks and lets interrupted jobs resume after a restart
+        app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER') or private_temp_dir('py2exe-uploads')
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        app.config['BUILD_CACHE_FOLDER'] = os.environ.get('BUILD_CACHE_FOLDER') or private_temp_dir('py2exe-build-cache')
+        
+        if redis_url:
+            import redis
+            # One shared client (and connection pool) for the whole process
+            redis_client = redis.from_url(redis_url)
+            logger.info(f"Using Redis for session storage: {redis_url}")
+            app.config['SESSION_TYPE'] = 'redis'
+            app.config['SESSION_REDIS'] = redis_client
+        else:
+            logger.info("Redis URL not found, using filesystem for session storage")
+            app.config['SESSION_TYPE'] = 'filesystem'
+            app.config['SESSION_FILE_DIR'] = tempfile.mkdtemp()
+        
+        # Initialize the session interface
+        from flask_session import Session
+        Session(app)
+        app.session_interface = JobTokenSessionInterface(app.session_interface)
+        
+        # Compile the page template once at startup; Jinja caches it from then on
+        app.jinja_env.get_template('index.html')
+        
+        if is_designated_process():
+            start_background_tasks()
+        
+        _app_created = True
+        return app
+
+# `app:app` without the factory: set up before the first request is handled,
+# ahead of Flask opening its session (which needs the session interface)
+_flask_wsgi_app = app.wsgi_app
+
+def wsgi_app_with_setup(environ, start_response):
+    if not _app_created:
+        create_app()
+    return _flask_wsgi_app(environ, start_response)
+
+app.wsgi_app = wsgi_app_with_setup
 
 # Ensure PyInstaller is installed
 def ensure_pyinstaller():
-    try:
-        import PyInstaller
+    # Only locate the package: importing it would slow down startup for nothing
+    if importlib.util.find_spec('PyInstaller') is not None:
         logger.info("PyInstaller is already installed")
-    except ImportError:
+    else:
         try:
             logger.info("Installing PyInstaller...")
             subprocess.run(
@@ -1103,6 +4432,8 @@ def ensure_pyinstaller():
             # Continue anyway, we'll handle it during conversion
 
 if __name__ == '__main__':
+    create_app()
+    
     # Ensure temp directory exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     logger.info(f"Using temp directory: {app.config['UPLOAD_FOLDER']}")
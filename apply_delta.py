@@ -0,0 +1,177 @@
+"""Apply a delta download from the Python to EXE converter.
+
+Every download carries an X-Artifact-Hash header (also shown as
+artifact_hash in the build info). Add ?base=<that hash> to the download URL
+of your next build of the same script and the server sends only what
+changed:
+
+  - for a single executable, a binary delta (<name>.delta)
+  - for a zip (onedir bundle or extra files), a zip of the changed files
+    (<name>.delta.zip) to apply to the folder you extracted the last one into
+
+Examples:
+    python apply_delta.py myscript myscript.delta
+    python apply_delta.py myscript_package/ myscript_package.delta.zip
+    python apply_delta.py --hash myscript_package/
+
+Only the standard library is needed. The result is verified against the
+hash of the new build; on a mismatch nothing is changed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+
+DELTA_MAGIC = b'PYXDELTA1\n'
+CHUNK_SIZE = 1024 * 1024
+
+
+class DeltaError(Exception):
+    pass
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_hash(directory):
+    """Hash of a folder's files (same as the server's version_hash())"""
+    lines = []
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            arcname = os.path.relpath(path, directory).replace(os.sep, '/')
+            lines.append((arcname, file_sha256(path)))
+    text = ''.join(f'{arcname}\0{digest}\n' for arcname, digest in sorted(lines))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def artifact_hash(path):
+    return tree_hash(path) if os.path.isdir(path) else file_sha256(path)
+
+
+def apply_binary_delta(base_path, delta_path, output_path):
+    with open(delta_path, 'rb') as f:
+        if f.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+            raise DeltaError(f'{delta_path} is not a delta file')
+        (header_length,) = struct.unpack('!I', f.read(4))
+        header = json.loads(f.read(header_length))
+
+        if file_sha256(base_path) != header['base']:
+            raise DeltaError(f'{base_path} is not the build this delta was made against')
+
+        directory = os.path.dirname(os.path.abspath(output_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            digest = hashlib.sha256()
+            with open(base_path, 'rb') as base, os.fdopen(fd, 'wb') as out:
+                for offset, length in header['ops']:
+                    if offset == -1:
+                        data = f.read(length)
+                    else:
+                        base.seek(offset)
+                        data = base.read(length)
+                    if len(data) != length:
+                        raise DeltaError('Delta file is truncated or corrupt')
+                    digest.update(data)
+                    out.write(data)
+            if digest.hexdigest() != header['target']:
+                raise DeltaError('Result does not match the new build (corrupt delta?)')
+            shutil.copymode(base_path, tmp_path)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def contained_path(root, name):
+    """Path of a '/'-separated entry name inside root. Like zipfile.extract,
+    refuses names that would leave it: absolute paths, drives, '..' and
+    symlinked directories pointing elsewhere."""
+    parts = name.split('/')
+    for part in parts:
+        if part in ('', '.', '..') or os.sep in part or (os.altsep and os.altsep in part) \
+                or os.path.splitdrive(part)[0]:
+            raise DeltaError(f'Refusing to touch {name!r}: not a path inside the folder')
+    root = os.path.realpath(root)
+    parent = os.path.realpath(os.path.join(root, *parts[:-1]))
+    if os.path.commonpath([root, parent]) != root:
+        raise DeltaError(f'Refusing to touch {name!r}: it leads outside the folder')
+    return os.path.join(parent, parts[-1])
+
+
+def apply_zip_delta(base_dir, delta_path, output_dir):
+    with zipfile.ZipFile(delta_path) as zipf:
+        info = json.loads(zipf.read('.delta.json'))
+        if tree_hash(base_dir) != info['base']:
+            raise DeltaError(f'{base_dir} is not the build this delta was made against')
+
+        # Work on a copy so a failed update leaves the folder untouched
+        parent = os.path.dirname(os.path.abspath(output_dir))
+        staging = tempfile.mkdtemp(dir=parent)
+        try:
+            work = os.path.join(staging, 'tree')
+            shutil.copytree(base_dir, work, symlinks=True)
+            for name in info['removed']:
+                path = contained_path(work, name)
+                if os.path.lexists(path):
+                    os.unlink(path)
+            for member in zipf.infolist():
+                if member.filename == '.delta.json':
+                    continue
+                path = zipf.extract(member, work)
+                mode = member.external_attr >> 16
+                if mode:
+                    os.chmod(path, mode & 0o7777)
+            if tree_hash(work) != info['target']:
+                raise DeltaError('Result does not match the new build (corrupt delta?)')
+
+            if os.path.exists(output_dir):
+                old = os.path.join(staging, 'old')
+                os.rename(output_dir, old)
+            os.rename(work, output_dir)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base', help='the previous build: executable or extracted folder')
+    parser.add_argument('delta', nargs='?', help='the downloaded delta')
+    parser.add_argument('-o', '--output', help='where to write the new build (default: replace base)')
+    parser.add_argument('--hash', action='store_true', help='only print the hash to send as ?base=')
+    args = parser.parse_args()
+
+    if args.hash:
+        print(artifact_hash(args.base))
+        return 0
+    if not args.delta:
+        parser.error('the delta file is required')
+
+    output = args.output or args.base
+    try:
+        if zipfile.is_zipfile(args.delta):
+            if not os.path.isdir(args.base):
+                raise DeltaError('A zip delta applies to the folder the previous zip was extracted into')
+            apply_zip_delta(args.base, args.delta, output)
+        else:
+            apply_binary_delta(args.base, args.delta, output)
+    except (DeltaError, OSError, ValueError, KeyError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    print(f'Updated {output} ({artifact_hash(output)})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
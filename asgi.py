@@ -0,0 +1,325 @@
+"""Async (ASGI) front-end for the converter.
+
+Status polling, the server-sent events stream, downloads and the health
+checks are served directly on the event loop, so thousands of open browser
+tabs cost a coroutine each instead of a sync worker each. Every other route
+is handed to the Flask app through asgiref's WSGI adapter, run in a pool of
+WSGI_THREADS threads, and builds keep running in the build scheduler's
+worker pool.
+
+Run a single process (the build scheduler lives in it):
+
+    uvicorn asgi:application --host 0.0.0.0 --port $PORT
+"""
+import asyncio
+import json
+import mimetypes
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, quote
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import app as converter
+from app import logger
+
+# Interval at which event streams re-check a build's status
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 1))
+# Comment line sent on idle event streams so proxies keep them open
+EVENTS_KEEPALIVE_SECONDS = 15
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Threads serving the routes handed to Flask (uploads, pastes, pages, metrics)
+WSGI_THREADS = int(os.environ.get('WSGI_THREADS', 16))
+
+# Tell the page it can use the event stream instead of polling /status
+converter.app.config['EVENTS_STREAM'] = True
+
+wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    """Runs the request in wsgi_executor. asgiref's own adapter runs every
+    request on its single thread-sensitive thread, one at a time."""
+
+    async def run_wsgi_app(self, body):
+        run = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+        await sync_to_async(run, thread_sensitive=False, executor=wsgi_executor)(self, body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+flask_app = PooledWsgiToAsgi(converter.create_app())
+
+if converter.redis_url:
+    import redis.asyncio
+    async_redis_client = redis.asyncio.from_url(converter.redis_url)
+    rate_limit_script = async_redis_client.register_script(converter.RATE_LIMIT_SCRIPT)
+else:
+    async_redis_client = None
+    rate_limit_script = None
+
+
+async def get_conversion_status(session_id):
+    """Async counterpart of app.get_conversion_status"""
+    if async_redis_client is None:
+        return converter.status_store.get(session_id)
+    started = time.perf_counter()
+    status_data = await async_redis_client.get(f'conversion_status:{session_id}')
+    converter.REDIS_ROUNDTRIP_SECONDS.observe(time.perf_counter() - started, command='get')
+    return json.loads(status_data) if status_data else None
+
+
+async def rate_limit(scope, group):
+    """Async counterpart of app.enforce_rate_limits; returns seconds to wait or 0"""
+    rate, burst = converter.RATE_LIMITS[group]
+    if rate <= 0:
+        return 0.0
+    headers = dict(scope['headers'])
+    forwarded_for = headers.get(b'x-forwarded-for', b'').decode('latin-1')
+    ip = converter.client_ip(scope['client'][0] if scope.get('client') else None, forwarded_for)
+    key = f'ratelimit:{group}:{ip}'
+    if rate_limit_script is None:
+        return converter.rate_limiter.acquire_local(key, rate, burst)
+    try:
+        started = time.perf_counter()
+        retry_after = float(await rate_limit_script(keys=[key], args=[rate, burst]))
+        converter.REDIS_ROUNDTRIP_SECONDS.observe(time.perf_counter() - started, command='ratelimit')
+        return retry_after
+    except Exception as e:
+        logger.warning(f"Rate limiter unavailable: {str(e)}")
+        return 0.0
+
+
+def job_token_rejection(scope, session_id):
+    """app.enforce_job_tokens for the routes served here"""
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+    args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    return converter.job_token_rejection(session_id, converter.request_job_token(headers, args))
+
+
+async def send_json(send, payload, status=200, headers=None):
+    body = json.dumps(payload).encode('utf-8')
+    extra_headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'cache-control', b'no-store'),
+        ] + extra_headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def status(scope, receive, send, session_id):
+    retry_after = await rate_limit(scope, 'status')
+    if retry_after:
+        payload, headers = converter.rate_limited_payload('status', retry_after)
+        await send_json(send, payload, status=429, headers=headers)
+        return
+    reason = job_token_rejection(scope, session_id)
+    if reason:
+        await send_json(send, converter.job_token_denied_payload(reason), status=403)
+        return
+
+    converter.STATUS_REQUESTS.inc()
+    started = time.perf_counter()
+    logger.debug(f"Status requested for session: {session_id}", extra={'session_id': session_id, 'sample': 'status_poll'})
+    payload = converter.status_payload(session_id, await get_conversion_status(session_id))
+    await send_json(send, payload)
+    converter.STATUS_REQUEST_SECONDS.observe(time.perf_counter() - started)
+
+
+async def events(scope, receive, send, session_id):
+    """Stream status changes as server-sent events until the build completes"""
+    reason = job_token_rejection(scope, session_id)
+    if reason:
+        await send_json(send, converter.job_token_denied_payload(reason), status=403)
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            # Stop nginx-style proxies from buffering the stream
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    last_payload = None
+    last_sent = time.monotonic()
+    try:
+        while not disconnected.done():
+            payload = converter.status_payload(session_id, await get_conversion_status(session_id))
+            if payload != last_payload:
+                data = f'data: {json.dumps(payload)}\n\n'
+                await send({'type': 'http.response.body', 'body': data.encode('utf-8'), 'more_body': True})
+                last_payload = payload
+                last_sent = time.monotonic()
+                if payload['completed']:
+                    break
+            elif time.monotonic() - last_sent > EVENTS_KEEPALIVE_SECONDS:
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                last_sent = time.monotonic()
+            await asyncio.wait({disconnected}, timeout=EVENTS_POLL_INTERVAL)
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+
+
+async def download(scope, receive, send, session_id, filename):
+    reason = job_token_rejection(scope, session_id)
+    if reason:
+        await send_json(send, converter.job_token_denied_payload(reason), status=403)
+        return
+    if b'base=' in scope.get('query_string', b''):
+        # Deltas are CPU-bound to compute: leave them to the WSGI threads
+        await flask_app(scope, receive, send)
+        return
+
+    logger.info(f"Download requested: {session_id}/{filename}", extra={'session_id': session_id, 'stage': 'download'})
+    file_path = converter.download_path(session_id, filename)
+    if file_path is None:
+        entries = converter.assembled_download(session_id, filename)
+        if entries is None:
+            # Let Flask flash the error and redirect back to the index page
+            await flask_app(scope, receive, send)
+        else:
+            await stream_assembled_zip(send, session_id, filename, entries)
+        return
+
+    logger.info(f"Sending file: {file_path}", extra={'session_id': session_id, 'stage': 'download'})
+    download_started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        name = os.path.basename(file_path)
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', (mimetypes.guess_type(name)[0] or 'application/octet-stream').encode()),
+                (b'content-length', str(size).encode()),
+                (b'content-disposition', f"attachment; filename*=UTF-8''{quote(name)}".encode()),
+            ] + artifact_hash_header(session_id),
+        })
+        while True:
+            # File reads go to the default thread pool so the loop never blocks on disk
+            chunk = await loop.run_in_executor(None, f.read, DOWNLOAD_CHUNK_SIZE)
+            more = len(chunk) == DOWNLOAD_CHUNK_SIZE
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+            if not more:
+                break
+    converter.BUILD_STAGE_SECONDS.observe(time.perf_counter() - download_started, stage='download')
+
+
+def artifact_hash_header(session_id):
+    """X-Artifact-Hash of the session's download, to send back as ?base= later"""
+    manifest = converter.read_manifest(converter.safe_join(converter.app.config['UPLOAD_FOLDER'], session_id))
+    if manifest and manifest.get('version'):
+        return [(b'x-artifact-hash', manifest['version'].encode())]
+    return []
+
+
+async def stream_assembled_zip(send, session_id, filename, entries):
+    """Stream a zip assembled from the artifact store (see app.stream_zip)"""
+    logger.info(f"Streaming zip of {len(entries)} stored files", extra={'session_id': session_id, 'stage': 'download'})
+    download_started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'application/zip'),
+            (b'content-disposition', f"attachment; filename*=UTF-8''{quote(filename)}".encode()),
+        ] + artifact_hash_header(session_id),
+    })
+    chunks = converter.stream_zip(entries)
+    while True:
+        # Reading and zipping happen in the default thread pool
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            break
+        if chunk:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+    converter.BUILD_STAGE_SECONDS.observe(time.perf_counter() - download_started, stage='download')
+
+
+async def health(scope, receive, send):
+    await send_json(send, converter.health_payload())
+
+
+async def health_live(scope, receive, send):
+    payload, status = converter.liveness_payload()
+    await send_json(send, payload, status=status)
+
+
+async def health_ready(scope, receive, send):
+    redis_ok = None
+    if async_redis_client is not None:
+        started = time.perf_counter()
+        try:
+            redis_ok = bool(await async_redis_client.ping())
+        except Exception as e:
+            logger.warning(f"Redis health check failed: {str(e)}")
+            redis_ok = False
+        converter.REDIS_ROUNDTRIP_SECONDS.observe(time.perf_counter() - started, command='ping')
+    payload, status = converter.readiness_payload(redis_ok)
+    converter.READY.set(1 if status == 200 else 0)
+    headers = converter.retry_after_header(payload) if status != 200 else None
+    await send_json(send, payload, status=status, headers=headers)
+
+
+# Routes served natively; path segments follow Flask's default converter
+ROUTES = [
+    (re.compile(r'/status/([^/]+)'), status),
+    (re.compile(r'/events/([^/]+)'), events),
+    (re.compile(r'/download/([^/]+)/([^/]+)'), download),
+    (re.compile(r'/health'), health),
+    (re.compile(r'/health/live'), health_live),
+    (re.compile(r'/health/ready'), health_ready),
+]
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if async_redis_client is not None:
+                await async_redis_client.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        for pattern, handler in ROUTES:
+            match = pattern.fullmatch(scope['path'])
+            if match:
+                await handler(scope, receive, send, *match.groups())
+                return
+
+    await flask_app(scope, receive, send)
@@ -0,0 +1,462 @@
+"""Load-testing and benchmark harness for the Python to EXE converter.
+
+Starts the app locally in a child process, drives concurrent
+/upload or /paste + /status + /download workloads with a corpus of sample
+scripts (including test.py) and reports throughput, p50/p95/p99 latency per
+endpoint and end-to-end build times.
+
+Examples:
+    python benchmark.py --clients 4 --jobs 20
+    python benchmark.py --redis fake --json results.json
+    python benchmark.py --baseline results.json --tolerance 0.25
+
+With --baseline the run exits non-zero when any p95 latency or the build
+time regressed by more than the tolerance, so it can gate a deploy.
+
+    python benchmark.py --compare-engines 5
+
+times PyInstaller startup and builds of a trivial script with each build
+engine (fresh CLI subprocess vs. warm fork server) to show the savings.
+
+    python benchmark.py --startup 10
+
+times web-tier process startup: importing app.py, running create_app() and
+the time until a freshly started server answers /health.
+"""
+import argparse
+import atexit
+import glob
+import http.cookiejar
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = [os.path.join(BASE_DIR, 'test.py')] + sorted(glob.glob(os.path.join(BASE_DIR, 'benchmark_corpus', '*.py')))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(port, fake_redis):
+    """Run the app in this process (used for the child server process)"""
+    sys.path.insert(0, BASE_DIR)
+    if fake_redis:
+        # Stand in for a real Redis so the Redis code paths are exercised
+        import fakeredis
+        import redis
+        server = fakeredis.FakeServer()
+        redis.from_url = lambda url, **kwargs: fakeredis.FakeRedis(server=server)
+        os.environ['REDIS_URL'] = 'redis://fake'
+    import app as converter
+    from werkzeug.serving import make_server
+    make_server('127.0.0.1', port, converter.create_app(), threaded=True).serve_forever()
+
+
+def start_server(args):
+    """Start the app in a child process and wait until /health answers"""
+    port = args.port or free_port()
+    env = dict(os.environ)
+    if args.redis not in ('none', 'fake'):
+        env['REDIS_URL'] = args.redis
+    else:
+        env.pop('REDIS_URL', None)
+    # All simulated clients share one IP; keep the per-IP rate limits out of
+    # the way unless they are set explicitly
+    env.setdefault('RATE_LIMIT_STATUS_PER_SECOND', '0')
+    env.setdefault('RATE_LIMIT_BUILDS_PER_MINUTE', '0')
+    env.setdefault('SECRET_KEY', uuid.uuid4().hex)
+    cmd = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port)]
+    if args.redis == 'fake':
+        cmd.append('--fake-redis')
+    log = open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'Server exited with code {proc.returncode}')
+        try:
+            urllib.request.urlopen(base_url + '/health', timeout=1).read()
+            return proc, base_url, time.perf_counter() - started
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError('Server did not become healthy within 60 seconds')
+
+
+def encode_multipart(fields, files):
+    """Encode form fields and (name, filename, bytes) files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, content in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: text/x-python\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Recorder:
+    """Thread-safe collection of latency samples per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.builds = []
+        self.failed_builds = 0
+
+    def request(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def build(self, seconds, success):
+        with self._lock:
+            if success:
+                self.builds.append(seconds)
+            else:
+                self.failed_builds += 1
+
+
+class Client:
+    """One simulated browser/API client with its own cookie jar"""
+
+    def __init__(self, base_url, recorder, args):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.args = args
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def call(self, endpoint, path, data=None, headers=None):
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        started = time.perf_counter()
+        ok = True
+        try:
+            with self.opener.open(req, timeout=self.args.request_timeout) as resp:
+                body = resp.read()
+        except urllib.error.HTTPError as e:
+            ok = False
+            body = e.read()
+        except OSError:
+            ok = False
+            body = b''
+        self.recorder.request(endpoint, time.perf_counter() - started, ok)
+        return body
+
+    def submit(self, script_path):
+        with open(script_path, 'rb') as f:
+            content = f.read()
+        fields = {'one_file': 'on', 'console': 'on', 'platform': self.args.platform, 'packages': self.args.packages}
+        if self.args.mode == 'upload' or (self.args.mode == 'mixed' and random.random() < 0.5):
+            body, content_type = encode_multipart(fields, [('file', os.path.basename(script_path), content)])
+            raw = self.call('upload', '/upload', body, {'Content-Type': content_type})
+        else:
+            fields.update(code=content.decode('utf-8'), filename=os.path.basename(script_path))
+            body, content_type = encode_multipart(fields, [])
+            raw = self.call('paste', '/paste', body, {'Content-Type': content_type})
+        try:
+            response = json.loads(raw)
+        except ValueError:
+            return None, None
+        return response.get('session_id'), response.get('job_token')
+
+    def run_job(self, script_path):
+        started = time.perf_counter()
+        session_id, job_token = self.submit(script_path)
+        if not session_id:
+            self.recorder.build(0, False)
+            return
+        status = {}
+        deadline = time.time() + self.args.build_timeout
+        while time.time() < deadline:
+            try:
+                status = json.loads(self.call('status', f'/status/{session_id}', headers={'X-Job-Token': job_token}))
+            except ValueError:
+                status = {}
+            if status.get('completed'):
+                break
+            time.sleep(self.args.poll_interval)
+        if status.get('success') and status.get('download_url'):
+            self.call('download', status['download_url'], headers={'X-Job-Token': job_token})
+            self.recorder.build(time.perf_counter() - started, True)
+        else:
+            self.recorder.build(time.perf_counter() - started, False)
+
+
+def run_workload(base_url, args):
+    recorder = Recorder()
+    jobs = [args.corpus[i % len(args.corpus)] for i in range(args.jobs)]
+    lock = threading.Lock()
+
+    def worker():
+        client = Client(base_url, recorder, args)
+        while True:
+            with lock:
+                if not jobs:
+                    return
+                script_path = jobs.pop()
+            client.run_job(script_path)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+
+def summarize(recorder, elapsed, startup_seconds):
+    def stats(values):
+        return {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+        }
+
+    endpoints = {}
+    for endpoint, values in recorder.latencies.items():
+        endpoints[endpoint] = dict(stats(values), errors=recorder.errors.get(endpoint, 0), throughput=len(values) / elapsed)
+    return {
+        'elapsed': elapsed,
+        'server_startup': startup_seconds,
+        'requests_per_second': sum(len(v) for v in recorder.latencies.values()) / elapsed,
+        'builds_per_minute': len(recorder.builds) / elapsed * 60,
+        'failed_builds': recorder.failed_builds,
+        'endpoints': endpoints,
+        'build': stats(recorder.builds),
+    }
+
+
+def print_report(report):
+    def ms(value):
+        return '-' if value is None else f'{value * 1000:.1f}'
+
+    print(f"Elapsed: {report['elapsed']:.1f}s  server startup: {report['server_startup']:.2f}s")
+    print(f"Throughput: {report['requests_per_second']:.1f} req/s, {report['builds_per_minute']:.2f} builds/min, "
+          f"{report['failed_builds']} failed builds")
+    print(f"{'endpoint':<10} {'count':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, s in sorted(report['endpoints'].items()):
+        print(f"{endpoint:<10} {s['count']:>7} {s['errors']:>7} {s['throughput']:>8.2f} "
+              f"{ms(s['p50']):>9} {ms(s['p95']):>9} {ms(s['p99']):>9}")
+    b = report['build']
+    print(f"{'build e2e':<10} {b['count']:>7} {'':>7} {'':>8} {ms(b['p50']):>9} {ms(b['p95']):>9} {ms(b['p99']):>9}")
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """Return a list of regressions (p95 latencies and build p95 over tolerance)"""
+    regressions = []
+    pairs = [(f'{name} p95', s.get('p95'), baseline.get('endpoints', {}).get(name, {}).get('p95'))
+             for name, s in report['endpoints'].items()]
+    pairs.append(('build p95', report['build']['p95'], baseline.get('build', {}).get('p95')))
+    for label, current, previous in pairs:
+        if current is not None and previous and current > previous * (1 + tolerance):
+            regressions.append(f'{label}: {current * 1000:.1f}ms vs baseline {previous * 1000:.1f}ms')
+    return regressions
+
+
+def compare_engines(runs, script_path):
+    """Time PyInstaller startup and full builds with each build engine.
+
+    Startup is measured with `--version`, which is pure interpreter start,
+    PyInstaller import and argument parsing - the part the fork server saves.
+    """
+    import shutil
+    import tempfile
+    sys.path.insert(0, BASE_DIR)
+    import app as converter
+
+    engines = [converter.SubprocessEngine(), converter.ForkServerEngine(fallback=converter.SubprocessEngine())]
+    results = {engine.name: {'startup': [], 'build': []} for engine in engines}
+    try:
+        # Keep the fork server's one-off boot out of the per-build numbers
+        engines[1].start()
+        # Interleave the engines so machine noise affects both equally
+        for _ in range(runs):
+            for engine in engines:
+                started = time.perf_counter()
+                engine.run(['--version'], cwd=BASE_DIR, timeout=60)
+                results[engine.name]['startup'].append(time.perf_counter() - started)
+        for _ in range(runs):
+            for engine in engines:
+                work_dir = tempfile.mkdtemp()
+                try:
+                    args = ['--onefile', '--workpath', os.path.join(work_dir, 'build'),
+                            '--distpath', os.path.join(work_dir, 'dist'), '--specpath', work_dir, script_path]
+                    started = time.perf_counter()
+                    engine.run(args, cwd=work_dir, timeout=600)
+                    results[engine.name]['build'].append(time.perf_counter() - started)
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+    finally:
+        engines[1].stop()
+
+    print(f"{'engine':<11} {'runs':>5} {'startup p50':>12} {'startup min':>12} {'build p50':>10} {'build min':>10}")
+    for name, timings in results.items():
+        print(f"{name:<11} {runs:>5} {percentile(timings['startup'], 50):>11.3f}s {min(timings['startup']):>11.3f}s "
+              f"{percentile(timings['build'], 50):>9.2f}s {min(timings['build']):>9.2f}s")
+    saved = percentile(results['subprocess']['startup'], 50) - percentile(results['forkserver']['startup'], 50)
+    print(f"Fork server saves {saved:.3f}s of startup per build at p50")
+    return results
+
+
+# Run in a fresh interpreter: time importing the app and creating it
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                  'modules': len(sys.modules)}))
+"""
+
+
+def measure_startup(runs, args):
+    """Time web-tier startup RUNS times and print p50/min per phase"""
+    env = dict(os.environ)
+    if args.redis not in ('none', 'fake'):
+        env['REDIS_URL'] = args.redis
+    else:
+        env.pop('REDIS_URL', None)
+    # A probe must not take over background tasks from a running server
+    env['RUN_BACKGROUND_TASKS'] = 'false'
+    env.setdefault('SECRET_KEY', uuid.uuid4().hex)
+
+    results = {'interpreter': [], 'import': [], 'create_app': [], 'first_health': []}
+    modules = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        total = time.perf_counter() - started
+        probe = json.loads(output.strip().splitlines()[-1])
+        results['interpreter'].append(total - probe['import'] - probe['create_app'])
+        results['import'].append(probe['import'])
+        results['create_app'].append(probe['create_app'])
+        modules = probe['modules']
+
+        proc, _, first_health = start_server(args)
+        proc.terminate()
+        proc.wait()
+        results['first_health'].append(first_health)
+
+    print(f"{'phase':<13} {'runs':>5} {'p50 ms':>9} {'min ms':>9}")
+    for phase, values in results.items():
+        print(f"{phase:<13} {runs:>5} {percentile(values, 50) * 1000:>9.1f} {min(values) * 1000:>9.1f}")
+    print(f"Modules loaded after create_app(): {modules}")
+    return {phase: {'p50': percentile(values, 50), 'min': min(values)} for phase, values in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=4, help='concurrent simulated clients')
+    parser.add_argument('--jobs', type=int, default=8, help='total number of conversions to run')
+    parser.add_argument('--mode', choices=['upload', 'paste', 'mixed'], default='mixed')
+    parser.add_argument('--corpus', nargs='+', default=DEFAULT_CORPUS, help='scripts to convert')
+    parser.add_argument('--packages', default='', help='packages field sent with every job')
+    parser.add_argument('--platform', default='linux')
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--build-timeout', type=float, default=600)
+    parser.add_argument('--request-timeout', type=float, default=60)
+    parser.add_argument('--redis', default='none', help="'none' (in-memory), 'fake' (fakeredis) or a Redis URL")
+    parser.add_argument('--url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--port', type=int, help='port for the local server')
+    parser.add_argument('--server-log', help='write the server output to this file')
+    parser.add_argument('--json', help='write the report as JSON to this file')
+    parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 regression vs baseline')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the upload/paste mix')
+    parser.add_argument('--compare-engines', type=int, metavar='RUNS',
+                        help='instead of a load test, time RUNS builds with each build engine')
+    parser.add_argument('--startup', type=int, metavar='RUNS',
+                        help='instead of a load test, time RUNS web-tier process startups')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--fake-redis', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.fake_redis)
+        return 0
+
+    # Servers started here get folders of their own, so they never share
+    # uploads, job journals or the artifact store with a real instance
+    if 'UPLOAD_FOLDER' not in os.environ:
+        os.environ['UPLOAD_FOLDER'] = tempfile.mkdtemp(prefix='py2exe-benchmark-')
+        atexit.register(shutil.rmtree, os.environ['UPLOAD_FOLDER'], True)
+
+    if args.compare_engines:
+        compare_engines(args.compare_engines, os.path.join(BASE_DIR, 'benchmark_corpus', 'hello.py'))
+        return 0
+
+    if args.startup:
+        report = measure_startup(args.startup, args)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'startup': report}, f, indent=2)
+        return 0
+
+    random.seed(args.seed)
+    proc = None
+    startup_seconds = 0.0
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        proc, base_url, startup_seconds = start_server(args)
+    try:
+        recorder, elapsed = run_workload(base_url, args)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = summarize(recorder, elapsed, startup_seconds)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import time
+
+
+def count_primes(limit):
+    sieve = bytearray([1]) * (limit + 1)
+    sieve[0:2] = b'\x00\x00'
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytearray(len(sieve[i * i::i]))
+    return sum(sieve)
+
+
+def main():
+    start = time.perf_counter()
+    primes = count_primes(2_000_000)
+    print(f"Found {primes} primes in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import sys
+
+
+def main():
+    print("Hello from a converted executable!")
+    print(f"Running on Python {sys.version.split()[0]}")
+
+
+if __name__ == "__main__":
+    main()
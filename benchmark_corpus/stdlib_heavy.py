@@ -0,0 +1,30 @@
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import xml.etree.ElementTree as ET
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise a wide slice of the standard library")
+    parser.add_argument('--rows', type=int, default=100)
+    args = parser.parse_args()
+
+    db = sqlite3.connect(':memory:')
+    db.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+    db.executemany('INSERT INTO items (name) VALUES (?)', [(f'item-{i}',) for i in range(args.rows)])
+    rows = db.execute('SELECT id, name FROM items').fetchall()
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+
+    root = ET.Element('items')
+    for row_id, name in rows:
+        ET.SubElement(root, 'item', id=str(row_id)).text = name
+
+    print(json.dumps({'rows': len(rows), 'csv_bytes': len(buffer.getvalue()), 'xml_children': len(root)}))
+
+
+if __name__ == "__main__":
+    main()
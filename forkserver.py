@@ -0,0 +1,140 @@
+"""Warm PyInstaller fork server.
+
+Imports PyInstaller (and the modules its build pipeline and hooks need) once,
+then forks a child per build request, so every build skips the interpreter
+startup and PyInstaller import cost that a fresh `pyinstaller` CLI pays.
+
+Started by the web app's ForkServerEngine:
+
+    python forkserver.py <socket_path>
+
+The authentication key is read from the FORKSERVER_AUTHKEY environment
+variable (hex). The server exits when its stdin is closed, i.e. when the
+process that started it goes away.
+"""
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+
+def preload():
+    """Import everything a build needs so forked children start warm"""
+    import PyInstaller.__main__  # noqa: F401
+    import PyInstaller.building.build_main  # noqa: F401
+    import PyInstaller.building.api  # noqa: F401
+    import PyInstaller.depend.analysis  # noqa: F401
+    import PyInstaller.depend.bindepend  # noqa: F401
+    import PyInstaller.utils.hooks  # noqa: F401
+    import PyInstaller.lib.modulegraph.modulegraph  # noqa: F401
+
+
+def set_parent_death_signal(signum):
+    """Linux only: have the kernel send signum when our parent exits"""
+    if not sys.platform.startswith('linux'):
+        return
+    import ctypes
+    PR_SET_PDEATHSIG = 1
+    ctypes.CDLL(None, use_errno=True).prctl(PR_SET_PDEATHSIG, signum)
+
+
+def run_job(conn, request):
+    """Run one PyInstaller build in the forked child and report the result"""
+    # Own process group, so a timeout can kill the build and its helpers
+    os.setsid()
+    # Die with the server (and so with the web process): a restarted web
+    # process resumes interrupted builds and must not race a leftover one
+    set_parent_death_signal(signal.SIGKILL)
+    conn.send(('started', os.getpid()))
+
+    # PyInstaller prefixes log lines with milliseconds since logging started;
+    # make that relative to this build rather than to the server's startup
+    logging._startTime = time.time()
+
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+
+        code = 0
+        finish_profile = None
+        try:
+            os.chdir(request['cwd'])
+            os.environ.update(request.get('env') or {})
+            if os.environ.get('PYEXE_PROFILE_DIR'):
+                # Profiled build; the child leaves with os._exit(), so no atexit
+                import sampling_profiler
+                finish_profile = sampling_profiler.profile_process(register_atexit=False)
+            import PyInstaller.__main__
+            PyInstaller.__main__.run(request['argv'])
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                code = e.code
+            elif e.code:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if finish_profile is not None:
+                finish_profile()
+
+        out.seek(0)
+        err.seek(0)
+        conn.send(('finished', code, out.read(), err.read()))
+    return code
+
+
+def watch_parent():
+    """Exit as soon as the parent closes our stdin"""
+    sys.stdin.buffer.read()
+    os._exit(0)
+
+
+def reap_children(signum, frame):
+    try:
+        while os.waitpid(-1, os.WNOHANG)[0]:
+            pass
+    except ChildProcessError:
+        pass
+
+
+def main():
+    socket_path = sys.argv[1]
+    authkey = bytes.fromhex(os.environ['FORKSERVER_AUTHKEY'])
+
+    preload()
+    signal.signal(signal.SIGCHLD, reap_children)
+    threading.Thread(target=watch_parent, daemon=True).start()
+
+    listener = Listener(socket_path, family='AF_UNIX', authkey=authkey)
+    while True:
+        try:
+            conn = listener.accept()
+            request = conn.recv()
+        except (OSError, EOFError, AuthenticationError):
+            continue
+
+        if os.fork() == 0:
+            listener.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            try:
+                code = run_job(conn, request)
+            except BaseException:
+                code = 1
+            os._exit(code)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+"""Put on PYTHONPATH for the child processes of a profiled build.
+
+Starts sampling_profiler (located through PYEXE_PROFILER_MODULE, so the
+converter's own modules stay off the child's import path) when
+PYEXE_PROFILE_DIR is set.
+"""
+import os
+
+if os.environ.get('PYEXE_PROFILE_DIR') and os.environ.get('PYEXE_PROFILER_MODULE'):
+    try:
+        import importlib.util
+        _spec = importlib.util.spec_from_file_location('_pyexe_sampling_profiler', os.environ['PYEXE_PROFILER_MODULE'])
+        _profiler = importlib.util.module_from_spec(_spec)
+        _spec.loader.exec_module(_profiler)
+        _profiler.profile_process()
+    except Exception:
+        pass  # Never break the build over its profile
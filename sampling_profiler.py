@@ -0,0 +1,108 @@
+"""Low-overhead sampling profiler for profiled builds.
+
+A background thread snapshots the Python stacks of the process every few
+milliseconds and counts them as folded stacks ("frame;frame;frame count"),
+the input format of flamegraph.pl, speedscope and inferno.
+
+The web app samples its build worker thread with it. Python child
+processes of a profiled build (pip, PyInstaller and the subprocesses its
+hooks run in) load it through profile_hook/sitecustomize.py. The fork
+server calls profile_process() directly in its forked children. Each
+process writes <pid>.folded and <pid>.json (label, argv, start and end
+time) to PYEXE_PROFILE_DIR.
+
+Only the standard library is used, so any interpreter can load this file.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.01
+
+
+def frame_name(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def fold(frame):
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Count the folded stacks of some (or all) threads at a fixed interval.
+
+    label is a string or a callable returning one; it becomes the root
+    frame(s) of every sample, e.g. the build stage the thread is in.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_ids=None, label=''):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.label = label
+        self.counts = Counter()
+        self.started = None
+        self.stopped = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.stopped = self.stopped or time.time()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            label = self.label() if callable(self.label) else self.label
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = fold(frame)
+                self.counts[f'{label};{stack}' if label else stack] += 1
+
+    def write_folded(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def profile_process(register_atexit=True):
+    """Sample this whole process into PYEXE_PROFILE_DIR; returns a finish callable"""
+    directory = os.environ['PYEXE_PROFILE_DIR']
+    label = os.environ.get('PYEXE_PROFILE_LABEL', 'python')
+    interval = float(os.environ.get('PYEXE_PROFILE_INTERVAL', DEFAULT_INTERVAL))
+    # Our own subprocesses show up nested under us
+    os.environ['PYEXE_PROFILE_LABEL'] = f'{label};subprocess'
+    sampler = StackSampler(interval, label=label).start()
+    pid = os.getpid()
+    argv = list(sys.argv)
+
+    def finish():
+        sampler.stop()
+        try:
+            sampler.write_folded(os.path.join(directory, f'{pid}.folded'))
+            with open(os.path.join(directory, f'{pid}.json'), 'w') as f:
+                json.dump({'pid': pid, 'label': label, 'argv': argv,
+                           'start': sampler.started, 'end': sampler.stopped}, f)
+        except OSError:
+            pass
+
+    if register_atexit:
+        atexit.register(finish)
+    return finish
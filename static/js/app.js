@@ -0,0 +1,366 @@
+// Session ID storage - both in session and localStorage for resilience
+let currentSessionId = '';
+let lastLogLine = null;
+
+// Handle form submission for file upload
+document.getElementById('uploadForm').addEventListener('submit', function(e) {
+    e.preventDefault();
+    startConversion(this, 'uploadSubmitBtn');
+});
+
+// Handle form submission for code paste
+document.getElementById('pasteForm').addEventListener('submit', function(e) {
+    e.preventDefault();
+    startConversion(this, 'pasteSubmitBtn');
+});
+
+function startConversion(form, buttonId) {
+    // Show progress UI
+    document.getElementById('conversionStatus').style.display = 'block';
+    document.getElementById(buttonId).disabled = true;
+    document.getElementById(buttonId).innerHTML = 'Converting... Please wait';
+
+    // Clear previous log content
+    document.getElementById('logContent').innerHTML = '';
+    document.getElementById('progressBar').style.width = '0%';
+    document.getElementById('progressBar').classList.remove('bg-danger', 'bg-success');
+    document.getElementById('progressBar').classList.add('bg-info');
+
+    // Submit the form data via AJAX
+    const formData = new FormData(form);
+    const action = form.getAttribute('action');
+
+    // Incremental rebuilds continue from the last build of this browser
+    const previousSessionId = localStorage.getItem('conversionSessionId');
+    if (formData.has('iterate') && previousSessionId) {
+        formData.append('iterate_from', previousSessionId);
+        formData.append('iterate_token', localStorage.getItem('conversionJobToken') || '');
+    }
+
+    fetch(action, {
+        method: 'POST',
+        body: formData,
+        credentials: 'same-origin'  // Important for session cookies
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Store session ID in both variables and localStorage for resilience
+            currentSessionId = data.session_id;
+            localStorage.setItem('conversionSessionId', data.session_id);
+            localStorage.setItem('conversionJobToken', data.job_token);
+
+            // Start watching for status updates
+            watchStatus(data.session_id);
+
+            // Log initial status
+            const logElement = document.getElementById('logContent');
+            logElement.innerHTML += `<div>[${new Date().toLocaleTimeString()}] Conversion started with session ID: ${data.session_id}</div>`;
+        } else {
+            // Show error
+            document.getElementById('statusMessage').innerText = 'Error: ' + data.message;
+            document.getElementById('progressBar').style.width = '100%';
+            document.getElementById('progressBar').classList.remove('bg-info', 'bg-success');
+            document.getElementById('progressBar').classList.add('bg-danger');
+            document.getElementById(buttonId).disabled = false;
+            document.getElementById(buttonId).innerHTML = 'Try Again';
+
+            // Log error
+            const logElement = document.getElementById('logContent');
+            logElement.innerHTML += `<div class="text-danger">[${new Date().toLocaleTimeString()}] Error: ${data.message}</div>`;
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        document.getElementById('statusMessage').innerText = 'Server error occurred. Please try again.';
+        document.getElementById('progressBar').style.width = '100%';
+        document.getElementById('progressBar').classList.remove('bg-info', 'bg-success');
+        document.getElementById('progressBar').classList.add('bg-danger');
+        document.getElementById(buttonId).disabled = false;
+        document.getElementById(buttonId).innerHTML = 'Try Again';
+
+        // Log error
+        const logElement = document.getElementById('logContent');
+        logElement.innerHTML += `<div class="text-danger">[${new Date().toLocaleTimeString()}] Server error: ${error.message}</div>`;
+    });
+}
+
+// Requests for the job carry its signed token instead of relying on the session cookie
+function jobUrl(url) {
+    const token = localStorage.getItem('conversionJobToken');
+    if (!token) {
+        return url;
+    }
+    return `${url}${url.includes('?') ? '&' : '?'}token=${encodeURIComponent(token)}`;
+}
+
+function formatBuildInfo(info) {
+    if (!info || info.artifact_size === undefined) {
+        return '';
+    }
+    let text = `Size: ${(info.artifact_size / (1024 * 1024)).toFixed(1)} MB`;
+    if (info.cold_start_seconds !== undefined) {
+        text += info.cold_start_seconds === null
+            ? ' | Startup: still running after timeout (GUI/server app?)'
+            : ` | Cold start: ${info.cold_start_seconds.toFixed(2)} s`;
+    }
+    if (info.benchmark) {
+        const b = info.benchmark;
+        text += ` | Benchmark (${b.runs} runs): cold ${b.cold_seconds.toFixed(2)} s`;
+        if (b.warm_seconds !== null) {
+            text += `, warm ${b.warm_seconds.toFixed(2)} s`;
+        }
+        text += `, peak RSS ${(b.peak_rss_bytes / (1024 * 1024)).toFixed(1)} MB`;
+        if (b.extraction_seconds !== null) {
+            text += `, extraction ${b.extraction_seconds.toFixed(2)} s`;
+        }
+        if (b.timed_out) {
+            text += ' (timed out)';
+        }
+    }
+    let comparison = '';
+    const engines = Object.keys(info.engine_comparison || {});
+    if (engines.length > 1) {
+        const rows = engines.map(name => {
+            const stats = info.engine_comparison[name];
+            const startup = stats.cold_start_seconds == null ? '-' : `${stats.cold_start_seconds.toFixed(2)} s`;
+            return `<tr><td>${name}</td><td>${(stats.artifact_size / (1024 * 1024)).toFixed(1)} MB</td><td>${startup}</td><td>${stats.build_seconds.toFixed(0)} s</td></tr>`;
+        }).join('');
+        comparison = `<table class="table table-sm small"><thead><tr><th>Engine</th><th>Size</th><th>Cold start</th><th>Build time</th></tr></thead><tbody>${rows}</tbody></table>`;
+    }
+    if (info.iterate) {
+        const it = info.iterate;
+        text += ` | Incremental rebuild: ${it.changed_files.length} changed file(s), ${it.seconds.toFixed(0)} s`;
+        if (it.saved_seconds > 0) {
+            text += ` (about ${it.saved_seconds.toFixed(0)} s faster than a cold build)`;
+        }
+    }
+    let profile = '';
+    if (info.profile_url) {
+        profile = `<p class="small">Build profile: <a href="${jobUrl(info.profile_url)}">folded stacks</a> (for speedscope or flamegraph.pl) | <a href="${jobUrl(`${info.profile_url}?format=trace`)}">trace</a> (for Perfetto)</p>`;
+    }
+    return `<p class="small text-muted">${text}</p>${comparison}${profile}`;
+}
+
+// Watch a conversion: a server-sent event stream when the server offers one,
+// otherwise polling /status
+function watchStatus(sessionId) {
+    if (window.EventSource && document.body.dataset.eventStream !== undefined) {
+        streamStatus(sessionId);
+    } else {
+        pollStatus(sessionId);
+    }
+}
+
+function streamStatus(sessionId) {
+    const source = new EventSource(jobUrl(`/events/${sessionId}`));
+    let finished = false;
+
+    source.onmessage = function(event) {
+        finished = handleStatus(sessionId, JSON.parse(event.data));
+        if (finished) {
+            source.close();
+        }
+    };
+    source.onerror = function() {
+        // Fall back to polling, which has its own retry logic
+        source.close();
+        if (!finished) {
+            pollStatus(sessionId);
+        }
+    };
+}
+
+// Apply a status update to the page; returns true once there is nothing more to watch
+function formatSeconds(seconds) {
+    return seconds < 60 ? `${Math.ceil(seconds)} s` : `${Math.ceil(seconds / 60)} min`;
+}
+
+function handleStatus(sessionId, data) {
+    // Check if session is valid
+    if (data.message === 'Invalid session ID') {
+        const logElement = document.getElementById('logContent');
+        logElement.innerHTML += `<div class="text-warning">[${new Date().toLocaleTimeString()}] Session error: Invalid session ID. Attempting recovery...</div>`;
+
+        // Try to recover by using localStorage
+        const storedSessionId = localStorage.getItem('conversionSessionId');
+        if (storedSessionId && storedSessionId !== sessionId) {
+            logElement.innerHTML += `<div>[${new Date().toLocaleTimeString()}] Attempting to recover with stored session ID: ${storedSessionId}</div>`;
+            setTimeout(() => watchStatus(storedSessionId), 1000);
+            return true;
+        }
+
+        // If unable to recover, show error
+        document.getElementById('statusMessage').innerText = 'Session error. Please try again.';
+        document.getElementById('progressBar').style.width = '100%';
+        document.getElementById('progressBar').classList.remove('bg-info', 'bg-success');
+        document.getElementById('progressBar').classList.add('bg-danger');
+        document.getElementById('uploadSubmitBtn').disabled = false;
+        document.getElementById('uploadSubmitBtn').innerHTML = 'Try Again';
+        document.getElementById('pasteSubmitBtn').disabled = false;
+        document.getElementById('pasteSubmitBtn').innerHTML = 'Try Again';
+        return true;
+    }
+
+    // Update progress bar
+    document.getElementById('progressBar').style.width = data.progress + '%';
+
+    // Update status message, with the predicted time left while building
+    const eta = data.eta_seconds == null || data.completed ? '' : ` (about ${formatSeconds(data.eta_seconds)} left)`;
+    document.getElementById('statusMessage').innerText = data.status + eta;
+
+    // Update log content (a status update may repeat the latest line)
+    if (data.log && data.log !== lastLogLine) {
+        lastLogLine = data.log;
+        const logElement = document.getElementById('logContent');
+        logElement.innerHTML += `<div>[${new Date().toLocaleTimeString()}] ${data.log}</div>`;
+        logElement.scrollTop = logElement.scrollHeight;
+    }
+
+    if (!data.completed) {
+        return false;
+    }
+
+    if (data.success) {
+        // Show success and download link
+        document.getElementById('progressBar').classList.add('bg-success');
+        document.getElementById('conversionStatus').innerHTML = `
+            <div class="alert alert-success mt-3">
+                <h5>Conversion successful!</h5>
+                <p>Your executable has been created successfully.</p>
+                ${formatBuildInfo(data.build_info)}
+                <a href="${jobUrl(data.download_url)}" class="btn btn-success">Download EXE</a>
+            </div>
+        `;
+    } else {
+        // Show error
+        document.getElementById('progressBar').style.width = '100%';
+        document.getElementById('progressBar').classList.remove('bg-info');
+        document.getElementById('progressBar').classList.add('bg-danger');
+        document.getElementById('statusMessage').innerText = 'Error: ' + data.message;
+        document.getElementById('uploadSubmitBtn').disabled = false;
+        document.getElementById('uploadSubmitBtn').innerHTML = 'Try Again';
+        document.getElementById('pasteSubmitBtn').disabled = false;
+        document.getElementById('pasteSubmitBtn').innerHTML = 'Try Again';
+    }
+    return true;
+}
+
+function pollStatus(sessionId) {
+    // Try up to 10 times with increasing delays if there's an error
+    let retryCount = 0;
+    let maxRetries = 10;
+    let retryDelay = 1000;
+
+    function makeStatusRequest() {
+        fetch(jobUrl(`/status/${sessionId}`), {
+            credentials: 'same-origin'  // Important for session cookies
+        })
+        .then(response => {
+            if (response.status === 429) {
+                // Rate limited: wait as long as the server asks before polling again
+                const delay = parseInt(response.headers.get('Retry-After'), 10) || 5;
+                const logElement = document.getElementById('logContent');
+                logElement.innerHTML += `<div class="text-warning">[${new Date().toLocaleTimeString()}] Server busy, checking again in ${delay}s...</div>`;
+                setTimeout(() => makeStatusRequest(), delay * 1000);
+                return null;
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (data === null) {
+                return;
+            }
+
+            // Reset retry counter on successful response
+            retryCount = 0;
+
+            if (!handleStatus(sessionId, data)) {
+                // Continue polling
+                setTimeout(() => makeStatusRequest(), 1000);
+            }
+        })
+        .catch(error => {
+            console.error('Error polling status:', error);
+
+            const logElement = document.getElementById('logContent');
+            logElement.innerHTML += `<div class="text-warning">[${new Date().toLocaleTimeString()}] Network error while checking status: ${error.message}. Retrying...</div>`;
+
+            // Implement exponential backoff for retries
+            retryCount++;
+            if (retryCount <= maxRetries) {
+                setTimeout(() => makeStatusRequest(), retryDelay);
+                retryDelay = Math.min(retryDelay * 1.5, 10000); // Cap at 10 seconds
+            } else {
+                logElement.innerHTML += `<div class="text-danger">[${new Date().toLocaleTimeString()}] Failed to connect after ${maxRetries} attempts. Please refresh and try again.</div>`;
+                document.getElementById('statusMessage').innerText = 'Connection lost. Please refresh and try again.';
+            }
+        });
+    }
+
+    // Start the polling
+    makeStatusRequest();
+}
+
+// Check for ongoing conversion on page load
+document.addEventListener('DOMContentLoaded', function() {
+    const storedSessionId = localStorage.getItem('conversionSessionId');
+    if (storedSessionId) {
+        // Check if the stored session is still active
+        fetch(jobUrl(`/status/${storedSessionId}`), {
+            credentials: 'same-origin'
+        })
+        .then(response => {
+            if (response.status === 403) {
+                // No valid job token for it (any more): forget the job
+                localStorage.removeItem('conversionSessionId');
+                localStorage.removeItem('conversionJobToken');
+                return null;
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (!data) {
+                return;
+            }
+            if (data.message !== 'Invalid session ID' && !data.completed) {
+                // Conversion is still in progress, restore UI
+                document.getElementById('conversionStatus').style.display = 'block';
+                document.getElementById('uploadSubmitBtn').disabled = true;
+                document.getElementById('uploadSubmitBtn').innerHTML = 'Converting... Please wait';
+                document.getElementById('pasteSubmitBtn').disabled = true;
+                document.getElementById('pasteSubmitBtn').innerHTML = 'Converting... Please wait';
+
+                const logElement = document.getElementById('logContent');
+                logElement.innerHTML += `<div>[${new Date().toLocaleTimeString()}] Reconnected to conversion session: ${storedSessionId}</div>`;
+
+                // Resume watching
+                watchStatus(storedSessionId);
+            } else if (data.completed && data.success) {
+                // Conversion is complete, show download link
+                document.getElementById('conversionStatus').style.display = 'block';
+                document.getElementById('conversionStatus').innerHTML = `
+                    <div class="alert alert-success mt-3">
+                        <h5>Conversion successful!</h5>
+                        <p>Your executable is ready for download.</p>
+                        <a href="${jobUrl(data.download_url)}" class="btn btn-success">Download EXE</a>
+                    </div>
+                `;
+            }
+        })
+        .catch(error => {
+            console.error('Error checking stored session:', error);
+        });
+    }
+});
+
+// Add window beforeunload event to warn about leaving during conversion
+window.addEventListener('beforeunload', function(e) {
+    if (document.getElementById('conversionStatus').style.display !== 'none' && 
+        !document.getElementById('progressBar').classList.contains('bg-success') &&
+        !document.getElementById('progressBar').classList.contains('bg-danger')) {
+        e.preventDefault();
+        e.returnValue = 'Conversion is in progress. Are you sure you want to leave?';
+        return e.returnValue;
+    }
+});
@@ -0,0 +1,121 @@
+"""Upload large extra files to the Python to EXE converter in resumable chunks.
+
+Each file is announced with the SHA-256 of every chunk, so chunks the server
+already holds are skipped; the rest are sent in parallel. Re-running the
+same command after a dropped connection with --resume UPLOAD_ID sends only
+what is still missing. Prints the upload ids, to pass to /upload or /paste
+as the comma-separated "assets" field:
+
+    python upload_assets.py http://127.0.0.1:5000 model.bin data.db
+    curl -F code='print(1)' -F filename=app.py -F assets=<id1>,<id2> \\
+         http://127.0.0.1:5000/paste
+
+Only the standard library is needed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 8 * 1024 * 1024
+# Times a request refused with HTTP 429 is retried after its Retry-After
+RATE_LIMIT_RETRIES = 5
+
+
+class UploadError(Exception):
+    pass
+
+
+def call(method, url, data=None, headers=None, retries=RATE_LIMIT_RETRIES):
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        retry_after = e.headers.get('Retry-After')
+        if e.code == 429 and retry_after and retries > 0:
+            time.sleep(float(retry_after))
+            return call(method, url, data, headers, retries - 1)
+        try:
+            message = json.loads(e.read()).get('message')
+        except ValueError:
+            message = None
+        raise UploadError(f'{method} {url}: HTTP {e.code} {message or ""}'.strip())
+
+
+def read_chunk(path, offset, size):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def chunk_hashes(path, chunk_size):
+    size = os.path.getsize(path)
+    whole = hashlib.sha256()
+    hashes = []
+    with open(path, 'rb') as f:
+        for _ in range(max((size + chunk_size - 1) // chunk_size, 1)):
+            chunk = f.read(chunk_size)
+            whole.update(chunk)
+            hashes.append(hashlib.sha256(chunk).hexdigest())
+    return whole.hexdigest(), hashes
+
+
+def upload(server, path, chunk_size, parallel, upload_id=None):
+    if upload_id:
+        state = call('GET', f'{server}/uploads/{upload_id}')
+    else:
+        sha256, hashes = chunk_hashes(path, chunk_size)
+        body = json.dumps({
+            'filename': os.path.basename(path),
+            'size': os.path.getsize(path),
+            'chunk_size': chunk_size,
+            'sha256': sha256,
+            'chunk_hashes': hashes,
+        }).encode('utf-8')
+        state = call('POST', f'{server}/uploads', body, {'Content-Type': 'application/json'})
+    upload_id = state['upload_id']
+    print(f'{path}: upload {upload_id}, {len(state["missing"])} of {state["chunk_count"]} chunks to send',
+          file=sys.stderr)
+
+    def send(chunk):
+        data = read_chunk(path, chunk['offset'], chunk['size'])
+        call('PUT', f"{server}/uploads/{upload_id}/chunks/{chunk['index']}?offset={chunk['offset']}", data,
+             {'X-Chunk-Sha256': hashlib.sha256(data).hexdigest(), 'Content-Type': 'application/octet-stream'})
+
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        list(pool.map(send, state['missing']))
+
+    if not state['finalized']:
+        state = call('POST', f'{server}/uploads/{upload_id}/finalize')
+    return upload_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('server', help='base URL of the converter')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='bytes per chunk (default 8 MiB)')
+    parser.add_argument('--parallel', type=int, default=4, help='chunks sent at once (default 4)')
+    parser.add_argument('--resume', metavar='UPLOAD_ID', help='continue an interrupted upload of a single file')
+    args = parser.parse_args()
+    if args.resume and len(args.files) != 1:
+        parser.error('--resume takes exactly one file')
+
+    server = args.server.rstrip('/')
+    try:
+        ids = [upload(server, path, args.chunk_size, args.parallel, args.resume) for path in args.files]
+    except (UploadError, OSError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    print(','.join(ids))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
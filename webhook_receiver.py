@@ -0,0 +1,100 @@
+"""Local receiver for the converter's completion webhooks.
+
+Submit a build with callback_url pointing here (and the same secret as
+callback_secret, or the server's WEBHOOK_SECRET) and every delivery is
+printed with the result of its signature check:
+
+    python webhook_receiver.py --port 8900 --secret s3cret
+    curl -F code='print(1)' -F filename=hello.py \\
+         -F callback_url=http://127.0.0.1:8900/hook -F callback_secret=s3cret \\
+         http://127.0.0.1:5000/paste
+
+The converter only delivers to loopback addresses like this one when started
+with WEBHOOK_ALLOW_PRIVATE=true. --fail N answers the first N deliveries
+with HTTP 500 to watch the retries.
+Only the standard library is needed.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Deliveries signed longer ago than this are rejected as replays
+MAX_SIGNATURE_AGE = 300
+
+
+def verify_signature(secret, headers, body):
+    """Return None if the signature is valid, otherwise the reason it is not"""
+    signature = headers.get('X-Webhook-Signature', '')
+    timestamp = headers.get('X-Webhook-Timestamp', '')
+    if not signature.startswith('sha256='):
+        return 'missing signature'
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > MAX_SIGNATURE_AGE:
+        return 'stale or missing timestamp'
+    expected = hmac.new(secret.encode('utf-8'), f'{timestamp}.'.encode('utf-8') + body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature[len('sha256='):]):
+        return 'signature mismatch'
+    return None
+
+
+def make_handler(secret, fail_count):
+    state = {'failures_left': fail_count, 'seen': set()}
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            delivery_id = self.headers.get('X-Webhook-Id')
+            attempt = self.headers.get('X-Webhook-Attempt')
+
+            if secret:
+                problem = verify_signature(secret, self.headers, body)
+                if problem:
+                    print(f'[{delivery_id}] rejected: {problem}', flush=True)
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+
+            if state['failures_left'] > 0:
+                state['failures_left'] -= 1
+                print(f'[{delivery_id}] attempt {attempt}: answering 500 (--fail)', flush=True)
+                self.send_response(500)
+                self.end_headers()
+                return
+
+            # Retries reuse the delivery id, so duplicates can be dropped
+            duplicate = ' (duplicate)' if delivery_id in state['seen'] else ''
+            state['seen'].add(delivery_id)
+            payload = json.loads(body)
+            print(f"[{delivery_id}] attempt {attempt}{duplicate}: {self.headers.get('X-Webhook-Event')}", flush=True)
+            print(json.dumps(payload, indent=2), flush=True)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return WebhookHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--secret', default='', help='verify signatures with this secret')
+    parser.add_argument('--fail', type=int, default=0, metavar='N', help='answer the first N deliveries with HTTP 500')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.secret, args.fail))
+    print(f'Listening for webhooks on http://{args.host}:{args.port}/', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())